@@ -1,37 +1,68 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+import json
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
 from app.core.database import get_session
 from app.models.service import Service
-from app.services.status_engine import check_and_update_service
+from app.services.status_engine import service_monitor
 from app.api.deps import get_current_user, get_current_admin_user
 
 router = APIRouter()
 
+def _as_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """History timestamps are stored as naive UTC"""
+    if value is not None and value.tzinfo:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 @router.post("/discovery/scan")
 async def scan_network(
     background_tasks: BackgroundTasks,
+    profile: Optional[str] = Query(None, description="Port profile; defaults to the scan_port_profile setting"),
     current_user = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
-    from app.services.discovery import discovery_engine
+    from app.services.discovery import discovery_engine, parse_subnet_schedule
+    from app.services.port_scan import load_profiles
     from app.models.settings import Setting
-    import json
+    from app.core.config import settings
     
     if discovery_engine.is_scanning:
         raise HTTPException(status_code=409, detail="Scan already in progress")
 
     # Fetch Scan Settings
     setting = session.get(Setting, "scan_subnets")
-    cidrs = []
-    if setting and setting.value:
-        try:
-            cidrs = json.loads(setting.value)
-        except:
-            cidrs = [] 
+    schedule = parse_subnet_schedule(setting.value if setting else None, settings.DISCOVERY_INTERVAL_SECONDS)
+    cidrs = [cidr for cidr, _ in schedule]
+
+    # Port profile: built-ins plus user-defined ones from the scan_port_profiles setting
+    custom = session.get(Setting, "scan_port_profiles")
+    profiles = load_profiles(custom.value if custom else None)
+    if not profile:
+        selected = session.get(Setting, "scan_port_profile")
+        profile = "default"
+        if selected and selected.value:
+            try:
+                profile = str(json.loads(selected.value))
+            except ValueError:
+                profile = selected.value
+    if profile not in profiles:
+        raise HTTPException(status_code=400, detail=f"Unknown port profile '{profile}'")
             
-    background_tasks.add_task(discovery_engine.scan_network, cidrs)
-    return {"status": "started", "detail": "Network scan running in background"}
+    background_tasks.add_task(discovery_engine.scan_network, cidrs, profiles[profile])
+    return {"status": "started", "detail": "Network scan running in background", "profile": profile}
+
+@router.get("/discovery/port-profiles")
+async def get_port_profiles(
+    current_user = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    from app.services.port_scan import load_profiles
+    from app.models.settings import Setting
+    custom = session.get(Setting, "scan_port_profiles")
+    return load_profiles(custom.value if custom else None)
 
 @router.get("/discovery/status")
 async def get_scan_status(
@@ -47,6 +78,98 @@ async def get_scan_results(
     from app.services.discovery import discovery_engine
     return discovery_engine.last_results
 
+@router.get("/discovery/hosts")
+async def get_discovered_hosts(
+    alive: Optional[bool] = None,
+    current_user = Depends(get_current_user)
+):
+    """Persistent host table kept by scans and continuous discovery"""
+    import asyncio
+    from app.services.host_inventory import host_inventory
+    return await asyncio.to_thread(host_inventory.hosts, alive)
+
+@router.get("/discovery/mdns")
+async def get_mdns_hosts(
+    current_user = Depends(get_current_user)
+):
+    """Hosts currently announced over mDNS (passive discovery)"""
+    from app.services.resolver import mdns_index
+    return mdns_index.hosts()
+
+@router.post("/discovery/snmp")
+async def enrich_snmp_hosts(
+    ips: List[str],
+    interfaces: bool = False,
+    current_user = Depends(get_current_user)
+):
+    """System group (and interface table) of many hosts in one concurrent GETBULK pass"""
+    from app.services.snmp_enrichment import snmp_enricher
+    return await snmp_enricher.enrich_many(ips[:4096], interfaces=interfaces)
+
+@router.post("/vendors/lookup")
+async def lookup_mac_vendors(
+    macs: List[str],
+    current_user = Depends(get_current_user)
+):
+    """Batch MAC -> vendor lookup"""
+    from app.services.vendor import lookup_vendors
+    return await lookup_vendors(macs[:10000])
+
+@router.post("/vendors/reload")
+async def reload_vendor_db(
+    current_user = Depends(get_current_admin_user)
+):
+    """Rebuild the vendor index from the local registry files (no download)"""
+    import asyncio
+    from app.services.vendor import vendor_db
+    await asyncio.to_thread(vendor_db.reload)
+    return vendor_db.stats()
+
+@router.get("/discovery/diff")
+async def get_scan_diff(
+    current_user = Depends(get_current_user)
+):
+    """New, gone and changed hosts of the last completed scan against the one before"""
+    from app.services.discovery import discovery_engine
+    if discovery_engine.last_diff is None:
+        raise HTTPException(status_code=404, detail="No completed scan yet")
+    return discovery_engine.last_diff
+
+@router.get("/discovery/events")
+async def stream_scan_events(
+    request: Request,
+    current_user = Depends(get_current_user)
+):
+    """
+    Server-sent events for network scans: started, device (with change
+    new/changed/unchanged), progress, diff and complete. The first event is
+    a status snapshot; clients that fall behind are disconnected and should
+    reconnect and re-read /discovery/results.
+    """
+    from app.services.discovery import discovery_engine
+
+    def format_event(event: dict) -> str:
+        return f"id: {event.get('seq', 0)}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+    async def event_stream():
+        subscription = discovery_engine.events.subscribe()
+        try:
+            yield format_event({"type": "status", **discovery_engine.get_status()})
+            while not subscription.dropped:
+                event = await subscription.get(timeout=15.0)
+                if await request.is_disconnected():
+                    break
+                # Comment line keeps proxies from closing an idle stream
+                yield format_event(event) if event else ": keep-alive\n\n"
+        finally:
+            discovery_engine.events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/", response_model=List[Service])
 def read_services(
     skip: int = 0,
@@ -72,6 +195,54 @@ def read_services(
     
     return services
 
+@router.get("/history/analytics")
+def read_history_analytics(
+    service_ids: List[int] = Query(..., max_length=100),
+    start: Optional[datetime] = Query(default=None, alias="from"),
+    end: Optional[datetime] = Query(default=None, alias="to"),
+    bucket: Optional[str] = None,
+    session: Session = Depends(get_session),
+    current_user = Depends(get_current_user)
+):
+    """
+    Bucketed uptime/latency series plus SLA uptime %, MTTR/MTBF and latency
+    percentiles for several services in one call (default range: last 24h).
+    """
+    from app.core.config import settings
+    from app.services.history_analytics import (
+        MAX_BUCKETS, auto_bucket, compute_analytics, parse_bucket
+    )
+
+    end = _as_naive_utc(end) or datetime.utcnow()
+    start = _as_naive_utc(start) or end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="from must be before to")
+
+    if bucket:
+        try:
+            size = parse_bucket(bucket)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if (end - start) / size > MAX_BUCKETS:
+            raise HTTPException(status_code=400, detail=f"Range needs more than {MAX_BUCKETS} buckets")
+    else:
+        size = auto_bucket(start, end, settings.HISTORY_MAX_POINTS)
+
+    services = session.exec(
+        select(Service.id, Service.check_interval).where(Service.id.in_(service_ids))
+    ).all()
+    if not services:
+        raise HTTPException(status_code=404, detail="Service not found")
+
+    return compute_analytics(
+        session,
+        [service_id for service_id, _ in services],
+        start,
+        end,
+        size,
+        check_interval=min(interval for _, interval in services)
+    )
+
 @router.get("/{service_id}/history", response_model=List[dict]) 
 def read_service_history(
     service_id: int,
@@ -84,6 +255,47 @@ def read_service_history(
     history = session.exec(statement).all()
     return [item.model_dump() for item in history]
 
+@router.get("/{service_id}/history/series")
+def read_service_history_series(
+    service_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = None,
+    max_points: Optional[int] = Query(default=None, ge=1, le=10000),
+    session: Session = Depends(get_session),
+    current_user = Depends(get_current_user)
+):
+    """
+    History for a time range (default: last 24h) from the raw table or a rollup.
+    Without an explicit resolution ('raw', '1m', '1h', '1d') the finest one
+    that fits max_points is used.
+    """
+    from app.core.config import settings
+    from app.services.history_rollup import history_rollup, RESOLUTIONS
+
+    service = session.get(Service, service_id)
+    if not service:
+        raise HTTPException(status_code=404, detail="Service not found")
+
+    end = _as_naive_utc(end) or datetime.utcnow()
+    start = _as_naive_utc(start) or end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if resolution is None:
+        resolution = history_rollup.pick_resolution(
+            start, end, service.check_interval, max_points or settings.HISTORY_MAX_POINTS
+        )
+    elif resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {RESOLUTIONS}")
+
+    return {
+        "service_id": service_id,
+        "resolution": resolution,
+        "start": start,
+        "end": end,
+        "points": history_rollup.query_series(session, service_id, start, end, resolution),
+    }
+
 @router.post("/", response_model=Service)
 async def create_service(
     service: Service,
@@ -94,9 +306,7 @@ async def create_service(
     # Auto-resolve hostname if missing
     if not service.hostname:
          from app.services.resolver import resolve_hostname
-         # Note: resolve_hostname is blocking (socket), should run in executor if high load
-         # For now, it's fast enough or we accept small delay
-         service.hostname = resolve_hostname(service.ip)
+         service.hostname = await resolve_hostname(service.ip)
 
     # Auto-lookup Vendor if MAC is present
     if service.mac_address and not service.vendor:
@@ -116,7 +326,9 @@ async def create_service(
     log_audit(username=current_user.username, action="CREATE_SERVICE", details=f"Created service {service.name} ({service.ip})")
 
     # Trigger initial check (Pass ID, not object/session)
-    background_tasks.add_task(check_and_update_service, service.id)
+    background_tasks.add_task(service_monitor.run_check, service.id)
+    # Next regular check is one interval after the initial one
+    service_monitor.track(service)
     return service
 
 @router.post("/{service_id}/scan", response_model=Service)
@@ -129,14 +341,14 @@ async def scan_service(
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
     
-    await check_and_update_service(service, session)
+    await service_monitor.run_check(service_id)
     session.refresh(service)
     return service
 
 @router.post("/resolve")
-def resolve_ip(ip: str):
+async def resolve_ip(ip: str):
     from app.services.resolver import resolve_hostname
-    hostname = resolve_hostname(ip)
+    hostname = await resolve_hostname(ip)
     return {"ip": ip, "hostname": hostname}
 
 @router.post("/{service_id}/wake")
@@ -325,6 +537,9 @@ def update_service(
         session.commit()
         session.refresh(service)
         
+        if 'check_interval' in service_data or 'check_type' in service_data:
+            service_monitor.track(service)
+        
         # Audit
         from app.services.audit import log_audit
         log_audit(username=current_user.username, action="UPDATE_SERVICE", details=f"Updated service {service.name}")
@@ -351,6 +566,7 @@ def delete_service(
     service_name = service.name
     session.delete(service)
     session.commit()
+    service_monitor.untrack(service_id)
     
     # Audit
     from app.services.audit import log_audit
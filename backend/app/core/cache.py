@@ -1,35 +1,171 @@
 """
 Redis caching utility for API responses and data caching.
-Falls back to in-memory caching if Redis is not available.
+
+Two tiers: a bounded in-process LRU with TTL (L1) in front of Redis (L2).
+Reads try L1 first, so hot keys cost no network round trip; L2 hits are
+copied into L1 for at most CACHE_L1_TTL_SECONDS so workers don't serve
+another worker's overwritten value for long. Without Redis, L1 is the whole
+cache and honours the full ttl.
+
+Async code uses aget/aset/amget/amset: they talk to Redis through
+redis.asyncio with a connection pool per event loop, and the multi-key
+calls send all their commands in one pipelined round trip.
+
+Keys are namespaced by prefix and a generation counter ("services:v3:key").
+clear_prefix bumps the counter, which invalidates the whole prefix in O(1)
+however many keys it holds; the old generation is never read again and
+expires by itself (purge_prefix reclaims it early with SCAN + UNLINK).
+Workers re-read a prefix's generation from Redis at most every
+CACHE_GENERATION_CHECK_SECONDS.
+
+Values are encoded by CacheCodec (msgpack/orjson/json, compressed above a
+size threshold, format recorded per value; see cache_codec).
 """
-import json
+import asyncio
 import hashlib
-from typing import Optional, Any, Callable
+import math
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Optional, Any, Callable, Dict, Iterable, List, Tuple
 from functools import wraps
 import logging
 
+from app.core.config import settings
+from app.core.cache_codec import CacheCodec
+
 try:
     import redis
-    from app.core.config import settings
+    import redis.asyncio as aioredis
     REDIS_AVAILABLE = settings.REDIS_ENABLED
 except ImportError:
     REDIS_AVAILABLE = False
     redis = None
+    aioredis = None
 
 logger = logging.getLogger(__name__)
 
+_MISSING = object()
+
+
+class MemoryCache:
+    """
+    In-process LRU cache with per-entry TTL, bounded by entry count and by
+    the encoded size of the values. Thread-safe.
+    Values are shared between callers, so don't mutate what you get back.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (value, expires, size)
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return default
+            if entry[1] <= time.monotonic():
+                self._remove(key)
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def set(self, key: str, value: Any, ttl: float, size: int) -> bool:
+        """Store value for ttl seconds; size is its encoded length. False if it can never fit."""
+        if ttl <= 0 or size > self.max_bytes:
+            self.delete(key)
+            return False
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats["evictions"] += 1
+        return True
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._remove(key)
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.bytes -= entry[2]
+        return True
+
+    def delete_prefix(self, prefix: str, keep: Optional[str] = None) -> int:
+        """Drop keys starting with prefix, except those starting with keep"""
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if key.startswith(prefix) and not (keep and key.startswith(keep))
+            ]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def info(self) -> Dict:
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
+
+
 class CacheManager:
-    """Unified cache manager that supports Redis or in-memory fallback"""
+    """Unified cache manager: in-process L1 in front of Redis (when available)"""
     
-    def __init__(self):
-        self.redis_client = None
-        self._memory_cache = {}
+    def __init__(self, redis_client=None, async_redis=None):
+        self.redis_client = redis_client
+        # One asyncio client (and connection pool) per event loop, or a fixed one
+        self._async_redis = async_redis
+        self._async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self.local = MemoryCache(
+            max_entries=settings.CACHE_L1_MAX_ENTRIES,
+            max_bytes=settings.CACHE_L1_MAX_BYTES
+        )
+        self.l1_ttl = settings.CACHE_L1_TTL_SECONDS
+        self.codec = CacheCodec(
+            serializer=settings.CACHE_SERIALIZER,
+            compression=settings.CACHE_COMPRESSION,
+            compress_min_bytes=settings.CACHE_COMPRESS_MIN_BYTES
+        )
+        # prefix -> (generation, when it was last read from Redis)
+        self._generations: Dict[str, Tuple[int, float]] = {}
+        self.generation_check = settings.CACHE_GENERATION_CHECK_SECONDS
+        self.stats = {"l2_hits": 0, "l2_misses": 0, "l2_errors": 0}
         
+        if redis_client is not None or async_redis is not None:
+            return
         if REDIS_AVAILABLE and redis:
             try:
                 self.redis_client = redis.from_url(
                     settings.REDIS_URL,
-                    decode_responses=True,
+                    decode_responses=False,  # Values are binary (see cache_codec)
                     socket_connect_timeout=5
                 )
                 # Test connection
@@ -41,24 +177,79 @@ class CacheManager:
         else:
             logger.info("Using in-memory cache (Redis disabled)")
     
-    def _make_key(self, prefix: str, key: str) -> str:
-        """Generate cache key with prefix"""
-        return f"{prefix}:{key}"
-    
+    def _make_key(self, prefix: str, key: str, generation: Optional[int] = None) -> str:
+        """Generate cache key with prefix and the prefix's current generation"""
+        if generation is None:
+            generation = self._generation(prefix)
+        return f"{prefix}:v{generation}:{key}"
+
+    def _generation_key(self, prefix: str) -> str:
+        return f"cache-generation:{prefix}"
+
+    def _known_generation(self, prefix: str) -> Optional[int]:
+        """Local copy of a prefix's generation; None when it is due a check against Redis"""
+        entry = self._generations.get(prefix)
+        if entry is None:
+            return None
+        generation, checked = entry
+        if self._has_l2 and time.monotonic() - checked >= self.generation_check:
+            return None
+        return generation
+
+    def _store_generation(self, prefix: str, generation) -> int:
+        generation = int(generation or 0)
+        self._generations[prefix] = (generation, time.monotonic())
+        return generation
+
+    def _generation(self, prefix: str) -> int:
+        generation = self._known_generation(prefix)
+        if generation is not None:
+            return generation
+        generation = self._generations.get(prefix, (0, 0.0))[0]
+        if self.redis_client:
+            try:
+                generation = self.redis_client.get(self._generation_key(prefix))
+            except Exception as e:
+                logger.error(f"Redis generation read error: {e}")
+        return self._store_generation(prefix, generation)
+
     def get(self, key: str, prefix: str = "cache") -> Optional[Any]:
-        """Get value from cache"""
+        """Get value from cache (L1, then Redis; Redis hits are copied into L1)"""
         cache_key = self._make_key(prefix, key)
+        value = self.local.get(cache_key, _MISSING)
+        if value is not _MISSING:
+            return value
         
         if self.redis_client:
             try:
-                value = self.redis_client.get(cache_key)
-                if value:
-                    return json.loads(value)
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.get(cache_key)
+                pipe.pttl(cache_key)
+                raw, pttl = pipe.execute()
             except Exception as e:
+                self.stats["l2_errors"] += 1
                 logger.error(f"Redis get error: {e}")
+                return None
+            return self._from_l2(cache_key, raw, pttl)
         
-        # Fallback to memory cache
-        return self._memory_cache.get(cache_key)
+        return None
+
+    def _from_l2(self, cache_key: str, raw: Optional[bytes], pttl: Optional[int]) -> Optional[Any]:
+        """Decode a Redis GET+PTTL answer and copy it into L1"""
+        if raw is None:
+            self.stats["l2_misses"] += 1
+            return None
+        try:
+            value = self.codec.loads(raw)
+        except Exception as e:
+            # Written by a differently configured worker; treat as a miss
+            self.stats["l2_errors"] += 1
+            logger.error(f"Cache decode error for {cache_key}: {e}")
+            return None
+        self.stats["l2_hits"] += 1
+        if pttl is not None and pttl > 0:
+            self.local.set(cache_key, value, self._local_ttl(pttl / 1000), len(raw))
+        return value
     
     def set(self, key: str, value: Any, ttl: int = 300, prefix: str = "cache") -> bool:
         """
@@ -71,20 +262,19 @@ class CacheManager:
             prefix: Key prefix for organization
         """
         cache_key = self._make_key(prefix, key)
+        raw = self.codec.dumps(value)
         
         if self.redis_client:
             try:
-                self.redis_client.setex(
-                    cache_key,
-                    ttl,
-                    json.dumps(value)
-                )
+                self.redis_client.setex(cache_key, ttl, raw)
+                self.local.set(cache_key, value, self._local_ttl(ttl), len(raw))
                 return True
             except Exception as e:
+                self.stats["l2_errors"] += 1
                 logger.error(f"Redis set error: {e}")
         
-        # Fallback to memory cache
-        self._memory_cache[cache_key] = value
+        # Memory only (or Redis is failing): L1 holds it for the full ttl
+        self.local.set(cache_key, value, ttl, len(raw))
         return True
     
     def delete(self, key: str, prefix: str = "cache") -> bool:
@@ -98,47 +288,350 @@ class CacheManager:
                 logger.error(f"Redis delete error: {e}")
         
         # Also remove from memory cache
-        self._memory_cache.pop(cache_key, None)
+        self.local.delete(cache_key)
         return True
     
     def clear_prefix(self, prefix: str) -> int:
-        """Clear all keys with given prefix"""
-        count = 0
-        
+        """
+        Invalidate all keys with given prefix in O(1) by moving the prefix
+        to a new generation. Returns the new generation.
+        """
+        generation = self._generation(prefix) + 1
         if self.redis_client:
             try:
-                pattern = f"{prefix}:*"
-                keys = self.redis_client.keys(pattern)
-                if keys:
-                    count = self.redis_client.delete(*keys)
+                generation = self.redis_client.incr(self._generation_key(prefix))
             except Exception as e:
                 logger.error(f"Redis clear error: {e}")
+        return self._store_generation(prefix, generation)
+
+    def purge_prefix(self, prefix: str, batch_size: int = 1000) -> int:
+        """
+        Delete entries of the prefix's old generations now instead of
+        waiting for them to expire. Walks Redis with incremental SCAN and
+        frees keys with UNLINK a batch at a time, so Redis never blocks.
+        Returns the number of keys removed.
+        """
+        current = f"{prefix}:v{self._generation(prefix)}:"
+        removed = 0
+        if self.redis_client:
+            try:
+                stale = []
+                for key in self.redis_client.scan_iter(match=f"{prefix}:v*", count=batch_size):
+                    if not (key.decode() if isinstance(key, bytes) else key).startswith(current):
+                        stale.append(key)
+                    if len(stale) >= batch_size:
+                        removed += self.redis_client.unlink(*stale)
+                        stale = []
+                if stale:
+                    removed += self.redis_client.unlink(*stale)
+            except Exception as e:
+                logger.error(f"Redis purge error: {e}")
         
-        # Clear from memory cache
-        keys_to_delete = [k for k in self._memory_cache.keys() if k.startswith(f"{prefix}:")]
-        for key in keys_to_delete:
-            del self._memory_cache[key]
-            count += 1
-        
-        return count
+        # Memory cache (Redis already counted keys that were in both)
+        local = self.local.delete_prefix(f"{prefix}:", keep=current)
+        return removed or local
     
     def clear_all(self) -> bool:
         """Clear entire cache"""
         if self.redis_client:
             try:
-                self.redis_client.flushdb()
+                self.redis_client.flushdb(asynchronous=True)  # Freed in the background
             except Exception as e:
                 logger.error(f"Redis flush error: {e}")
         
-        self._memory_cache.clear()
+        self.local.clear()
+        self._generations.clear()
+        return True
+
+    def info(self) -> Dict:
+        """Hit/miss/eviction counters for both tiers"""
+        enabled = self.redis_client is not None or self._async_redis is not None
+        return {"l1": self.local.info(), "l2": {**self.stats, "enabled": enabled}}
+
+    # --- asyncio API ----------------------------------------------------
+
+    def _async_client(self):
+        """asyncio Redis client for the running loop, None when Redis is not in use"""
+        if self._async_redis is not None:
+            return self._async_redis
+        if self.redis_client is None or aioredis is None:
+            return None
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = aioredis.from_url(
+                settings.REDIS_URL,
+                decode_responses=False,  # Values are binary (see cache_codec)
+                socket_connect_timeout=5,
+                max_connections=settings.REDIS_MAX_CONNECTIONS
+            )
+            self._async_clients[loop] = client
+        return client
+
+    @property
+    def _has_l2(self) -> bool:
+        return self._async_redis is not None or self.redis_client is not None
+
+    def _local_ttl(self, ttl: float) -> float:
+        # Backed by Redis: keep local copies short-lived so other workers' writes show up
+        return min(ttl, self.l1_ttl) if self._has_l2 else ttl
+
+    async def _ageneration(self, prefix: str) -> int:
+        generation = self._known_generation(prefix)
+        if generation is not None:
+            return generation
+        generation = self._generations.get(prefix, (0, 0.0))[0]
+        client = self._async_client()
+        if client is not None:
+            try:
+                generation = await client.get(self._generation_key(prefix))
+            except Exception as e:
+                logger.error(f"Redis generation read error: {e}")
+        return self._store_generation(prefix, generation)
+
+    async def aclear_prefix(self, prefix: str) -> int:
+        """Async clear_prefix: one INCR"""
+        generation = await self._ageneration(prefix) + 1
+        client = self._async_client()
+        if client is not None:
+            try:
+                generation = await client.incr(self._generation_key(prefix))
+            except Exception as e:
+                logger.error(f"Redis clear error: {e}")
+        return self._store_generation(prefix, generation)
+
+    async def aget(self, key: str, prefix: str = "cache") -> Optional[Any]:
+        """Async get: L1, then one pipelined GET+PTTL to Redis"""
+        return (await self.amget([key], prefix)).get(key)
+
+    async def amget(self, keys: Iterable[str], prefix: str = "cache") -> Dict[str, Any]:
+        """
+        Values for many keys; keys not cached anywhere are left out. L1
+        misses are fetched from Redis in a single round trip.
+        """
+        generation = await self._ageneration(prefix)
+        found: Dict[str, Any] = {}
+        missing: List[str] = []
+        for key in keys:
+            value = self.local.get(self._make_key(prefix, key, generation), _MISSING)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+
+        client = self._async_client() if missing else None
+        if client is None:
+            return found
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key in missing:
+                cache_key = self._make_key(prefix, key, generation)
+                pipe.get(cache_key)
+                pipe.pttl(cache_key)
+            replies = await pipe.execute()
+        except Exception as e:
+            self.stats["l2_errors"] += 1
+            logger.error(f"Redis get error: {e}")
+            return found
+        for index, key in enumerate(missing):
+            cache_key = self._make_key(prefix, key, generation)
+            value = self._from_l2(cache_key, replies[2 * index], replies[2 * index + 1])
+            if value is not None:
+                found[key] = value
+        return found
+
+    async def aset(self, key: str, value: Any, ttl: int = 300, prefix: str = "cache") -> bool:
+        return await self.amset({key: value}, ttl=ttl, prefix=prefix)
+
+    async def amset(self, mapping: Dict[str, Any], ttl: int = 300, prefix: str = "cache") -> bool:
+        """Store many values with one ttl; Redis gets every SETEX in one round trip"""
+        generation = await self._ageneration(prefix)
+        encoded = {
+            self._make_key(prefix, key, generation): (value, self.codec.dumps(value))
+            for key, value in mapping.items()
+        }
+        client = self._async_client()
+        local_ttl = ttl
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for cache_key, (_, raw) in encoded.items():
+                    pipe.setex(cache_key, ttl, raw)
+                await pipe.execute()
+                local_ttl = self._local_ttl(ttl)
+            except Exception as e:
+                self.stats["l2_errors"] += 1
+                logger.error(f"Redis set error: {e}")
+        for cache_key, (value, raw) in encoded.items():
+            self.local.set(cache_key, value, local_ttl, len(raw))
         return True
 
+    async def adelete(self, key: str, prefix: str = "cache") -> bool:
+        cache_key = self._make_key(prefix, key, await self._ageneration(prefix))
+        client = self._async_client()
+        if client is not None:
+            try:
+                await client.delete(cache_key)
+            except Exception as e:
+                logger.error(f"Redis delete error: {e}")
+        self.local.delete(cache_key)
+        return True
+
+    async def aclose(self):
+        """
+        Close the asyncio clients of every loop (their pools go with them).
+        Each is closed on its own loop; clients of loops that are no longer
+        running are just dropped.
+        """
+        current = asyncio.get_running_loop()
+        clients = list(self._async_clients.items())
+        self._async_clients.clear()
+        for loop, client in clients:
+            try:
+                if loop is current:
+                    await client.aclose()
+                elif loop.is_running():
+                    closing = client.aclose()
+                    try:
+                        future = asyncio.run_coroutine_threadsafe(closing, loop)
+                    except RuntimeError:  # Closed in the meantime
+                        closing.close()
+                        continue
+                    await asyncio.wait_for(asyncio.wrap_future(future), timeout=5)
+            except Exception as e:
+                logger.error(f"Redis close error: {e}")
+
 # Global cache instance
 cache = CacheManager()
 
-def cached(ttl: int = 300, prefix: str = "api", key_func: Optional[Callable] = None):
+def _call_key(func: Callable, key_func: Optional[Callable], args, kwargs) -> str:
+    if key_func:
+        return key_func(*args, **kwargs)
+    # Use function name and args as key
+    key_parts = [func.__name__]
+    if args:
+        key_parts.extend(str(arg) for arg in args)
+    if kwargs:
+        key_parts.extend(f"{k}={v}" for k, v in sorted(kwargs.items()))
+    
+    key_string = ":".join(key_parts)
+    return hashlib.md5(key_string.encode()).hexdigest()
+
+# --- Decorator entries ------------------------------------------------
+#
+# The decorator stores {"v": value, "x": soft expiry (epoch), "d": seconds the
+# call took}. The cache keeps the entry for ttl + stale_ttl, so between the
+# soft and the hard expiry it can be served stale while one caller refreshes.
+
+def _wrap(value: Any, ttl: float, delta: float) -> Dict:
+    return {"v": value, "x": time.time() + ttl, "d": round(delta, 4)}
+
+
+def _unwrap(entry: Any) -> Optional[Dict]:
+    if entry is None:
+        return None
+    if isinstance(entry, dict) and entry.keys() == {"v", "x", "d"}:
+        return entry
+    return {"v": entry, "x": float("inf"), "d": 0}  # Stored by cache.set directly
+
+
+def _is_fresh(entry: Dict, beta: float) -> bool:
+    """
+    Not yet (soft) expired. With beta > 0 each caller may see the entry as
+    expired a little early, more likely the closer the expiry and the slower
+    the computation, so one caller refreshes before everyone misses at once.
     """
-    Decorator to cache function results
+    now = time.time()
+    if beta > 0 and entry["d"] > 0:
+        now -= entry["d"] * beta * math.log(1.0 - random.random())
+    return now < entry["x"]
+
+
+class _Flight:
+    """A computation other threads can wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+# Single-flight state: threads share one table, each event loop has its own
+_flights: Dict[str, _Flight] = {}
+_flights_lock = threading.Lock()
+_async_flights: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Future]]" = weakref.WeakKeyDictionary()
+_background_tasks: set = set()
+
+
+def _single_flight(flight_key: str, compute: Callable[[], Any]) -> Any:
+    """Run compute() once for concurrent callers of the same key; the rest wait for its result"""
+    with _flights_lock:
+        flight = _flights.get(flight_key)
+        leader = flight is None
+        if leader:
+            flight = _flights[flight_key] = _Flight()
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+    try:
+        flight.result = compute()
+        return flight.result
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(flight_key, None)
+        flight.done.set()
+
+
+async def _async_single_flight(flight_key: str, compute: Callable) -> Any:
+    """
+    Async flavour of _single_flight, per event loop. The computation runs
+    as a task owned by the flight, so cancelling any caller (the first one
+    included) leaves the others waiting for the result.
+    """
+    flights = _async_flights.setdefault(asyncio.get_running_loop(), {})
+    task = flights.get(flight_key)
+    if task is None:
+        task = asyncio.ensure_future(compute())
+        flights[flight_key] = task
+
+        def finished(done: asyncio.Future):
+            if flights.get(flight_key) is done:
+                del flights[flight_key]
+            if not done.cancelled():
+                done.exception()  # Callers get it; don't warn if they all went away
+
+        task.add_done_callback(finished)
+    return await asyncio.shield(task)
+
+
+def _log_refresh_error(flight_key: str, error: BaseException):
+    logger.error(f"Background cache refresh of {flight_key} failed: {error}")
+
+
+def cached(
+    ttl: int = 300,
+    prefix: str = "api",
+    key_func: Optional[Callable] = None,
+    stale_ttl: int = 0,
+    beta: float = 0.0
+):
+    """
+    Decorator to cache function results. Coroutine functions are cached
+    through the async API, so they never block the event loop on Redis.
+    
+    Concurrent misses of one key are coalesced: a single caller runs the
+    function while the others wait for its result.
+    
+    Args:
+        ttl: Seconds a result is fresh
+        stale_ttl: Seconds after that during which the stale result is still
+            returned while one background call refreshes it (0 = off)
+        beta: Probabilistic early expiration; 1.0 is a good start (0 = off)
     
     Usage:
         @cached(ttl=600, prefix="services")
@@ -146,44 +639,88 @@ def cached(ttl: int = 300, prefix: str = "api", key_func: Optional[Callable] = N
             return expensive_operation()
     
         @cached(ttl=60, key_func=lambda user_id: f"user_{user_id}")
-        def get_user_data(user_id: int):
-            return fetch_user(user_id)
+        async def get_user_data(user_id: int):
+            return await fetch_user(user_id)
     """
     def decorator(func: Callable):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            # Generate cache key
-            if key_func:
-                cache_key = key_func(*args, **kwargs)
-            else:
-                # Use function name and args as key
-                key_parts = [func.__name__]
-                if args:
-                    key_parts.extend(str(arg) for arg in args)
-                if kwargs:
-                    key_parts.extend(f"{k}={v}" for k, v in sorted(kwargs.items()))
+        if asyncio.iscoroutinefunction(func):
+            async def compute(cache_key, args, kwargs):
+                started = time.monotonic()
+                result = await func(*args, **kwargs)
+                if result is not None:
+                    entry = _wrap(result, ttl, time.monotonic() - started)
+                    await cache.aset(cache_key, entry, ttl=ttl + stale_ttl, prefix=prefix)
+                return result
+
+            def refresh_in_background(cache_key, flight_key, args, kwargs):
+                if flight_key in _async_flights.get(asyncio.get_running_loop(), {}):
+                    return  # Already being refreshed
+                task = asyncio.ensure_future(
+                    _async_single_flight(flight_key, lambda: compute(cache_key, args, kwargs))
+                )
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+                task.add_done_callback(
+                    lambda t: t.cancelled() or t.exception() is None or _log_refresh_error(flight_key, t.exception())
+                )
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                cache_key = _call_key(func, key_func, args, kwargs)
+                flight_key = f"{prefix}:{cache_key}"
+                entry = _unwrap(await cache.aget(cache_key, prefix=prefix))
+                if entry is not None:
+                    if _is_fresh(entry, beta):
+                        logger.debug(f"Cache HIT: {flight_key}")
+                        return entry["v"]
+                    if stale_ttl:
+                        logger.debug(f"Cache STALE: {flight_key}")
+                        refresh_in_background(cache_key, flight_key, args, kwargs)
+                        return entry["v"]
                 
-                key_string = ":".join(key_parts)
-                cache_key = hashlib.md5(key_string.encode()).hexdigest()
-            
-            # Try to get from cache
-            cached_value = cache.get(cache_key, prefix=prefix)
-            if cached_value is not None:
-                logger.debug(f"Cache HIT: {prefix}:{cache_key}")
-                return cached_value
-            
-            # Execute function
-            logger.debug(f"Cache MISS: {prefix}:{cache_key}")
-            result = func(*args, **kwargs)
-            
-            # Store in cache
-            cache.set(cache_key, result, ttl=ttl, prefix=prefix)
-            
-            return result
+                logger.debug(f"Cache MISS: {flight_key}")
+                return await _async_single_flight(flight_key, lambda: compute(cache_key, args, kwargs))
+        else:
+            def compute(cache_key, args, kwargs):
+                started = time.monotonic()
+                result = func(*args, **kwargs)
+                if result is not None:
+                    entry = _wrap(result, ttl, time.monotonic() - started)
+                    cache.set(cache_key, entry, ttl=ttl + stale_ttl, prefix=prefix)
+                return result
+
+            def refresh(cache_key, flight_key, args, kwargs):
+                try:
+                    _single_flight(flight_key, lambda: compute(cache_key, args, kwargs))
+                except Exception as e:
+                    _log_refresh_error(flight_key, e)
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                cache_key = _call_key(func, key_func, args, kwargs)
+                flight_key = f"{prefix}:{cache_key}"
+                
+                # Try to get from cache
+                entry = _unwrap(cache.get(cache_key, prefix=prefix))
+                if entry is not None:
+                    if _is_fresh(entry, beta):
+                        logger.debug(f"Cache HIT: {flight_key}")
+                        return entry["v"]
+                    if stale_ttl:
+                        logger.debug(f"Cache STALE: {flight_key}")
+                        if flight_key not in _flights:
+                            threading.Thread(
+                                target=refresh, args=(cache_key, flight_key, args, kwargs), daemon=True
+                            ).start()
+                        return entry["v"]
+                
+                # Execute function (once, however many threads miss together)
+                logger.debug(f"Cache MISS: {flight_key}")
+                return _single_flight(flight_key, lambda: compute(cache_key, args, kwargs))
         
         # Add cache control methods
         wrapper.cache_clear = lambda: cache.clear_prefix(prefix)
-        wrapper.cache_info = lambda: {"prefix": prefix, "ttl": ttl}
+        wrapper.cache_info = lambda: {"prefix": prefix, "ttl": ttl, "stale_ttl": stale_ttl, "beta": beta}
         
         return wrapper
     
@@ -211,6 +748,10 @@ cache.set("my_key", {"data": "value"}, ttl=600)
 data = cache.get("my_key")
 cache.delete("my_key")
 
+# From async code (one round trip for all keys)
+await cache.amset({"a": 1, "b": 2}, ttl=60)
+values = await cache.amget(["a", "b", "c"])  # {"a": 1, "b": 2}
+
 # Decorator usage
 @cache_service_list(ttl=120)
 def get_all_services():
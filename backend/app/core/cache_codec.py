@@ -0,0 +1,204 @@
+"""
+Encoding of cached values.
+
+Every value is stored as a 3-byte header followed by the payload:
+
+    0x01 | serializer tag | compression tag | payload
+
+so each key records how it was written and readers decode any mix of
+formats (values from before the header existed are plain JSON text).
+Serializers: msgpack, orjson or the stdlib json module; compression: zstd,
+lz4 or zlib, applied only to payloads of at least `compress_min_bytes` and
+kept only when it actually saves space. datetimes and dates survive the
+round trip with their type.
+
+The fastest installed libraries are used unless CACHE_SERIALIZER /
+CACHE_COMPRESSION name one; more can be added with register_serializer()
+and register_compressor().
+"""
+import json
+import logging
+import zlib
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+try:
+    import lz4.frame
+    LZ4_AVAILABLE = True
+except ImportError:
+    LZ4_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MAGIC = 0x01
+NO_COMPRESSION = b"-"
+
+# name -> (tag, dumps, loads); tag -> name
+_serializers: Dict[str, Tuple[bytes, Callable[[Any], bytes], Callable[[bytes], Any]]] = {}
+_serializer_tags: Dict[bytes, str] = {}
+_compressors: Dict[str, Tuple[bytes, Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {}
+_compressor_tags: Dict[bytes, str] = {}
+
+
+class CodecError(ValueError):
+    pass
+
+
+def register_serializer(name: str, tag: bytes, dumps: Callable[[Any], bytes], loads: Callable[[bytes], Any]):
+    """Add a serializer; tag is the single byte recorded in each value's header"""
+    _serializers[name] = (tag, dumps, loads)
+    _serializer_tags[tag] = name
+
+
+def register_compressor(name: str, tag: bytes, compress: Callable[[bytes], bytes], decompress: Callable[[bytes], bytes]):
+    _compressors[name] = (tag, compress, decompress)
+    _compressor_tags[tag] = name
+
+
+# --- datetimes ----------------------------------------------------------
+#
+# JSON flavours tag them as {"__dt__": iso} / {"__date__": iso}; msgpack
+# uses extension types.
+
+_DATETIME_EXT = 1
+_DATE_EXT = 2
+
+
+def _tag_dates(value):
+    if isinstance(value, datetime):
+        return {"__dt__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def _untag_dates(obj: dict):
+    if len(obj) == 1:
+        if "__dt__" in obj:
+            return datetime.fromisoformat(obj["__dt__"])
+        if "__date__" in obj:
+            return date.fromisoformat(obj["__date__"])
+    return obj
+
+
+def _json_dumps(value) -> bytes:
+    return json.dumps(value, default=_tag_dates, separators=(",", ":")).encode()
+
+
+def _json_loads(data: bytes):
+    return json.loads(data, object_hook=_untag_dates)
+
+
+register_serializer("json", b"j", _json_dumps, _json_loads)
+
+if ORJSON_AVAILABLE:
+    def _orjson_dumps(value) -> bytes:
+        return orjson.dumps(value, default=_tag_dates, option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+    def _orjson_loads(data: bytes):
+        # orjson has no object_hook; payloads with tagged dates take the json module's
+        if b'"__dt__"' in data or b'"__date__"' in data:
+            return _json_loads(data)
+        return orjson.loads(data)
+
+    register_serializer("orjson", b"o", _orjson_dumps, _orjson_loads)
+
+if MSGPACK_AVAILABLE:
+    def _msgpack_default(value):
+        if isinstance(value, datetime):
+            return msgpack.ExtType(_DATETIME_EXT, value.isoformat().encode())
+        if isinstance(value, date):
+            return msgpack.ExtType(_DATE_EXT, value.isoformat().encode())
+        raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+    def _msgpack_ext(code: int, data: bytes):
+        if code == _DATETIME_EXT:
+            return datetime.fromisoformat(data.decode())
+        if code == _DATE_EXT:
+            return date.fromisoformat(data.decode())
+        return msgpack.ExtType(code, data)
+
+    register_serializer(
+        "msgpack", b"m",
+        lambda value: msgpack.packb(value, default=_msgpack_default, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, ext_hook=_msgpack_ext, raw=False, strict_map_key=False),
+    )
+
+register_compressor("zlib", b"z", lambda data: zlib.compress(data, 1), zlib.decompress)
+
+if LZ4_AVAILABLE:
+    register_compressor("lz4", b"4", lz4.frame.compress, lz4.frame.decompress)
+
+if ZSTD_AVAILABLE:
+    _zstd_compressor = zstandard.ZstdCompressor(level=3)
+    _zstd_decompressor = zstandard.ZstdDecompressor()
+    register_compressor(
+        "zstd", b"s",
+        _zstd_compressor.compress,
+        # Frames written by compress() carry their size, so this is one allocation
+        _zstd_decompressor.decompress,
+    )
+
+
+def _pick(choice: str, available: Dict, preference: Tuple[str, ...], kind: str) -> Optional[str]:
+    if choice in ("", "auto"):
+        return next((name for name in preference if name in available), None)
+    if choice == "none":
+        return None
+    if choice not in available:
+        fallback = next((name for name in preference if name in available), None)
+        logger.warning(f"Cache {kind} '{choice}' is not installed; using {fallback or 'none'}")
+        return fallback
+    return choice
+
+
+class CacheCodec:
+    def __init__(self, serializer: str = "auto", compression: str = "auto", compress_min_bytes: int = 1024):
+        self.serializer = _pick(serializer, _serializers, ("msgpack", "orjson", "json"), "serializer")
+        self.compression = _pick(compression, _compressors, ("zstd", "lz4", "zlib"), "compression")
+        self.compress_min_bytes = compress_min_bytes
+
+    def dumps(self, value: Any) -> bytes:
+        tag, dumps, _ = _serializers[self.serializer]
+        payload = dumps(value)
+        compression = NO_COMPRESSION
+        if self.compression and len(payload) >= self.compress_min_bytes:
+            compression_tag, compress, _ = _compressors[self.compression]
+            packed = compress(payload)
+            if len(packed) < len(payload):
+                payload, compression = packed, compression_tag
+        return bytes([MAGIC]) + tag + compression + payload
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        if isinstance(data, str):
+            data = data.encode()
+        if not data or data[0] != MAGIC:
+            return _json_loads(data)  # Written before values had a header
+        serializer = _serializer_tags.get(data[1:2])
+        if serializer is None:
+            raise CodecError(f"Unknown cache serializer {data[1:2]!r}")
+        payload = data[3:]
+        if data[2:3] != NO_COMPRESSION:
+            compressor = _compressor_tags.get(data[2:3])
+            if compressor is None:
+                raise CodecError(f"Unknown cache compression {data[2:3]!r}")
+            payload = _compressors[compressor][2](payload)
+        return _serializers[serializer][2](payload)
@@ -31,6 +31,14 @@ class Settings(BaseSettings):
     # Redis (optional - for caching)
     REDIS_URL: Optional[str] = None
     REDIS_ENABLED: bool = False
+    REDIS_MAX_CONNECTIONS: int = 50  # asyncio connection pool, per event loop
+    CACHE_L1_MAX_ENTRIES: int = 10000  # In-process cache in front of Redis
+    CACHE_L1_MAX_BYTES: int = 67108864  # 64 MB of encoded values
+    CACHE_L1_TTL_SECONDS: int = 30  # Local copies of Redis entries live at most this long
+    CACHE_GENERATION_CHECK_SECONDS: int = 1  # How often workers re-read prefix generations from Redis
+    CACHE_SERIALIZER: str = "auto"  # auto (msgpack > orjson > json), msgpack, orjson, json
+    CACHE_COMPRESSION: str = "auto"  # auto (zstd > lz4 > zlib), zstd, lz4, zlib, none
+    CACHE_COMPRESS_MIN_BYTES: int = 1024  # Smaller values are stored uncompressed
     
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = [
@@ -67,13 +75,52 @@ class Settings(BaseSettings):
     SSH_KEY_PATH: str = "./keys"
     SSH_CONNECTION_TIMEOUT: int = 30
     MAX_SSH_SESSIONS: int = 10
+    SSH_POOL_IDLE_SECONDS: int = 300  # Close pooled stats connections idle this long
+    SSH_POOL_WORKERS: int = 32  # Threads for blocking SSH stats/auto-heal calls
     
     # Docker
     DOCKER_HOST: str = "unix:///var/run/docker.sock"
     
+    # Service Monitor
+    MONITOR_MAX_CONCURRENT_CHECKS: int = 200  # Global cap on in-flight checks
+    MONITOR_TCP_CONCURRENCY: int = 100
+    MONITOR_HTTP_CONCURRENCY: int = 50
+    MONITOR_ICMP_CONCURRENCY: int = 100
+    MONITOR_SCRIPT_CONCURRENCY: int = 4  # Each script check spawns a subprocess
+    MONITOR_SNMP_CONCURRENCY: int = 50
+    MONITOR_RESYNC_SECONDS: int = 300  # Reconcile the check schedule with the DB
+    MONITOR_HTTP2: bool = False  # Needs the optional 'h2' package
+    MONITOR_HTTP_MAX_BODY_BYTES: int = 65536  # Stop reading HTTP check bodies past this size
+    MONITOR_FLUSH_INTERVAL_MS: int = 500  # Write-behind interval for check results
+    MONITOR_FLUSH_MAX_ROWS: int = 500  # Flush early once this many results are buffered
+    
+    # History Rollups (0 = keep forever)
+    HISTORY_RAW_RETENTION_DAYS: int = 7
+    HISTORY_1M_RETENTION_DAYS: int = 14
+    HISTORY_1H_RETENTION_DAYS: int = 180
+    HISTORY_1D_RETENTION_DAYS: int = 0
+    HISTORY_MAX_POINTS: int = 1000  # Series queries pick the finest resolution under this
+    
+    # Database Maintenance (0 = keep forever)
+    TRAP_RETENTION_DAYS: int = 0  # Opt in, e.g. 90; traps were never pruned before
+    AUDIT_RETENTION_DAYS: int = 0  # Opt in, e.g. 365; check audit requirements first
+    DB_PRUNE_BATCH_SIZE: int = 5000  # Rows deleted per transaction
+    DB_VACUUM_PAGES: int = 2000  # SQLite pages returned per incremental vacuum run
+    DB_VACUUM_CONVERT: bool = False  # Convert an existing DB with one full VACUUM at startup
+    
     # Service Discovery
     MDNS_ENABLED: bool = True
-    DISCOVERY_INTERVAL_SECONDS: int = 300
+    DISCOVERY_CONTINUOUS: bool = False  # Rescan configured subnets in the background
+    DISCOVERY_INTERVAL_SECONDS: int = 300  # Default per-subnet cadence
+    DISCOVERY_MISS_THRESHOLD: int = 2  # Missed refreshes before a host counts as gone
+    DISCOVERY_ENRICH_MAX_AGE_HOURS: int = 24  # Re-enrich unchanged hosts after this long
+    DISCOVERY_PORT_TIMEOUT_MS: int = 500
+    DISCOVERY_MAX_PORT_PROBES: int = 2048  # Upper bound for concurrent TCP probes (adaptive below it)
+    DISCOVERY_SNMP_TIMEOUT_MS: int = 1000  # Per request; a batch of hosts shares the window
+    DISCOVERY_SNMP_INTERFACES: bool = False  # Also walk ifTable when enriching
+    DISCOVERY_SHARD_MIN_ADDRESSES: int = 65536  # Sweeps this large are split across processes
+    DISCOVERY_SHARD_PROCESSES: int = 0  # 0 = one per CPU
+    OUI_DB_PATH: str = ""  # Comma-separated local vendor registries (IEEE CSV, oui.txt, manuf)
     
     # Security Policies
     MAX_LOGIN_ATTEMPTS: int = 5
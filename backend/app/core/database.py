@@ -1,3 +1,6 @@
+import logging
+import time
+from sqlalchemy import delete, inspect, text
 from sqlmodel import SQLModel, create_engine, Session, select
 from .config import settings
 from app.models.user import User
@@ -8,8 +11,107 @@ from app.core.security import get_password_hash
 connect_args = {"check_same_thread": False}
 engine = create_engine(settings.DATABASE_URL, echo=True, connect_args=connect_args)
 
+logger = logging.getLogger(__name__)
+
+# Single-column indexes made redundant by a composite index with the same leading column
+OBSOLETE_INDEXES = {
+    "servicehistory": ["ix_servicehistory_service_id"],
+    "servicehistory_1m": ["ix_servicehistory_1m_service_id"],
+    "servicehistory_1h": ["ix_servicehistory_1h_service_id"],
+    "servicehistory_1d": ["ix_servicehistory_1d_service_id"],
+    "snmptrap": ["ix_snmptrap_service_id"],
+}
+
+def _is_file_sqlite(bind) -> bool:
+    return bind.dialect.name == "sqlite" and bind.url.database not in (None, "", ":memory:")
+
+def enable_incremental_vacuum(bind=engine, rebuild: bool = None):
+    """
+    Switch a SQLite file to auto_vacuum=INCREMENTAL so pruning can hand pages
+    back with PRAGMA incremental_vacuum. New databases switch for free;
+    existing ones need a full VACUUM (minutes and about twice the file size
+    in free disk on a large database), which only runs when `rebuild` /
+    DB_VACUUM_CONVERT opts in.
+    """
+    if not _is_file_sqlite(bind):
+        return
+    if rebuild is None:
+        rebuild = settings.DB_VACUUM_CONVERT
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            return
+        has_tables = bool(inspect(conn).get_table_names())
+        if has_tables and not rebuild:
+            logger.warning(
+                "Database is not in incremental auto_vacuum mode, so pruned space stays in the file. "
+                "Set DB_VACUUM_CONVERT=true for one startup, or run "
+                "'PRAGMA auto_vacuum = INCREMENTAL; VACUUM;' while the app is stopped."
+            )
+            return
+        conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        if has_tables:
+            logger.info("Rebuilding database once to enable incremental vacuum...")
+            conn.exec_driver_sql("VACUUM")
+
+def upgrade_schema(bind=engine):
+    """
+    Bring an existing database up to the current models: create_all() only
+    creates missing tables, so add nullable columns and indexes introduced
+    since and drop the indexes they replace.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    with bind.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns and column.nullable:
+                    logger.info(f"Adding column {table.name}.{column.name}")
+                    column_type = column.type.compile(dialect=conn.dialect)
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    logger.info(f"Creating index {index.name}")
+                    index.create(conn)
+            for name in OBSOLETE_INDEXES.get(table.name, []):
+                if name in existing:
+                    logger.info(f"Dropping index {name}")
+                    conn.execute(text(f'DROP INDEX "{name}"'))
+
+def delete_in_batches(bind, table, whereclause, batch_size: int = 5000, pause: float = 0.05) -> int:
+    """
+    Delete matching rows a batch at a time, committing between batches so
+    writers (the monitor's result sink) are never locked out for long.
+    Returns the number of rows deleted.
+    """
+    pk = list(table.primary_key.columns)[0]
+    total = 0
+    while True:
+        with bind.begin() as conn:
+            batch = select(pk).where(whereclause).limit(batch_size)
+            deleted = conn.execute(delete(table).where(pk.in_(batch))).rowcount
+        total += deleted
+        if deleted < batch_size:
+            return total
+        time.sleep(pause)
+
+def incremental_vacuum(bind=engine, pages: int = 2000) -> int:
+    """Return up to `pages` free pages to the OS. Returns the free pages left."""
+    if not _is_file_sqlite(bind):
+        return 0
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # sqlite3's execute() only steps the pragma once (one page);
+        # executescript() runs it to completion
+        conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+        return conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+
 def init_db():
+    enable_incremental_vacuum()
     SQLModel.metadata.create_all(engine)
+    upgrade_schema()
     
     with Session(engine) as session:
         user = session.exec(select(User).where(User.username == "admin")).first()
@@ -53,6 +53,7 @@ class GracefulShutdown:
             from app.core.cache import cache
             if cache.redis_client:
                 try:
+                    await cache.aclose()
                     cache.redis_client.close()
                     logger.info("✅ Redis connection closed")
                 except Exception as e:
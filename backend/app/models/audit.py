@@ -1,8 +1,15 @@
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 class AuditLog(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_auditlog_timestamp", "timestamp"),
+        Index("ix_auditlog_username_timestamp", "username", "timestamp"),
+        Index("ix_auditlog_action_timestamp", "action", "timestamp"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     username: str
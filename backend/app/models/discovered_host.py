@@ -0,0 +1,26 @@
+from typing import Optional
+from datetime import datetime
+from sqlmodel import Field, SQLModel
+
+class DiscoveredHost(SQLModel, table=True):
+    """Last known state of every host seen by network discovery"""
+    ip: str = Field(primary_key=True)
+    subnet: str = Field(index=True)  # Configured CIDR the host was found in
+
+    hostname: Optional[str] = Field(default=None)
+    mac_address: Optional[str] = Field(default=None)
+    vendor: Optional[str] = Field(default=None)
+    open_ports: str = Field(default="[]")  # JSON list
+    has_snmp: bool = Field(default=False)
+    snmp_descr: Optional[str] = Field(default=None)
+    snmp_name: Optional[str] = Field(default=None)
+    snmp_object_id: Optional[str] = Field(default=None)
+    snmp_uptime: Optional[int] = Field(default=None)  # Seconds, when last enriched
+    snmp_interfaces: Optional[str] = Field(default=None)  # JSON list of ifTable rows
+
+    is_alive: bool = Field(default=True, index=True)
+    misses: int = Field(default=0)  # Consecutive refreshes without an answer
+    first_seen: datetime = Field(default_factory=datetime.utcnow)
+    last_seen: datetime = Field(default_factory=datetime.utcnow)
+    last_changed: datetime = Field(default_factory=datetime.utcnow)
+    enriched_at: Optional[datetime] = Field(default=None)  # Last hostname/vendor/SNMP lookup
@@ -1,13 +1,59 @@
 from typing import Optional
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 class ServiceHistory(SQLModel, table=True):
+    __table_args__ = (
+        # Per-service reads ordered by time; time-only scans for rollups and retention
+        Index("ix_servicehistory_service_id_timestamp", "service_id", "timestamp"),
+        Index("ix_servicehistory_timestamp", "timestamp"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    service_id: int = Field(index=True, foreign_key="service.id")
+    service_id: int = Field(foreign_key="service.id")
     is_active: bool
     latency_ms: int
     cpu_usage: Optional[float] = None
     ram_usage: Optional[float] = None
     disk_usage: Optional[float] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+
+class RollupBase(SQLModel):
+    """Per-service aggregate of the checks that fell into one time bucket"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    service_id: int = Field(foreign_key="service.id")
+    bucket: datetime = Field(index=True)  # Bucket start (UTC)
+    samples: int
+    up_samples: int
+    uptime: float  # up_samples / samples
+    latency_min: Optional[int] = None
+    latency_avg: Optional[float] = None
+    latency_max: Optional[int] = None
+    latency_p95: Optional[float] = None  # Exact for 1m, estimated from child p95s above that
+    cpu_usage: Optional[float] = None  # Averages over the samples that reported a value
+    ram_usage: Optional[float] = None
+    disk_usage: Optional[float] = None
+
+
+class ServiceHistory1m(RollupBase, table=True):
+    __tablename__ = "servicehistory_1m"
+    __table_args__ = (Index("ix_servicehistory_1m_service_id_bucket", "service_id", "bucket", unique=True),)
+
+
+class ServiceHistory1h(RollupBase, table=True):
+    __tablename__ = "servicehistory_1h"
+    __table_args__ = (Index("ix_servicehistory_1h_service_id_bucket", "service_id", "bucket", unique=True),)
+
+
+class ServiceHistory1d(RollupBase, table=True):
+    __tablename__ = "servicehistory_1d"
+    __table_args__ = (Index("ix_servicehistory_1d_service_id_bucket", "service_id", "bucket", unique=True),)
+
+
+class HistoryRollupState(SQLModel, table=True):
+    """How far each rollup level has been computed; buckets before watermark are final"""
+    level: str = Field(primary_key=True)
+    watermark: datetime
+    last_id: Optional[int] = None  # 1m only: highest ServiceHistory id seen by a rollup run
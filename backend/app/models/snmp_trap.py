@@ -1,10 +1,16 @@
 from typing import Optional
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 class SnmpTrap(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_snmptrap_service_id_timestamp", "service_id", "timestamp"),
+        Index("ix_snmptrap_timestamp", "timestamp"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    service_id: Optional[int] = Field(default=None, foreign_key="service.id", index=True)
+    service_id: Optional[int] = Field(default=None, foreign_key="service.id")
     source_ip: str = Field(index=True)
     oid: str
     value: str
@@ -0,0 +1,133 @@
+"""
+Deadline-ordered scheduler for service checks.
+
+Services are kept in a min-heap keyed by their next due time, so finding the
+next check is O(1) and every schedule/reschedule is O(log n). Entries are
+invalidated lazily: updating or removing a service bumps its generation and
+stale heap items are skipped when they reach the top.
+"""
+import heapq
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Matches the old 10 second polling tick; stops a zero interval from busy-looping
+MIN_CHECK_INTERVAL = 10
+
+
+class CheckScheduler:
+    """Thread-safe min-heap of (due_at, service_id) on a monotonic clock"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Heap items: (due_at, generation, service_id)
+        self._heap: List[Tuple[float, int, int]] = []
+        # service_id -> [interval, generation, due_at or None while in flight]
+        self._entries: Dict[int, list] = {}
+        self._generation = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, service_id: int) -> bool:
+        with self._lock:
+            return service_id in self._entries
+
+    def _push(self, service_id: int, due_at: float) -> bool:
+        """Push a new heap item for service_id. Caller must hold the lock."""
+        self._generation += 1
+        entry = self._entries[service_id]
+        entry[1] = self._generation
+        entry[2] = due_at
+        head = self._peek()
+        heapq.heappush(self._heap, (due_at, self._generation, service_id))
+
+        # Stale items pile up when services are rescheduled often; rebuild the
+        # heap once they outnumber live entries.
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [
+                (e[2], e[1], sid) for sid, e in self._entries.items() if e[2] is not None
+            ]
+            heapq.heapify(self._heap)
+
+        return head is None or due_at < head
+
+    def _peek(self) -> Optional[float]:
+        """Due time of the earliest live entry. Caller must hold the lock."""
+        while self._heap:
+            due_at, generation, service_id = self._heap[0]
+            entry = self._entries.get(service_id)
+            if entry is not None and entry[1] == generation and entry[2] is not None:
+                return due_at
+            heapq.heappop(self._heap)
+        return None
+
+    def schedule(self, service_id: int, interval: Optional[int], delay: Optional[float] = None) -> bool:
+        """
+        Add or update a service.
+
+        Args:
+            service_id: Service primary key
+            interval: Seconds between checks
+            delay: Seconds until the next check. Defaults to one interval from now.
+
+        Returns:
+            True if this entry became the earliest deadline (the caller should
+            wake whoever is sleeping on the old one).
+        """
+        interval = max(interval or 0, MIN_CHECK_INTERVAL)
+        with self._lock:
+            entry = self._entries.get(service_id)
+            if entry is not None and entry[2] is None:
+                # Check in flight: just pick up the new interval when it finishes
+                entry[0] = interval
+                return False
+
+            self._entries[service_id] = [interval, 0, None]
+            return self._push(service_id, self._clock() + (interval if delay is None else max(delay, 0)))
+
+    def remove(self, service_id: int) -> bool:
+        """Drop a service. Its heap item is discarded lazily."""
+        with self._lock:
+            return self._entries.pop(service_id, None) is not None
+
+    def reschedule(self, service_id: int) -> bool:
+        """Schedule the next check one interval from now, after a check completes"""
+        with self._lock:
+            entry = self._entries.get(service_id)
+            if entry is None:
+                return False
+            return self._push(service_id, self._clock() + entry[0])
+
+    def pop_due(self, now: Optional[float] = None) -> List[int]:
+        """
+        Pop every service whose deadline has passed.
+
+        Popped services stay registered but are marked in flight, so they are
+        not handed out again until reschedule() is called.
+        """
+        now = self._clock() if now is None else now
+        due = []
+        with self._lock:
+            while True:
+                due_at = self._peek()
+                if due_at is None or due_at > now:
+                    break
+                _, _, service_id = heapq.heappop(self._heap)
+                self._entries[service_id][2] = None
+                due.append(service_id)
+        return due
+
+    def next_delay(self) -> Optional[float]:
+        """Seconds until the next check is due (0 if overdue), or None if empty"""
+        with self._lock:
+            due_at = self._peek()
+        if due_at is None:
+            return None
+        return max(due_at - self._clock(), 0.0)
+
+    def service_ids(self) -> List[int]:
+        with self._lock:
+            return list(self._entries)
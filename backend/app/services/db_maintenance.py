@@ -0,0 +1,59 @@
+"""
+Scheduled database maintenance: retention pruning and incremental vacuum.
+
+Expired rows are deleted in bounded batches (one short transaction each) so
+the monitor's writes are never blocked for long, then SQLite is asked to
+return a bounded number of free pages to the OS.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.database import delete_in_batches, engine, incremental_vacuum
+from app.models.audit import AuditLog
+from app.models.snmp_trap import SnmpTrap
+from app.services.history_rollup import history_rollup
+
+# (table, timestamp column, retention setting)
+PRUNED_TABLES = [
+    (SnmpTrap.__table__, "timestamp", "TRAP_RETENTION_DAYS"),
+    (AuditLog.__table__, "timestamp", "AUDIT_RETENTION_DAYS"),
+]
+
+
+class DatabaseMaintenance:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def prune(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Delete expired traps and audit entries (blocking)"""
+        now = now or datetime.utcnow()
+        deleted = {}
+        for table, column, setting in PRUNED_TABLES:
+            days = getattr(settings, setting)
+            if days <= 0:
+                continue
+            cutoff = now - timedelta(days=days)
+            deleted[table.name] = delete_in_batches(
+                self.engine, table, table.c[column] < cutoff, batch_size=settings.DB_PRUNE_BATCH_SIZE
+            )
+        return deleted
+
+    def run(self):
+        """Hourly job: prune every table, then reclaim free pages"""
+        try:
+            deleted = self.prune()
+            deleted.update({
+                f"history_{resolution}": count
+                for resolution, count in history_rollup.apply_retention().items()
+            })
+            free_pages = incremental_vacuum(self.engine, settings.DB_VACUUM_PAGES)
+            if any(deleted.values()):
+                logger.info(f"Database maintenance removed {deleted}, {free_pages} free pages left")
+        except Exception as e:
+            logger.error(f"Database maintenance failed: {e}")
+
+
+db_maintenance = DatabaseMaintenance(engine)
@@ -1,25 +1,114 @@
 import asyncio
+import json
+import multiprocessing
+import os
+import queue
 import socket
 import subprocess
 import platform
 import ipaddress
 import logging
-import re
-from typing import List, Dict, Optional
-from datetime import datetime
+from typing import AsyncIterator, List, Dict, Optional
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
 
-from app.services.resolver import resolve_hostname
+from app.services.resolver import mdns_browser, mdns_index
+from app.services.reverse_dns import ptr_resolver
 from app.services.vendor import lookup_vendor
-
-# Try to import SNMP library, but make it optional
-try:
-    from pysnmp.hlapi import *
-    SNMP_AVAILABLE = True
-except ImportError:
-    SNMP_AVAILABLE = False
+from app.services.snmp_enrichment import snmp_enricher
+from app.services.icmp import get_pinger
+from app.services.neighbours import NeighbourTable
+from app.services.scan_events import ScanEventHub, classify_device, diff_results
+from app.services.port_scan import PortScanner, OPEN, COMMON_PORTS, SERVICE_PORTS, BUILTIN_PROFILES, load_profiles
+from app.services.host_inventory import host_inventory, host_to_device
+from app.services.ip_ranges import Range, count_addresses, iter_chunks, parse_targets, split_ranges
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+SWEEP_CHUNK = 4096  # Addresses pinged (and materialised) at a time
+
+# Set in sweep worker processes
+_shard_results = None
+
+
+def _init_shard_worker(results):
+    global _shard_results
+    _shard_results = results
+
+
+def _run_shard(ranges: List[Range], options: Dict) -> int:
+    """
+    Sweep one shard in a worker process. Live hosts (MAC and open ports) and
+    progress go to the results queue; the parent enriches them.
+    """
+    engine = DiscoveryEngine()
+    engine.max_concurrent = options["max_concurrent"]
+    engine.scan_ports = options["ports"]
+    engine.port_scanner = PortScanner(timeout=engine.port_timeout, max_concurrency=options["max_port_probes"])
+    announced = set(options["announced"])
+
+    async def probe(ip):
+        return await engine._probe_host(ip, ip in announced)
+
+    async def sweep():
+        reported = 0
+        async for host in engine._scan_hosts(engine._sweep(ranges), probe):
+            _shard_results.put(("host", host))
+            if engine.scan_progress - reported >= 256:
+                _shard_results.put(("progress", engine.scan_progress - reported))
+                reported = engine.scan_progress
+        _shard_results.put(("progress", engine.scan_progress - reported))
+        return engine.scan_progress
+
+    try:
+        scanned = asyncio.run(sweep())
+    except BaseException as e:
+        _shard_results.put(("done", repr(e)))
+        raise
+    _shard_results.put(("done", None))
+    return scanned
+
+
+def parse_subnet_schedule(value: Optional[str], default_interval: int) -> List[tuple]:
+    """
+    [(cidr, interval_seconds)] from the scan_subnets setting, whose entries
+    are CIDR strings or {"cidr": ..., "interval": seconds}.
+    """
+    try:
+        entries = json.loads(value) if value else []
+    except ValueError:
+        return []
+    schedule = []
+    for entry in entries if isinstance(entries, list) else []:
+        if isinstance(entry, str):
+            schedule.append((entry, default_interval))
+        elif isinstance(entry, dict) and entry.get("cidr"):
+            schedule.append((entry["cidr"], max(int(entry.get("interval") or default_interval), 30)))
+    return schedule
+
+
+def load_scan_config() -> tuple:
+    """(subnet schedule, port profile ports) from the settings table"""
+    from sqlmodel import Session
+    from app.core.database import engine
+    from app.models.settings import Setting
+
+    with Session(engine) as session:
+        subnets = session.get(Setting, "scan_subnets")
+        custom = session.get(Setting, "scan_port_profiles")
+        selected = session.get(Setting, "scan_port_profile")
+        schedule = parse_subnet_schedule(subnets.value if subnets else None, settings.DISCOVERY_INTERVAL_SECONDS)
+        profiles = load_profiles(custom.value if custom else None)
+        profile = "default"
+        if selected and selected.value:
+            try:
+                profile = str(json.loads(selected.value))
+            except ValueError:
+                profile = selected.value
+    return schedule, profiles.get(profile, BUILTIN_PROFILES["default"])
+
+
 class DiscoveryEngine:
     def __init__(self):
         self.os_type = platform.system().lower()
@@ -28,20 +117,183 @@ class DiscoveryEngine:
         self.last_scan_time = None
         self.scan_progress = 0
         self.total_ips = 0
+        # Results of the last completed scan, the baseline for diffs
+        self.previous_results = []
+        self.last_diff = None
+        self.events = ScanEventHub()
+        
+        # Continuous discovery: background task and per-subnet next refresh (loop time)
+        self._continuous_task = None
+        self._next_refresh: Dict[str, float] = {}
         
         # Production settings
         self.max_concurrent = 100  # Max concurrent scans
         self.ping_timeout = 2.0  # seconds
-        self.port_timeout = 0.5  # seconds
+        self.port_timeout = settings.DISCOVERY_PORT_TIMEOUT_MS / 1000  # seconds
         self.max_retries = 2
+        self.sweep_timeout = 0.4  # seconds per ICMP sweep pass
+        
+        # Hosts that answered the ICMP sweep of the current scan (None: no sweep ran)
+        self._icmp_alive = None
+        self.neighbours = NeighbourTable()
+        # TCP probes of the current scan, each (ip, port) at most once
+        self.port_scanner = PortScanner(timeout=self.port_timeout)
+        self.scan_ports = BUILTIN_PROFILES["default"]
         
     async def start(self):
-        """Placeholder for background mDNS or passive discovery"""
-        pass
+        """Start passive mDNS browsing and continuous discovery when enabled"""
+        if settings.MDNS_ENABLED:
+            try:
+                await mdns_browser.start()
+                logger.info("mDNS browsing started")
+            except Exception as e:
+                logger.warning(f"mDNS browsing unavailable: {e}")
+        if settings.DISCOVERY_CONTINUOUS and self._continuous_task is None:
+            self._continuous_task = asyncio.create_task(self._continuous_loop())
+            logger.info("Continuous discovery started")
+
+    async def stop(self):
+        """Cancel background discovery and stop mDNS browsing"""
+        if self._continuous_task:
+            self._continuous_task.cancel()
+            self._continuous_task = None
+        try:
+            await mdns_browser.stop()
+        except Exception as e:
+            logger.debug(f"Stopping mDNS browsing failed: {e}")
 
-    def stop(self):
-        """Cancel any active scan tasks if tracked"""
-        pass
+    async def _continuous_loop(self):
+        while True:
+            try:
+                delay = await self._refresh_due_subnets()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Continuous discovery failed: {e}")
+                delay = 60
+            await asyncio.sleep(delay)
+
+    async def _refresh_due_subnets(self) -> float:
+        """Refresh every subnet whose cadence is up; returns seconds until the next one is due"""
+        schedule, ports = await asyncio.to_thread(load_scan_config)
+        if not schedule:
+            local_ip = self._get_local_ip()
+            schedule = [(f"{'.'.join(local_ip.split('.')[:3])}.0/24", settings.DISCOVERY_INTERVAL_SECONDS)]
+        loop = asyncio.get_running_loop()
+        for cidr, interval in schedule:
+            if self.is_scanning:
+                break  # A manual scan covers it; try again shortly
+            if loop.time() >= self._next_refresh.get(cidr, 0):
+                if await self.refresh_subnet(cidr, ports) is not None:
+                    self._next_refresh[cidr] = loop.time() + interval
+        next_due = min(self._next_refresh.get(cidr, 0) for cidr, _ in schedule)
+        return min(max(next_due - loop.time(), 1.0), 60.0)
+
+    async def refresh_subnet(self, cidr: str, ports: List[int] = None) -> Optional[Dict]:
+        """
+        Incremental rescan of one subnet against the host table. Known-alive
+        hosts are re-checked first (ICMP, ARP, then their known open ports),
+        then the rest of the range is swept with ICMP/ARP only. Only new,
+        changed or stale hosts are enriched (ports, hostname, vendor, SNMP).
+        Shares is_scanning with scan_network, so the two never overlap;
+        returns None when a scan is already running.
+        """
+        if self.is_scanning:
+            logger.info(f"Skipping refresh of {cidr}: a scan is in progress")
+            return None
+        self.is_scanning = True
+        try:
+            return await self._refresh_subnet(cidr, ports)
+        finally:
+            self.is_scanning = False
+
+    async def _refresh_subnet(self, cidr: str, ports: Optional[List[int]]) -> Dict:
+        ports = ports or BUILTIN_PROFILES["default"]
+        now = datetime.utcnow()
+        known = await asyncio.to_thread(host_inventory.load, cidr)
+        known_alive = [ip for ip, host in known.items() if host.is_alive]
+        scanner = PortScanner(timeout=self.port_timeout, max_concurrency=settings.DISCOVERY_MAX_PORT_PROBES)
+        pinger = get_pinger()
+
+        # 1. Known-alive hosts, then 2. the dead space, SWEEP_CHUNK addresses at a time
+        ranges, _ = parse_targets([cidr])
+        known_set = set(known_alive)
+
+        def batches():
+            for start in range(0, len(known_alive), SWEEP_CHUNK):
+                yield known_alive[start:start + SWEEP_CHUNK]
+            for chunk in iter_chunks(ranges, SWEEP_CHUNK):
+                dead_space = [ip for ip in chunk if ip not in known_set]
+                if dead_space:
+                    yield dead_space
+
+        answered = set()
+        table = {}
+        for chunk in batches():
+            if pinger:
+                answered |= set(await pinger.ping_many(chunk, timeout=self.sweep_timeout, retries=self.max_retries - 1))
+            else:
+                await self.neighbours.prime(chunk)
+            table = await self.neighbours.refresh()
+            answered |= {ip for ip in chunk if ip in table or mdns_index.get(ip)}
+
+        # Known hosts that ignore ICMP and are off-link: try the ports they had open
+        def known_ports(ip):
+            return json.loads(known[ip].open_ports or "[]")
+
+        silent = [ip for ip in known_alive if ip not in answered]
+        replies = await asyncio.gather(*(scanner.any_open(ip, known_ports(ip) or COMMON_PORTS) for ip in silent))
+        answered |= {ip for ip, replied in zip(silent, replies) if replied}
+
+        # Cheap change check: same MAC and every known open port still open
+        stale_before = now - timedelta(hours=settings.DISCOVERY_ENRICH_MAX_AGE_HOURS)
+        rechecked = [ip for ip in answered if ip in known and known[ip].is_alive]
+        await asyncio.gather(*(scanner.scan_host(ip, known_ports(ip)) for ip in rechecked))
+        unchanged = []
+        for ip in rechecked:
+            host = known[ip]
+            same_mac = table.get(ip) in (None, host.mac_address)
+            ports_open = set(known_ports(ip)) <= set(scanner.open_ports(ip))
+            fresh = host.enriched_at is not None and host.enriched_at > stale_before
+            if same_mac and ports_open and fresh:
+                unchanged.append(ip)
+        to_enrich = sorted(answered - set(unchanged))
+
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        async def enrich(ip):
+            async with semaphore:
+                return await self._enrich_host(ip, table.get(ip), scanner, ports)
+
+        devices = [d for d in await asyncio.gather(*(enrich(ip) for ip in to_enrich), return_exceptions=True)
+                   if isinstance(d, dict)]
+
+        previous = {ip: host_to_device(host) for ip, host in known.items() if host.is_alive}
+        deltas = [classify_device(previous, device) for device in devices]
+        changed = [delta["device"]["ip"] for delta in deltas if delta["change"] != "unchanged"]
+        missed = [ip for ip in known_alive if ip not in answered]
+
+        await asyncio.to_thread(host_inventory.record, cidr, devices, now, changed)
+        await asyncio.to_thread(host_inventory.touch, unchanged, now)
+        gone = await asyncio.to_thread(host_inventory.miss, missed, now, settings.DISCOVERY_MISS_THRESHOLD)
+
+        for delta in deltas:
+            if delta["change"] != "unchanged":
+                self.events.publish("device", subnet=cidr, **delta)
+        for device in gone:
+            self.events.publish("gone", subnet=cidr, device=device)
+        summary = {
+            "subnet": cidr,
+            "alive": len(answered),
+            "enriched": len(devices),
+            "new": sum(delta["change"] == "new" for delta in deltas),
+            "changed": sum(delta["change"] == "changed" for delta in deltas),
+            "gone": len(gone),
+            "probes": scanner.stats["probes"],
+        }
+        self.events.publish("refresh", **summary)
+        logger.info(f'🔄 Refreshed {cidr}: {summary}')
+        return summary
 
     def get_status(self):
         """Return current scan status"""
@@ -50,12 +302,14 @@ class DiscoveryEngine:
             "progress": self.scan_progress,
             "total": self.total_ips,
             "result_count": len(self.last_results),
-            "last_scan_time": self.last_scan_time
+            "last_scan_time": self.last_scan_time,
+            "has_diff": self.last_diff is not None
         }
     
-    async def scan_network(self, cidrs: List[str] = None):
+    async def scan_network(self, cidrs: List[str] = None, ports: List[int] = None):
         """
-        Production-grade network scan with multiple detection methods
+        Production-grade network scan with multiple detection methods.
+        `ports` (a port profile) are probed on every live host.
         """
         if self.is_scanning:
             logger.warning("Scan already in progress")
@@ -65,6 +319,12 @@ class DiscoveryEngine:
         self.last_results = []
         self.scan_progress = 0
         self.last_scan_time = None
+        completed = False
+        progress_task = None
+        self.scan_ports = ports or BUILTIN_PROFILES["default"]
+        self.port_scanner = PortScanner(
+            timeout=self.port_timeout, max_concurrency=settings.DISCOVERY_MAX_PORT_PROBES
+        )
         
         try:
             # Determine scan targets
@@ -75,53 +335,229 @@ class DiscoveryEngine:
             else:
                 logger.info(f'🌐 Scanning configured CIDRs: {cidrs}')
             
-            # Generate all IPs to scan
-            all_ips = []
-            for cidr in cidrs:
-                subnet_ips = self._get_subnet_ips(cidr)
-                all_ips.extend(subnet_ips)
-                logger.info(f'📡 CIDR {cidr} expanded to {len(subnet_ips)} IPs')
-            
-            # Remove duplicates and sort
-            all_ips = sorted(list(set(all_ips)))
-            self.total_ips = len(all_ips)
-            logger.info(f'🔍 Total IPs to scan: {len(all_ips)}')
-
-            # Scan with controlled concurrency
-            semaphore = asyncio.Semaphore(self.max_concurrent)
-            found_count = 0
-            
-            async def scan_with_semaphore(ip):
-                async with semaphore:
-                    result = await self._scan_host_comprehensive(ip)
-                    self.scan_progress += 1
-                    return result
+            # Targets as merged integer ranges; addresses are generated chunk by chunk
+            ranges, v6_ranges = parse_targets(cidrs)
+            if v6_ranges:
+                logger.warning(f'IPv6 ranges are not swept actively ({count_addresses(v6_ranges)} addresses skipped)')
+            self.total_ips = count_addresses(ranges)
+            logger.info(f'🔍 Total IPs to scan: {self.total_ips} in {len(ranges)} range(s)')
+            self.events.publish("started", total=self.total_ips, cidrs=cidrs)
+            progress_task = asyncio.create_task(self._publish_progress())
+
+            shards = self._shard_count(self.total_ips)
+            if shards > 1:
+                logger.info(f'🧩 Sharding the sweep across {shards} processes')
+                devices = self._scan_sharded(ranges, shards)
+            else:
+                devices = self._scan_hosts(self._sweep(ranges))
+
+            previous = {device["ip"]: device for device in self.previous_results}
             
-            # Process in batches for progress tracking
-            batch_size = 50
-            for i in range(0, len(all_ips), batch_size):
-                batch = all_ips[i:i+batch_size]
-                batch_num = i//batch_size + 1
-                total_batches = (len(all_ips)-1)//batch_size + 1
-                logger.debug(f'🔎 Scanning batch {batch_num}/{total_batches}: IPs {batch[0]} to {batch[-1]}')
-                
-                tasks = [scan_with_semaphore(ip) for ip in batch]
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                
-                # Collect results
-                for result in results:
-                    if result and not isinstance(result, Exception):
-                        self.last_results.append(result)
-                        found_count += 1
-                        logger.info(f'✅ Found device: {result["ip"]} ({result.get("hostname", "no hostname")})')
-                
-                logger.debug(f'📊 Progress: {self.scan_progress}/{self.total_ips}, found {found_count} devices')
+            # Devices stream out as they are found; subscribers get them as deltas
+            async for device in devices:
+                self.last_results.append(device)
+                logger.info(f'✅ Found device: {device["ip"]} ({device.get("hostname", "no hostname")})')
+                self.events.publish("device", **classify_device(previous, device))
+            completed = True
         
         finally:
+            if progress_task:
+                progress_task.cancel()
             self.is_scanning = False
+            self._icmp_alive = None
+            logger.info(
+                f'🔌 Port probes: {self.port_scanner.stats["probes"]} sent, '
+                f'{self.port_scanner.stats["cached"]} served from cache'
+            )
             self.scan_progress = self.total_ips
             self.last_scan_time = datetime.now().isoformat()
             logger.info(f'✨ Scan complete! Found {len(self.last_results)} devices out of {self.total_ips} IPs scanned')
+            if completed:
+                # Hosts only count as gone after a full scan
+                self.last_diff = diff_results(self.previous_results, self.last_results)
+                self.previous_results = self.last_results
+                self.events.publish("diff", **self.last_diff)
+                await self._record_scan(cidrs, self.last_results)
+            self.events.publish(
+                "complete",
+                completed=completed,
+                found=len(self.last_results),
+                total=self.total_ips,
+                last_scan_time=self.last_scan_time
+            )
+
+    async def _record_scan(self, cidrs: List[str], devices: List[Dict]):
+        """Store a manual scan's devices in the host table under the CIDR that contains them"""
+        networks = []
+        for cidr in cidrs:
+            try:
+                networks.append((cidr, ipaddress.ip_network(cidr, strict=False)))
+            except ValueError:
+                continue
+        by_subnet: Dict[str, List[Dict]] = {}
+        for device in devices:
+            address = ipaddress.ip_address(device["ip"])
+            subnet = next((cidr for cidr, net in networks if address in net), device["ip"])
+            by_subnet.setdefault(subnet, []).append(device)
+        now = datetime.utcnow()
+        try:
+            for subnet, found in by_subnet.items():
+                # Same change test as refresh_subnet, against the stored hosts
+                known = await asyncio.to_thread(host_inventory.load, subnet)
+                previous = {ip: host_to_device(host) for ip, host in known.items() if host.is_alive}
+                changed = [device["ip"] for device in found
+                           if classify_device(previous, device)["change"] == "changed"]
+                await asyncio.to_thread(host_inventory.record, subnet, found, now, changed)
+        except Exception as e:
+            logger.error(f"Failed to store scan results: {e}")
+
+    async def _publish_progress(self, interval: float = 0.5):
+        """Progress events while a scan runs, only when something moved"""
+        reported = None
+        while True:
+            await asyncio.sleep(interval)
+            if self.scan_progress != reported:
+                reported = self.scan_progress
+                self.events.publish("progress", progress=self.scan_progress, total=self.total_ips)
+
+    async def _sweep(self, ranges: List[Range]) -> AsyncIterator[str]:
+        """
+        Addresses to scan, SWEEP_CHUNK at a time: each chunk is pinged from the
+        shared ICMP socket (or ARP-primed) just before its hosts are scanned.
+        """
+        pinger = get_pinger()
+        self._icmp_alive = set() if pinger else None
+        for chunk in iter_chunks(ranges, SWEEP_CHUNK):
+            if pinger:
+                alive = await pinger.ping_many(chunk, timeout=self.sweep_timeout, retries=self.max_retries - 1)
+                self._icmp_alive.update(alive)
+                logger.debug(f'📶 ICMP sweep: {len(alive)}/{len(chunk)} hosts replied')
+            else:
+                # The sweep resolves on-link neighbours as a side effect; without it, prime ARP directly
+                await self.neighbours.prime(chunk)
+            await self.neighbours.refresh()
+            for ip in chunk:
+                yield ip
+
+    def _shard_count(self, total: int) -> int:
+        """Processes for a sweep of `total` addresses (1 = scan in this process)"""
+        if total < settings.DISCOVERY_SHARD_MIN_ADDRESSES:
+            return 1
+        processes = settings.DISCOVERY_SHARD_PROCESSES or os.cpu_count() or 1
+        return max(1, min(processes, total // SWEEP_CHUNK or 1))
+
+    async def _scan_sharded(self, ranges: List[Range], shards: int) -> AsyncIterator[Dict]:
+        """
+        Sweep shards of the ranges in worker processes, each with its own
+        event loop, ICMP socket and port-probe budget. The shards only find
+        live hosts and their open ports; hostname, vendor and SNMP are added
+        here, where the vendor database and the mDNS index already live.
+        """
+        def enrich(host):
+            return self._enrich_host(
+                host["ip"], host["mac_address"], self.port_scanner, self.scan_ports, host["open_ports"]
+            )
+
+        async for device in self._scan_hosts(self._shard_hosts(ranges, shards), enrich, progress=False):
+            yield device
+
+    async def _shard_hosts(self, ranges: List[Range], shards: int) -> AsyncIterator[Dict]:
+        """Live hosts from the shard processes, merged over one queue"""
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        options = {
+            "ports": self.scan_ports,
+            "max_concurrent": self.max_concurrent,
+            "max_port_probes": max(settings.DISCOVERY_MAX_PORT_PROBES // shards, 64),
+            "announced": [host["ip"] for host in mdns_index.hosts()],
+        }
+        loop = asyncio.get_running_loop()
+        pieces = split_ranges(ranges, shards)
+        pool = ProcessPoolExecutor(
+            max_workers=len(pieces), mp_context=context, initializer=_init_shard_worker, initargs=(results,)
+        )
+        futures = [loop.run_in_executor(pool, _run_shard, piece, options) for piece in pieces]
+        running = len(futures)
+        try:
+            while running:
+                try:
+                    kind, payload = await asyncio.to_thread(results.get, True, 0.5)
+                except queue.Empty:
+                    if all(future.done() for future in futures):
+                        break  # A worker died without reporting
+                    continue
+                if kind == "host":
+                    yield payload
+                elif kind == "progress":
+                    self.scan_progress += payload
+                elif kind == "done":
+                    running -= 1
+                    if payload:
+                        logger.error(f"Sweep shard failed: {payload}")
+        finally:
+            processes = list((getattr(pool, "_processes", None) or {}).values())
+            pool.shutdown(wait=False, cancel_futures=True)
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()  # Interrupted scan: stop sweeping
+
+    async def _scan_hosts(self, ips, scan=None, progress: bool = True) -> AsyncIterator[Dict]:
+        """
+        Yield devices as they are found. max_concurrent workers pull items
+        from one queue, so a slow host only holds up its own worker. `scan`
+        turns an item into a device or None (default: a full scan of an
+        address); `progress` counts each item towards scan_progress.
+        """
+        scan = scan or self._scan_host_comprehensive
+        work: asyncio.Queue = asyncio.Queue(maxsize=self.max_concurrent * 2)
+        found: asyncio.Queue = asyncio.Queue()
+        worker_done = object()
+
+        async def produce():
+            if hasattr(ips, "__aiter__"):
+                try:
+                    async for ip in ips:
+                        await work.put(ip)
+                finally:
+                    await ips.aclose()  # Runs the source's cleanup now, not at garbage collection
+            else:
+                for ip in ips:
+                    await work.put(ip)
+            for _ in range(self.max_concurrent):
+                await work.put(None)
+
+        async def worker():
+            try:
+                while True:
+                    ip = await work.get()
+                    if ip is None:
+                        return
+                    try:
+                        device = await scan(ip)
+                    except Exception as e:
+                        logger.debug(f"Scanning {ip} failed: {e}")
+                        device = None
+                    if progress:
+                        self.scan_progress += 1
+                    if device:
+                        found.put_nowait(device)
+            finally:
+                found.put_nowait(worker_done)
+
+        producer = asyncio.create_task(produce())
+        workers = [asyncio.create_task(worker()) for _ in range(self.max_concurrent)]
+        try:
+            running = len(workers)
+            while running:
+                item = await found.get()
+                if item is worker_done:
+                    running -= 1
+                else:
+                    yield item
+        finally:
+            for task in (producer, *workers):
+                task.cancel()
+            await asyncio.gather(producer, *workers, return_exceptions=True)
     
     def _get_local_ip(self) -> str:
         """Get local IP address"""
@@ -135,28 +571,28 @@ class DiscoveryEngine:
             s.close()
         return ip
 
-    def _get_subnet_ips(self, ip_or_cidr: str) -> List[str]:
-        """Generate list of IPs from CIDR notation"""
-        try:
-            if '/' in ip_or_cidr:
-                net = ipaddress.ip_network(ip_or_cidr, strict=False)
-                return [str(ip) for ip in net.hosts()]
-            else:
-                parts = ip_or_cidr.split(".")
-                base = ".".join(parts[:3])
-                return [f"{base}.{i}" for i in range(1, 255)]
-        except Exception as e:
-            logger.error(f"Error parsing IP/CIDR {ip_or_cidr}: {e}")
-            return []
-    
     async def _scan_host_comprehensive(self, ip: str) -> Optional[Dict]:
         """
         Comprehensive multi-method host scanning
         Uses ARP, ICMP ping, and TCP port checks for maximum reliability
         """
-        # Method 1: Try ARP first (most reliable on local network)
+        host = await self._probe_host(ip, mdns_index.get(ip) is not None)
+        if host is None:
+            return None
+        return await self._enrich_host(ip, host["mac_address"], self.port_scanner, self.scan_ports, host["open_ports"])
+
+    async def _probe_host(self, ip: str, announced: bool) -> Optional[Dict]:
+        """
+        Liveness, MAC and open ports of one address (the part of a scan that
+        sweep shards do). Announced hosts skip the port probes: their ports
+        come from mDNS, so open_ports is None.
+        """
+        # Method 0: Announced over mDNS (live index, no probing needed)
         mac = await self._get_mac_from_arp(ip)
-        is_alive = mac is not None
+        is_alive = announced
+        
+        # Method 1: Try ARP first (most reliable on local network)
+        is_alive = is_alive or mac is not None
         
         # Method 2: Try ICMP ping if ARP failed
         if not is_alive:
@@ -169,20 +605,44 @@ class DiscoveryEngine:
         if not is_alive:
             return None
         
-        # Host is alive - gather full details
+        open_ports = None
+        if not announced:
+            await self.port_scanner.scan_host(ip, [*self.scan_ports, *SERVICE_PORTS.values()])
+            open_ports = self.port_scanner.open_ports(ip)
+        return {"ip": ip, "mac_address": mac, "open_ports": open_ports}
+    
+    async def _enrich_host(self, ip: str, mac: Optional[str], scanner: PortScanner, ports: List[int],
+                           open_ports: Optional[List[int]] = None) -> Dict:
+        """
+        Full details of a live host: ports, hostname, vendor and SNMP. Hosts
+        announced over mDNS take hostname and ports from their announcements;
+        `open_ports` skips probing when the ports are already known.
+        """
+        announced = mdns_index.get(ip)
+        if announced:
+            open_ports = sorted({port for port in announced["services"].values() if port})
+            hostname = announced["hostname"]
+        else:
+            if open_ports is None:
+                # Probe its ports in one concurrent pass (already probed ones come from the cache)
+                await scanner.scan_host(ip, [*ports, *SERVICE_PORTS.values()])
+                open_ports = scanner.open_ports(ip)
+            hostname = await self._resolve_hostname(ip)
+        
         device = {
             "ip": ip,
-            "hostname": await self._resolve_hostname(ip),
+            "hostname": hostname,
             "mac_address": mac if mac else await self._get_mac_from_arp(ip),  # Try again
             "vendor": None,
             "is_active": True,
-            "has_ssh": await self._check_port(ip, 22),
-            "has_rdp": await self._check_port(ip, 3389),
-            "has_vnc": await self._check_port(ip, 5900),
-            "has_http": await self._check_port(ip, 80),
-            "has_https": await self._check_port(ip, 443),
+            **{f"has_{name}": port in open_ports for name, port in SERVICE_PORTS.items()},
+            "open_ports": open_ports,
             "has_snmp": False,
             "snmp_descr": None,
+            "snmp_name": None,
+            "snmp_object_id": None,
+            "snmp_uptime": None,
+            "snmp_interfaces": None,
             "discovered_at": datetime.now().isoformat()
         }
         
@@ -190,21 +650,29 @@ class DiscoveryEngine:
         if device["mac_address"]:
             device["vendor"] = await lookup_vendor(device["mac_address"])
         
-        # SNMP check if available
-        if SNMP_AVAILABLE:
-            loop = asyncio.get_event_loop()
-            snmp_active, snmp_descr = await loop.run_in_executor(
-                None,
-                self._check_snmp_sync,
-                ip
-            )
-            device["has_snmp"] = snmp_active
-            device["snmp_descr"] = snmp_descr
+        # System group (and interfaces) in one GETBULK over the shared async socket
+        snmp = await self._check_snmp(ip)
+        if snmp is not None:
+            device["has_snmp"] = True
+            device["snmp_descr"] = snmp["descr"] or ""
+            device["snmp_name"] = snmp["name"]
+            device["snmp_object_id"] = snmp["object_id"]
+            device["snmp_uptime"] = snmp["uptime"]
+            device["snmp_interfaces"] = snmp.get("interfaces")
         
         return device
     
     async def _ping_host_icmp(self, ip: str) -> bool:
-        """ICMP ping with retries"""
+        """ICMP ping with retries, in-process when an ICMP socket is available"""
+        if self._icmp_alive is not None:
+            return ip in self._icmp_alive
+
+        pinger = get_pinger()
+        if pinger:
+            rtt = await pinger.ping(ip, timeout=self.ping_timeout, retries=self.max_retries - 1)
+            return rtt is not None
+
+        # Fallback: one ping process per attempt
         for attempt in range(self.max_retries):
             try:
                 param = '-n' if self.os_type == 'windows' else '-c'
@@ -231,96 +699,32 @@ class DiscoveryEngine:
         return False
     
     async def _check_common_ports(self, ip: str) -> bool:
-        """Check common ports to detect firewalled devices"""
-        common_ports = [80, 443, 22, 3389, 445, 139, 21, 23]
-        tasks = [self._check_port(ip, port) for port in common_ports]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        return any(r is True for r in results)
+        """Check common ports to detect firewalled devices (an RST also proves the host is up)"""
+        return await self.port_scanner.any_open(ip, COMMON_PORTS)
     
     async def _get_mac_from_arp(self, ip: str) -> Optional[str]:
-        """Get MAC address from ARP table"""
+        """Get MAC address from the kernel neighbour table (read in bulk, cached briefly)"""
         try:
-            cmd = ['arp', '-a', ip] if self.os_type == 'windows' else ['arp', '-n', ip]
-            proc = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.DEVNULL
-            )
-            stdout, _ = await proc.communicate()
-            
-            if proc.returncode == 0:
-                output = stdout.decode('cp1252' if self.os_type == 'windows' else 'utf-8', errors='ignore')
-                
-                # Parse MAC address
-                mac_pattern = r'([0-9A-Fa-f]{2}[:-]){5}([0-9A-Fa-f]{2})'
-                match = re.search(mac_pattern, output)
-                if match:
-                    mac = match.group(0).replace('-', ':').upper()
-                    return mac
+            return await self.neighbours.lookup(ip)
         except Exception as e:
             logger.debug(f"ARP lookup failed for {ip}: {e}")
-        
-        return None
+            return None
     
     async def _resolve_hostname(self, ip: str) -> Optional[str]:
-        """Resolve IP to hostname"""
+        """Resolve IP to hostname (cached, coalesced PTR lookup; no executor threads)"""
         try:
-            loop = asyncio.get_event_loop()
-            hostname = await asyncio.wait_for(
-                loop.run_in_executor(
-                    None,
-                    lambda: socket.gethostbyaddr(ip)[0]
-                ),
-                timeout=2.0
-            )
-            return hostname
-        except:
+            return await ptr_resolver.lookup(ip)
+        except Exception as e:
+            logger.debug(f"Reverse DNS failed for {ip}: {e}")
             return None
     
     async def _check_port(self, ip: str, port: int) -> bool:
         """Check if a port is open"""
-        try:
-            reader, writer = await asyncio.wait_for(
-                asyncio.open_connection(ip, port),
-                timeout=self.port_timeout
-            )
-            writer.close()
-            await writer.wait_closed()
-            return True
-        except:
-            return False
-
-    def _check_snmp_sync(self, ip: str, community: str = 'public', port: int = 161) -> tuple:
-        """Synchronous SNMP check"""
-        if not SNMP_AVAILABLE:
-            return False, ""
-            
-        try:
-            is_ipv6 = False
-            try:
-                addr = ipaddress.ip_address(ip)
-                is_ipv6 = isinstance(addr, ipaddress.IPv6Address)
-            except ValueError:
-                pass
-
-            transport = Udp6TransportTarget((ip, port), timeout=1.0, retries=0) if is_ipv6 else UdpTransportTarget((ip, port), timeout=1.0, retries=0)
+        return await self.port_scanner.probe(ip, port) == OPEN
 
-            iterator = getCmd(
-                SnmpEngine(),
-                CommunityData(community, mpModel=1),
-                transport,
-                ContextData(),
-                ObjectType(ObjectIdentity('1.3.6.1.2.1.1.1.0'))
-            )
-            errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
-           
-            if errorIndication or errorStatus:
-                return False, ""
-           
-            descr = str(varBinds[0][1])
-            return True, descr
-        except:
-            return False, ""
+    async def _check_snmp(self, ip: str) -> Optional[Dict]:
+        """SNMP system group (plus interfaces if configured), None without an agent"""
+        return await snmp_enricher.enrich(ip, interfaces=settings.DISCOVERY_SNMP_INTERFACES)
 
 # Global instance
 discovery_engine = DiscoveryEngine()
@@ -0,0 +1,246 @@
+"""
+History analytics for one or many services over a time range.
+
+Reads the raw table or a rollup level (whichever is the finest one retained
+for the range that stays within a row budget) with a single query for all
+requested services, then computes per-bucket series, SLA uptime, MTTR/MTBF
+and latency percentiles on the server.
+"""
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+from statistics import median
+from typing import Dict, List, Optional
+
+from sqlmodel import Session, select
+
+from app.models.history import ServiceHistory
+from app.services.history_rollup import (
+    LEVELS_BY_NAME,
+    RESOLUTIONS,
+    combine_rollups,
+    floor_time,
+    history_rollup,
+    percentile,
+    weighted_percentile,
+)
+
+# Buckets offered when the caller does not pick one
+NICE_BUCKETS = [
+    timedelta(minutes=1), timedelta(minutes=5), timedelta(minutes=15),
+    timedelta(hours=1), timedelta(hours=6), timedelta(days=1), timedelta(days=7),
+]
+MAX_BUCKETS = 10000
+# Upper bound on source rows read per service
+MAX_SOURCE_ROWS = 20000
+
+BUCKET_PATTERN = re.compile(r"^(\d+)([mhd])$")
+BUCKET_UNITS = {"m": "minutes", "h": "hours", "d": "days"}
+
+# Raw rows in the same shape as rollup rows, so combine_rollups() handles both
+_Point = namedtuple(
+    "_Point",
+    "service_id bucket samples up_samples latency_min latency_avg latency_max latency_p95 cpu_usage ram_usage disk_usage",
+)
+
+
+def parse_bucket(value: str) -> timedelta:
+    """'5m', '1h', '1d' -> timedelta"""
+    match = BUCKET_PATTERN.match(value or "")
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid bucket '{value}', expected e.g. 5m, 1h or 1d")
+    return timedelta(**{BUCKET_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def format_bucket(size: timedelta) -> str:
+    seconds = int(size.total_seconds())
+    for unit, length in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds % length == 0:
+            return f"{seconds // length}{unit}"
+    return f"{seconds}s"
+
+
+def auto_bucket(start: datetime, end: datetime, max_points: int) -> timedelta:
+    span = end - start
+    for size in NICE_BUCKETS:
+        if span / size <= max_points:
+            return size
+    return NICE_BUCKETS[-1]
+
+
+def pick_source(start: datetime, end: datetime, bucket: timedelta, check_interval: int, now: Optional[datetime] = None) -> str:
+    """Finest retained resolution that is no coarser than the bucket and fits the row budget"""
+    now = now or datetime.utcnow()
+    span = (end - start).total_seconds()
+    fallback = None
+    for resolution in RESOLUTIONS:
+        keep_for = history_rollup.retention(resolution)
+        if keep_for is not None and start < now - keep_for:
+            continue
+        step = timedelta(seconds=check_interval) if resolution == "raw" else LEVELS_BY_NAME[resolution].size
+        if step > bucket and fallback is not None:
+            break
+        fallback = resolution
+        if span / max(step.total_seconds(), 1) <= MAX_SOURCE_ROWS:
+            return resolution
+    return fallback or RESOLUTIONS[-1]
+
+
+def _load_points(session: Session, source: str, service_ids: List[int], start: datetime, end: datetime) -> Dict[int, list]:
+    """One query for every service, grouped by service and ordered by time"""
+    points: Dict[int, list] = {service_id: [] for service_id in service_ids}
+    if source == "raw":
+        rows = session.exec(
+            select(
+                ServiceHistory.service_id, ServiceHistory.timestamp, ServiceHistory.is_active,
+                ServiceHistory.latency_ms, ServiceHistory.cpu_usage,
+                ServiceHistory.ram_usage, ServiceHistory.disk_usage,
+            )
+            .where(
+                ServiceHistory.service_id.in_(service_ids),
+                ServiceHistory.timestamp >= start,
+                ServiceHistory.timestamp < end,
+            )
+            .order_by(ServiceHistory.service_id, ServiceHistory.timestamp)
+        ).all()
+        for service_id, ts, active, latency, cpu, ram, disk in rows:
+            points[service_id].append(_Point(
+                service_id, ts, 1, 1 if active else 0, latency, latency, latency, latency, cpu, ram, disk
+            ))
+        return points
+
+    model = LEVELS_BY_NAME[source].model
+    rows = session.exec(
+        select(model)
+        .where(model.service_id.in_(service_ids), model.bucket >= start, model.bucket < end)
+        .order_by(model.service_id, model.bucket)
+    ).all()
+    for row in rows:
+        points[row.service_id].append(row)
+    return points
+
+
+def availability(points: list, step: Optional[timedelta]) -> dict:
+    """
+    Downtime, incidents, MTTR and MTBF from an ordered list of points.
+
+    A point counts as down when fewer than half of its samples were up. Each
+    point lasts until the next one, capped at `step` (the rollup size, or three
+    times the typical check gap for raw rows) so monitoring gaps are not
+    counted as uptime or downtime. The last point lasts one typical interval.
+    """
+    if not points:
+        return {"downtime_seconds": 0.0, "incidents": 0, "mttr_seconds": None, "mtbf_seconds": None}
+
+    if step is None:
+        gaps = [(b.bucket - a.bucket).total_seconds() for a, b in zip(points, points[1:])]
+        typical = median(gaps) if gaps else 60.0
+        cap = 3 * typical
+    else:
+        typical = cap = step.total_seconds()
+
+    up_time = down_time = 0.0
+    incidents = 0
+    previous_up = None
+    for index, point in enumerate(points):
+        is_up = point.up_samples * 2 >= point.samples
+        if index + 1 < len(points):
+            duration = min((points[index + 1].bucket - point.bucket).total_seconds(), cap)
+        else:
+            duration = typical
+        if is_up:
+            up_time += duration
+        else:
+            down_time += duration
+            if previous_up is not False:
+                incidents += 1
+        previous_up = is_up
+
+    return {
+        "downtime_seconds": round(down_time, 1),
+        "incidents": incidents,
+        "mttr_seconds": round(down_time / incidents, 1) if incidents else None,
+        "mtbf_seconds": round(up_time / incidents, 1) if incidents else None,
+    }
+
+
+def latency_summary(points: list, exact: bool) -> dict:
+    if not points:
+        return {"min": None, "avg": None, "max": None, "p50": None, "p95": None, "p99": None}
+    combined = combine_rollups(points)
+    if exact:
+        values = [p.latency_min for p in points]
+        p50, p95, p99 = (percentile(values, pct) for pct in (50, 95, 99))
+    else:
+        # Estimated from the per-bucket averages and p95s, weighted by sample count
+        p50 = weighted_percentile([(p.latency_avg, p.samples) for p in points], 50)
+        p95 = weighted_percentile([(p.latency_p95, p.samples) for p in points], 95)
+        p99 = weighted_percentile([(p.latency_p95, p.samples) for p in points], 99)
+    return {
+        "min": combined["latency_min"],
+        "avg": combined["latency_avg"],
+        "max": combined["latency_max"],
+        "p50": p50,
+        "p95": p95,
+        "p99": p99,
+    }
+
+
+def bucket_series(points: list, bucket: timedelta) -> List[dict]:
+    groups: Dict[datetime, list] = {}
+    for point in points:
+        groups.setdefault(floor_time(point.bucket, bucket), []).append(point)
+
+    series = []
+    for ts, members in groups.items():
+        combined = combine_rollups(members)
+        series.append({
+            "timestamp": ts,
+            "samples": combined["samples"],
+            "uptime_pct": round(combined["uptime"] * 100, 3),
+            "latency_avg": combined["latency_avg"],
+            "latency_p95": combined["latency_p95"],
+            "latency_max": combined["latency_max"],
+        })
+    return series
+
+
+def compute_analytics(
+    session: Session,
+    service_ids: List[int],
+    start: datetime,
+    end: datetime,
+    bucket: timedelta,
+    check_interval: int = 60,
+) -> dict:
+    """
+    Analytics for several services. check_interval (the smallest among the
+    services) sizes the raw-row budget when choosing the source resolution.
+    """
+    source = pick_source(start, end, bucket, check_interval)
+    points = _load_points(session, source, service_ids, start, end)
+    step = None if source == "raw" else LEVELS_BY_NAME[source].size
+
+    services = []
+    for service_id in service_ids:
+        service_points = points[service_id]
+        samples = sum(p.samples for p in service_points)
+        up = sum(p.up_samples for p in service_points)
+        services.append({
+            "service_id": service_id,
+            "summary": {
+                "samples": samples,
+                "uptime_pct": round(up / samples * 100, 3) if samples else None,
+                **availability(service_points, step),
+                "latency": latency_summary(service_points, exact=source == "raw"),
+            },
+            "series": bucket_series(service_points, bucket),
+        })
+
+    return {
+        "from": start,
+        "to": end,
+        "bucket": format_bucket(bucket),
+        "source": source,
+        "services": services,
+    }
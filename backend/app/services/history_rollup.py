@@ -0,0 +1,403 @@
+"""
+Time-series rollups for ServiceHistory.
+
+Raw check rows are aggregated into 1-minute buckets, 1-minute buckets into
+1-hour buckets and those into 1-day buckets. Each bucket holds the uptime
+ratio, min/avg/max/p95 latency and average CPU/RAM/disk for one service.
+A per-level watermark records how far each level is final, so every run only
+touches new data, and retention only deletes rows that a coarser level has
+already absorbed. Raw rows that arrive after their minute was rolled up are
+found by id and their buckets rebuilt.
+"""
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Type
+
+from loguru import logger
+from sqlalchemy import delete, func, insert
+from sqlmodel import Session, SQLModel, select
+
+from app.core.config import settings
+from app.core.database import delete_in_batches
+from app.models.history import (
+    HistoryRollupState,
+    RollupBase,
+    ServiceHistory,
+    ServiceHistory1d,
+    ServiceHistory1h,
+    ServiceHistory1m,
+)
+
+EPOCH = datetime(1970, 1, 1)
+
+# Raw rows normally land within one write-behind flush; wait this long before
+# treating a minute as complete. Later ones are caught by re-rolling.
+RAW_GRACE = timedelta(seconds=30)
+
+
+@dataclass(frozen=True)
+class RollupLevel:
+    name: str
+    model: Type[RollupBase]
+    size: timedelta
+    max_window: timedelta  # Most source time aggregated per query
+    retention_setting: str
+
+
+LEVELS = [
+    RollupLevel("1m", ServiceHistory1m, timedelta(minutes=1), timedelta(hours=6), "HISTORY_1M_RETENTION_DAYS"),
+    RollupLevel("1h", ServiceHistory1h, timedelta(hours=1), timedelta(days=7), "HISTORY_1H_RETENTION_DAYS"),
+    RollupLevel("1d", ServiceHistory1d, timedelta(days=1), timedelta(days=180), "HISTORY_1D_RETENTION_DAYS"),
+]
+LEVELS_BY_NAME = {level.name: level for level in LEVELS}
+RESOLUTIONS = ["raw"] + [level.name for level in LEVELS]
+
+
+def floor_time(ts: datetime, size: timedelta) -> datetime:
+    return EPOCH + ((ts - EPOCH) // size) * size
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return float(ordered[rank - 1])
+
+
+def weighted_percentile(pairs: List[tuple], pct: float) -> Optional[float]:
+    """Percentile of (value, weight) pairs, used to estimate p95 from child p95s"""
+    pairs = sorted(p for p in pairs if p[0] is not None)
+    total = sum(weight for _, weight in pairs)
+    if not total:
+        return None
+    threshold = pct / 100 * total
+    running = 0
+    for value, weight in pairs:
+        running += weight
+        if running >= threshold:
+            return float(value)
+    return float(pairs[-1][0])
+
+
+def _mean(values: List[float]) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return round(sum(values) / len(values), 2) if values else None
+
+
+def _weighted_mean(pairs: List[tuple]) -> Optional[float]:
+    pairs = [(v, w) for v, w in pairs if v is not None]
+    total = sum(w for _, w in pairs)
+    return round(sum(v * w for v, w in pairs) / total, 2) if total else None
+
+
+def summarise_raw(rows: list) -> dict:
+    """Aggregate raw ServiceHistory rows of one service and bucket"""
+    latencies = [r.latency_ms for r in rows]
+    up = sum(1 for r in rows if r.is_active)
+    return {
+        "samples": len(rows),
+        "up_samples": up,
+        "uptime": up / len(rows),
+        "latency_min": min(latencies),
+        "latency_avg": _mean(latencies),
+        "latency_max": max(latencies),
+        "latency_p95": percentile(latencies, 95),
+        "cpu_usage": _mean([r.cpu_usage for r in rows]),
+        "ram_usage": _mean([r.ram_usage for r in rows]),
+        "disk_usage": _mean([r.disk_usage for r in rows]),
+    }
+
+
+def combine_rollups(rows: list) -> dict:
+    """Aggregate finer rollup rows of one service and bucket"""
+    samples = sum(r.samples for r in rows)
+    up = sum(r.up_samples for r in rows)
+    return {
+        "samples": samples,
+        "up_samples": up,
+        "uptime": up / samples if samples else 0.0,
+        "latency_min": min((r.latency_min for r in rows if r.latency_min is not None), default=None),
+        "latency_avg": _weighted_mean([(r.latency_avg, r.samples) for r in rows]),
+        "latency_max": max((r.latency_max for r in rows if r.latency_max is not None), default=None),
+        "latency_p95": weighted_percentile([(r.latency_p95, r.samples) for r in rows], 95),
+        "cpu_usage": _weighted_mean([(r.cpu_usage, r.samples) for r in rows]),
+        "ram_usage": _weighted_mean([(r.ram_usage, r.samples) for r in rows]),
+        "disk_usage": _weighted_mean([(r.disk_usage, r.samples) for r in rows]),
+    }
+
+
+class HistoryRollupService:
+    def __init__(self, engine):
+        self.engine = engine
+
+    # ------------------------------------------------------------------
+    # Rollup
+    # ------------------------------------------------------------------
+
+    def run(self, now: Optional[datetime] = None, max_windows: int = 10) -> Dict[str, int]:
+        """
+        Advance every level as far as its source allows (blocking).
+        Returns the number of buckets written per level.
+        """
+        now = now or datetime.utcnow()
+        written = {}
+        with Session(self.engine) as session:
+            # Read first: rows inserted while this run works count as new next time
+            last_id = session.exec(select(func.max(ServiceHistory.id))).one()
+            self._reroll_late_rows(session, now, last_id)
+            for index, level in enumerate(LEVELS):
+                source = LEVELS[index - 1] if index else None
+                written[level.name] = 0
+                for _ in range(max_windows):
+                    count = self._roll_window(session, level, source, now)
+                    if count is None:
+                        break
+                    written[level.name] += count
+            state = session.get(HistoryRollupState, LEVELS[0].name)
+            if state is not None and last_id is not None:
+                state.last_id = last_id
+                session.add(state)
+                session.commit()
+        if any(written.values()):
+            logger.debug(f"History rollup wrote {written}")
+        return written
+
+    def _source_model(self, source: Optional[RollupLevel]) -> Type[SQLModel]:
+        return source.model if source else ServiceHistory
+
+    def _source_time(self, source: Optional[RollupLevel]):
+        return source.model.bucket if source else ServiceHistory.timestamp
+
+    def _roll_window(self, session: Session, level: RollupLevel, source: Optional[RollupLevel], now: datetime) -> Optional[int]:
+        """Aggregate the next window of complete buckets. Returns None when caught up."""
+        if source is None:
+            complete_until = floor_time(now - RAW_GRACE, level.size)
+        else:
+            source_watermark = self.get_watermark(session, source.name)
+            if source_watermark is None:
+                return None
+            complete_until = floor_time(source_watermark, level.size)
+
+        start = self.get_watermark(session, level.name)
+        source_time = self._source_time(source)
+        # Skip over gaps with no source data (first run, or monitor downtime)
+        query = select(func.min(source_time))
+        if start is not None:
+            query = query.where(source_time >= start)
+        first = session.exec(query).one()
+        if first is None:
+            return None
+        start = max(start or EPOCH, floor_time(first, level.size))
+
+        end = min(start + level.max_window, complete_until)
+        if end <= start:
+            return None
+
+        count = self._rebuild(session, level, source, start, end)
+        self._set_watermark(session, level.name, end)
+        session.commit()
+        return count
+
+    def _reroll_late_rows(self, session: Session, now: datetime, last_id: Optional[int]) -> int:
+        """
+        Rebuild the buckets of raw rows inserted below the 1m watermark since
+        the last run (a requeued result sink batch, a check that reported long
+        after it ran), at every level that has already passed them. Buckets
+        whose source rows retention may have removed are left alone.
+        Returns the number of buckets rebuilt across levels.
+        """
+        state = session.get(HistoryRollupState, LEVELS[0].name)
+        if state is None or state.last_id is None or last_id is None:
+            return 0
+        since = state.last_id if state.last_id <= last_id else 0  # Ids restart once the table is emptied
+        timestamps = session.exec(
+            select(ServiceHistory.timestamp)
+            .where(ServiceHistory.id > since, ServiceHistory.id <= last_id, ServiceHistory.timestamp < state.watermark)
+        ).all()
+
+        affected = set(timestamps)
+        source = None
+        rebuilt = 0
+        for level in LEVELS:
+            watermark = self.get_watermark(session, level.name)
+            keep_source = self.retention(source.name if source else "raw")
+            buckets = {floor_time(ts, level.size) for ts in affected}
+            buckets = {
+                bucket for bucket in buckets
+                if watermark is not None and bucket < watermark
+                and (keep_source is None or bucket >= now - keep_source)
+            }
+            for bucket in sorted(buckets):
+                self._rebuild(session, level, source, bucket, bucket + level.size)
+            rebuilt += len(buckets)
+            affected, source = buckets, level
+        if rebuilt:
+            session.commit()
+            logger.info(f"History rollup rebuilt {rebuilt} buckets for {len(timestamps)} late rows")
+        return rebuilt
+
+    def _rebuild(self, session: Session, level: RollupLevel, source: Optional[RollupLevel], start: datetime, end: datetime) -> int:
+        """Replace the level's buckets in [start, end) with ones aggregated from the source"""
+        source_time = self._source_time(source)
+        rows = session.exec(
+            select(self._source_model(source))
+            .where(source_time >= start, source_time < end)
+            .order_by(source_time)
+        ).all()
+
+        groups: Dict[tuple, list] = {}
+        for row in rows:
+            ts = row.bucket if source else row.timestamp
+            groups.setdefault((row.service_id, floor_time(ts, level.size)), []).append(row)
+
+        summarise = combine_rollups if source else summarise_raw
+        buckets = [
+            {"service_id": service_id, "bucket": bucket, **summarise(members)}
+            for (service_id, bucket), members in groups.items()
+        ]
+
+        table = level.model.__table__
+        # Delete first so re-running a window (e.g. after a crash) cannot duplicate buckets
+        session.execute(delete(table).where(table.c.bucket >= start, table.c.bucket < end))
+        if buckets:
+            session.execute(insert(table), buckets)
+        return len(buckets)
+
+    def get_watermark(self, session: Session, level: str) -> Optional[datetime]:
+        state = session.get(HistoryRollupState, level)
+        return state.watermark if state else None
+
+    def _set_watermark(self, session: Session, level: str, watermark: datetime):
+        state = session.get(HistoryRollupState, level)
+        if state is None:
+            state = HistoryRollupState(level=level, watermark=watermark)
+        state.watermark = watermark
+        session.add(state)
+
+    # ------------------------------------------------------------------
+    # Retention
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def retention(resolution: str) -> Optional[timedelta]:
+        """How long a resolution is kept, or None to keep it forever"""
+        if resolution == "raw":
+            days = settings.HISTORY_RAW_RETENTION_DAYS
+        else:
+            days = getattr(settings, LEVELS_BY_NAME[resolution].retention_setting)
+        return timedelta(days=days) if days > 0 else None
+
+    def apply_retention(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Delete rows past their retention (blocking), in batches. Rows that the
+        next level has not rolled up yet are kept regardless.
+        """
+        now = now or datetime.utcnow()
+        with Session(self.engine) as session:
+            watermarks = {level.name: self.get_watermark(session, level.name) for level in LEVELS}
+
+        deleted = {}
+        for index, resolution in enumerate(RESOLUTIONS):
+            keep_for = self.retention(resolution)
+            if keep_for is None:
+                continue
+            cutoff = now - keep_for
+            if index < len(LEVELS):
+                absorbed = watermarks[LEVELS[index].name]
+                if absorbed is None:
+                    continue
+                cutoff = min(cutoff, absorbed)
+
+            if resolution == "raw":
+                table, column = ServiceHistory.__table__, ServiceHistory.__table__.c.timestamp
+            else:
+                table = LEVELS_BY_NAME[resolution].model.__table__
+                column = table.c.bucket
+            deleted[resolution] = delete_in_batches(
+                self.engine, table, column < cutoff, batch_size=settings.DB_PRUNE_BATCH_SIZE
+            )
+        if any(deleted.values()):
+            logger.info(f"History retention removed {deleted}")
+        return deleted
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def pick_resolution(self, start: datetime, end: datetime, check_interval: int, max_points: int, now: Optional[datetime] = None) -> str:
+        """Finest resolution that is still retained for start and fits in max_points"""
+        now = now or datetime.utcnow()
+        span = max((end - start).total_seconds(), 1)
+        for resolution in RESOLUTIONS:
+            keep_for = self.retention(resolution)
+            if keep_for is not None and start < now - keep_for:
+                continue
+            step = check_interval if resolution == "raw" else LEVELS_BY_NAME[resolution].size.total_seconds()
+            if span / max(step, 1) <= max_points:
+                return resolution
+        return RESOLUTIONS[-1]
+
+    def query_series(
+        self,
+        session: Session,
+        service_id: int,
+        start: datetime,
+        end: datetime,
+        resolution: str,
+    ) -> List[dict]:
+        """Points for one service in [start, end), oldest first, in a uniform shape"""
+        if resolution == "raw":
+            rows = session.exec(
+                select(ServiceHistory)
+                .where(
+                    ServiceHistory.service_id == service_id,
+                    ServiceHistory.timestamp >= start,
+                    ServiceHistory.timestamp < end,
+                )
+                .order_by(ServiceHistory.timestamp)
+            ).all()
+            return [
+                {
+                    "timestamp": row.timestamp,
+                    "samples": 1,
+                    "uptime": 1.0 if row.is_active else 0.0,
+                    "latency_min": row.latency_ms,
+                    "latency_avg": row.latency_ms,
+                    "latency_max": row.latency_ms,
+                    "latency_p95": row.latency_ms,
+                    "cpu_usage": row.cpu_usage,
+                    "ram_usage": row.ram_usage,
+                    "disk_usage": row.disk_usage,
+                }
+                for row in rows
+            ]
+
+        model = LEVELS_BY_NAME[resolution].model
+        rows = session.exec(
+            select(model)
+            .where(model.service_id == service_id, model.bucket >= start, model.bucket < end)
+            .order_by(model.bucket)
+        ).all()
+        return [
+            {
+                "timestamp": row.bucket,
+                "samples": row.samples,
+                "uptime": row.uptime,
+                "latency_min": row.latency_min,
+                "latency_avg": row.latency_avg,
+                "latency_max": row.latency_max,
+                "latency_p95": row.latency_p95,
+                "cpu_usage": row.cpu_usage,
+                "ram_usage": row.ram_usage,
+                "disk_usage": row.disk_usage,
+            }
+            for row in rows
+        ]
+
+
+from app.core.database import engine
+
+history_rollup = HistoryRollupService(engine)
@@ -0,0 +1,133 @@
+"""
+Persistent table of discovered hosts.
+
+Continuous discovery compares each refresh against this table so only new
+or changed hosts are enriched, and hosts only count as gone after several
+consecutive refreshes without an answer. All methods are blocking; call them
+through asyncio.to_thread from the event loop.
+"""
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlmodel import Session, select
+
+from app.models.discovered_host import DiscoveredHost
+from app.services.port_scan import SERVICE_PORTS
+
+logger = logging.getLogger(__name__)
+
+# IPs per IN (...) query: SQLite before 3.32 allows only 999 bound variables
+BATCH_SIZE = 500
+
+
+def host_to_device(host: DiscoveredHost) -> Dict:
+    """Stored host in the shape of a scan result"""
+    open_ports = json.loads(host.open_ports or "[]")
+    return {
+        "ip": host.ip,
+        "hostname": host.hostname,
+        "mac_address": host.mac_address,
+        "vendor": host.vendor,
+        "is_active": host.is_alive,
+        **{f"has_{name}": port in open_ports for name, port in SERVICE_PORTS.items()},
+        "open_ports": open_ports,
+        "has_snmp": host.has_snmp,
+        "snmp_descr": host.snmp_descr,
+        "snmp_name": host.snmp_name,
+        "snmp_object_id": host.snmp_object_id,
+        "snmp_uptime": host.snmp_uptime,
+        "snmp_interfaces": json.loads(host.snmp_interfaces) if host.snmp_interfaces else None,
+        "discovered_at": host.last_changed.isoformat(),
+    }
+
+
+def _batches(ips: List[str]) -> Iterable[List[str]]:
+    for start in range(0, len(ips), BATCH_SIZE):
+        yield ips[start:start + BATCH_SIZE]
+
+
+class HostInventory:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def _select(self, session: Session, ips: List[str]) -> Iterable[DiscoveredHost]:
+        """Stored hosts among `ips`, queried a batch at a time"""
+        for batch in _batches(ips):
+            yield from session.exec(select(DiscoveredHost).where(DiscoveredHost.ip.in_(batch))).all()
+
+    def load(self, subnet: str) -> Dict[str, DiscoveredHost]:
+        with Session(self.engine) as session:
+            hosts = session.exec(select(DiscoveredHost).where(DiscoveredHost.subnet == subnet)).all()
+            return {host.ip: host for host in hosts}
+
+    def hosts(self, alive: Optional[bool] = None) -> List[DiscoveredHost]:
+        with Session(self.engine) as session:
+            query = select(DiscoveredHost).order_by(DiscoveredHost.ip)
+            if alive is not None:
+                query = query.where(DiscoveredHost.is_alive == alive)
+            return session.exec(query).all()
+
+    def record(self, subnet: str, devices: Iterable[Dict], now: datetime, changed: Iterable[str] = ()):
+        """Upsert freshly enriched hosts; `changed` IPs get last_changed bumped"""
+        changed = set(changed)
+        with Session(self.engine) as session:
+            for device in devices:
+                host = session.get(DiscoveredHost, device["ip"])
+                if host is None:
+                    host = DiscoveredHost(ip=device["ip"], subnet=subnet, first_seen=now, last_changed=now)
+                elif device["ip"] in changed or not host.is_alive:
+                    host.last_changed = now
+                host.subnet = subnet
+                host.hostname = device.get("hostname")
+                host.mac_address = device.get("mac_address")
+                host.vendor = device.get("vendor")
+                host.open_ports = json.dumps(device.get("open_ports") or [])
+                host.has_snmp = bool(device.get("has_snmp"))
+                host.snmp_descr = device.get("snmp_descr") or None
+                host.snmp_name = device.get("snmp_name")
+                host.snmp_object_id = device.get("snmp_object_id")
+                host.snmp_uptime = device.get("snmp_uptime")
+                interfaces = device.get("snmp_interfaces")
+                host.snmp_interfaces = json.dumps(interfaces) if interfaces is not None else None
+                host.is_alive = True
+                host.misses = 0
+                host.last_seen = now
+                host.enriched_at = now
+                session.add(host)
+            session.commit()
+
+    def touch(self, ips: Iterable[str], now: datetime):
+        """Hosts that answered and look unchanged"""
+        ips = list(ips)
+        if not ips:
+            return
+        with Session(self.engine) as session:
+            for host in self._select(session, ips):
+                host.last_seen = now
+                host.misses = 0
+                host.is_alive = True
+                session.add(host)
+            session.commit()
+
+    def miss(self, ips: Iterable[str], now: datetime, threshold: int) -> List[Dict]:
+        """Count a missed refresh; returns hosts that just crossed the threshold and are now gone"""
+        ips = list(ips)
+        if not ips:
+            return []
+        gone = []
+        with Session(self.engine) as session:
+            for host in self._select(session, ips):
+                host.misses += 1
+                if host.is_alive and host.misses >= threshold:
+                    host.is_alive = False
+                    host.last_changed = now
+                    gone.append(host_to_device(host))
+                session.add(host)
+            session.commit()
+        return gone
+
+
+from app.core.database import engine
+host_inventory = HostInventory(engine)
@@ -0,0 +1,296 @@
+"""
+Pooled HTTP check engine for the service monitor.
+
+One shared httpx connection pool (optionally HTTP/2) serves every HTTP check.
+Bodies are streamed and reading stops as soon as the expected substring is
+found or the byte cap is reached, so large pages cost a few KB, not the whole
+download. Each check reports per-phase timings (DNS, connect, TLS, TTFB).
+"""
+import asyncio
+import contextlib
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import httpcore
+import httpx
+from loguru import logger
+
+from app.services.resolver import AddressCache
+
+# HTTP/2 needs the optional h2 package (pip install httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+@dataclass
+class HttpCheckResult:
+    is_ok: bool
+    status_code: Optional[int] = None
+    body: str = ""
+    matched: Optional[bool] = None  # None when no expected substring was given
+    truncated: bool = False  # Stopped at the byte cap before the body ended
+    http_version: Optional[str] = None
+    error: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)  # Milliseconds per phase
+
+
+# Timings of the check running in the current task, for the network backend
+_current_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("http_check_timings", default=None)
+
+
+class _CachedDNSBackend(httpcore.AsyncNetworkBackend):
+    """
+    httpcore network backend that resolves hostnames through an AddressCache
+    before connecting. Requests keep their hostname, so connections are
+    pooled per host and TLS verifies and sends SNI for the name, not the IP.
+    """
+
+    def __init__(self, addresses: AddressCache):
+        self.addresses = addresses
+        self.backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        started = time.perf_counter()
+        try:
+            address = await asyncio.wait_for(self.addresses.resolve(host, port), timeout)
+        except asyncio.TimeoutError as e:
+            raise httpcore.ConnectTimeout(f"Resolving {host} timed out") from e
+        except OSError as e:
+            raise httpcore.ConnectError(str(e)) from e
+        timings = _current_timings.get()
+        if timings is not None and address != host:
+            timings["dns"] = round((time.perf_counter() - started) * 1000, 2)
+        return await self.backend.connect_tcp(address, port, timeout, local_address, socket_options)
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self.backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float):
+        await self.backend.sleep(seconds)
+
+
+# httpcore errors as the httpx ones callers catch, most specific first
+_ERRORS = (
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+@contextlib.contextmanager
+def _httpx_errors():
+    try:
+        yield
+    except Exception as e:
+        for core_error, httpx_error in _ERRORS:
+            if isinstance(e, core_error):
+                raise httpx_error(str(e)) from e
+        raise
+
+
+class _ResponseStream(httpx.AsyncByteStream):
+    def __init__(self, stream):
+        self.stream = stream
+
+    async def __aiter__(self):
+        with _httpx_errors():
+            async for chunk in self.stream:
+                yield chunk
+
+    async def aclose(self):
+        if hasattr(self.stream, "aclose"):
+            await self.stream.aclose()
+
+
+class _CachedDNSTransport(httpx.AsyncBaseTransport):
+    """httpx transport over an httpcore pool that connects through _CachedDNSBackend"""
+
+    def __init__(self, addresses: AddressCache, limits: httpx.Limits, http2: bool):
+        self.pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=True,
+            http2=http2,
+            network_backend=_CachedDNSBackend(addresses),
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with _httpx_errors():
+            response = await self.pool.handle_async_request(core_request)
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=_ResponseStream(response.stream),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self.pool.aclose()
+
+
+class _PhaseTimer:
+    """httpcore trace hook that records when each connection phase starts and ends"""
+
+    # trace event prefix -> reported phase
+    PHASES = {
+        "connection.connect_tcp": "connect",
+        "connection.start_tls": "tls",
+    }
+
+    def __init__(self):
+        self.started: Dict[str, float] = {}
+        self.timings: Dict[str, float] = {}
+        self.request_sent: Optional[float] = None
+
+    async def __call__(self, event_name: str, info: dict):
+        now = time.perf_counter()
+        prefix, _, stage = event_name.rpartition(".")
+
+        phase = self.PHASES.get(prefix)
+        if phase:
+            if stage == "started":
+                self.started[phase] = now
+            elif stage == "complete" and phase in self.started:
+                elapsed = round((now - self.started[phase]) * 1000, 2)
+                if phase == "connect":
+                    elapsed = round(elapsed - self.timings.get("dns", 0), 2)  # Resolved inside connect
+                self.timings[phase] = elapsed
+        elif prefix.endswith(".send_request_headers") and stage == "started":
+            self.request_sent = now
+        elif prefix.endswith(".receive_response_headers") and stage == "complete":
+            if self.request_sent is not None:
+                self.timings["ttfb"] = round((now - self.request_sent) * 1000, 2)
+
+
+class HttpCheckEngine:
+    """
+    Shared-pool HTTP checker. Must be used from the event loop that created it.
+
+    Connections resolve hostnames through an AddressCache (see
+    _CachedDNSBackend), which both caches DNS between checks and lets DNS
+    time be reported on its own.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 50,
+        http2: bool = False,
+        max_body_bytes: int = 65536,
+        addresses: Optional[AddressCache] = None
+    ):
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("HTTP/2 requested for checks but 'h2' is not installed, using HTTP/1.1")
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.max_body_bytes = max_body_bytes
+        self.addresses = addresses or AddressCache()
+        self.client = httpx.AsyncClient(
+            transport=_CachedDNSTransport(
+                self.addresses,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections
+                ),
+                http2=self.http2
+            )
+        )
+        # Latest timings per URL, for diagnostics
+        self.last_timings: OrderedDict = OrderedDict()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def check(self, url: str, timeout: float = 5, expected: Optional[str] = None) -> HttpCheckResult:
+        timer = _PhaseTimer()
+        started = time.perf_counter()
+        token = _current_timings.set(timer.timings)
+        try:
+            async with self.client.stream(
+                "GET", url, timeout=timeout, extensions={"trace": timer}
+            ) as response:
+                result = HttpCheckResult(
+                    is_ok=200 <= response.status_code < 400,
+                    status_code=response.status_code,
+                    http_version=response.http_version
+                )
+                body, result.matched, result.truncated = await self._read_body(response, expected)
+                result.body = body.decode(response.encoding or "utf-8", errors="ignore")
+        except (httpx.TimeoutException, asyncio.TimeoutError):
+            result = HttpCheckResult(is_ok=False, error="Timeout")
+        except (httpx.ConnectError, OSError):
+            result = HttpCheckResult(is_ok=False, error="Connection Refused")
+        except Exception as e:
+            result = HttpCheckResult(is_ok=False, error=str(e))
+        finally:
+            _current_timings.reset(token)
+
+        timer.timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+        result.timings = timer.timings
+        self._remember(url, result.timings)
+        return result
+
+    async def _read_body(self, response: httpx.Response, expected: Optional[str]) -> tuple:
+        """Stream the body until the expected bytes are seen or the cap is hit"""
+        needle = expected.encode() if expected else None
+        buf = bytearray()
+        matched = None if needle is None else False
+        truncated = False
+        done = False
+
+        # Stopping mid-body closes the connection. Small bodies of known
+        # length are cheaper to drain so the keep-alive connection survives.
+        length = response.headers.get("content-length")
+        drain = length is not None and length.isdigit() and int(length) <= self.max_body_bytes
+
+        async for chunk in response.aiter_bytes():
+            if done:
+                continue
+            # Only rescan the new chunk plus enough overlap for a split match
+            search_from = max(len(buf) - len(needle) + 1, 0) if needle else 0
+            buf.extend(chunk)
+            if needle and buf.find(needle, search_from) != -1:
+                matched = True
+                done = True
+            elif len(buf) >= self.max_body_bytes:
+                truncated = True
+                del buf[self.max_body_bytes:]
+                done = True
+            if done and not drain:
+                break
+
+        return bytes(buf), matched, truncated
+
+    def _remember(self, url: str, timings: Dict[str, float]):
+        self.last_timings[url] = timings
+        self.last_timings.move_to_end(url)
+        while len(self.last_timings) > 1024:
+            self.last_timings.popitem(last=False)
@@ -0,0 +1,239 @@
+"""
+In-process ICMP echo for discovery sweeps.
+
+Every probe on an event loop goes out through one ICMP socket: an
+unprivileged datagram socket (Linux with net.ipv4.ping_group_range, macOS)
+or a raw socket when running as root. Replies are matched to probes by source
+address and sequence number, and each probe has its own deadline, so
+thousands of probes can be outstanding at once and a whole sweep costs about
+one timeout window plus send pacing - instead of one `ping` process per IP.
+
+When neither socket type is available (no privileges, Windows proactor loop)
+get_pinger() returns None and callers fall back to the ping command.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import random
+import socket
+import struct
+import weakref
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+
+
+class PingUnavailable(Exception):
+    """No ICMP socket could be opened on this host"""
+
+
+async def sock_sendto(loop: asyncio.AbstractEventLoop, sock: socket.socket, data: bytes, address) -> int:
+    """loop.sock_sendto, which only exists from Python 3.11: send now, or once the socket is writable"""
+    if hasattr(loop, "sock_sendto"):
+        return await loop.sock_sendto(sock, data, address)
+    while True:
+        try:
+            return sock.sendto(data, address)
+        except (BlockingIOError, InterruptedError):
+            pass
+        writable = loop.create_future()
+        fd = sock.fileno()
+        try:
+            loop.add_writer(fd, lambda: writable.done() or writable.set_result(None))
+        except NotImplementedError:
+            await asyncio.sleep(0.001)  # Proactor loop: no readiness callbacks, just retry
+            continue
+        try:
+            await writable
+        finally:
+            loop.remove_writer(fd)
+
+
+def checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(identifier: int, sequence: int, payload: bytes = b"dallal-ping") -> bytes:
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, identifier, sequence)
+    csum = checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, csum, identifier, sequence) + payload
+
+
+def parse_echo_reply(data: bytes) -> Optional[Tuple[int, int]]:
+    """(identifier, sequence) of an echo reply, with or without a leading IPv4 header"""
+    if data and data[0] >> 4 == 4:
+        data = data[(data[0] & 0x0F) * 4:]
+    if len(data) < 8 or data[0] != ICMP_ECHO_REPLY:
+        return None
+    _, _, _, identifier, sequence = struct.unpack("!BBHHH", data[:8])
+    return identifier, sequence
+
+
+class AsyncPinger:
+    """
+    IPv4 ICMP echo sharing one socket. Must be used from the event loop it
+    was created on (see get_pinger).
+    """
+
+    def __init__(self, sock: socket.socket, raw: bool):
+        self.sock = sock
+        self.raw = raw
+        # Datagram ICMP sockets get their identifier from the kernel (the local
+        # "port") and only see their own replies; raw sockets see everything.
+        self.identifier = random.randint(1, 0xFFFF) if raw else sock.getsockname()[1]
+        self._sequence = itertools.count(random.randint(0, 0xFFFF))
+        # (ip, sequence) -> (future, sent_at)
+        self._pending: Dict[Tuple[str, int], Tuple[asyncio.Future, float]] = {}
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(sock.fileno(), self._on_readable)
+
+    @classmethod
+    def open(cls, recv_buffer: int = 1 << 21) -> "AsyncPinger":
+        errors = []
+        for sock_type, raw in ((socket.SOCK_DGRAM, False), (socket.SOCK_RAW, True)):
+            try:
+                sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+            except OSError as e:
+                errors.append(str(e))
+                continue
+            try:
+                sock.setblocking(False)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer)
+                return cls(sock, raw)
+            except (OSError, NotImplementedError) as e:
+                # NotImplementedError: loop without add_reader (Windows proactor)
+                sock.close()
+                errors.append(str(e))
+        raise PingUnavailable("; ".join(errors))
+
+    def _next_sequence(self, ip: str) -> int:
+        while True:
+            sequence = next(self._sequence) & 0xFFFF
+            if (ip, sequence) not in self._pending:
+                return sequence
+
+    def _on_readable(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            reply = parse_echo_reply(data)
+            if reply is None:
+                continue
+            identifier, sequence = reply
+            if self.raw and identifier != self.identifier:
+                continue  # Someone else's ping
+            pending = self._pending.get((addr[0], sequence))
+            if pending is None:
+                continue
+            future, sent_at = pending
+            if not future.done():
+                future.set_result(round((self._loop.time() - sent_at) * 1000, 3))
+
+    async def _probe(self, ip: str, timeout: float) -> asyncio.Future:
+        """Send one echo request. The returned future yields the RTT in ms, or None on timeout."""
+        sequence = self._next_sequence(ip)
+        key = (ip, sequence)
+        future = self._loop.create_future()
+        self._pending[key] = (future, self._loop.time())
+
+        def expire():
+            if not future.done():
+                future.set_result(None)
+
+        timer = self._loop.call_later(timeout, expire)
+
+        def cleanup(_):
+            timer.cancel()
+            self._pending.pop(key, None)
+
+        future.add_done_callback(cleanup)
+        try:
+            await sock_sendto(self._loop, self.sock, build_echo_request(self.identifier, sequence), (ip, 0))
+        except OSError:
+            # Unreachable network, no route, ...: the host is not answering
+            expire()
+        return future
+
+    async def ping(self, ip: str, timeout: float = 1.0, retries: int = 0) -> Optional[float]:
+        """RTT in milliseconds, or None if no reply arrived"""
+        for _ in range(retries + 1):
+            rtt = await (await self._probe(ip, timeout))
+            if rtt is not None:
+                return rtt
+        return None
+
+    async def ping_many(
+        self,
+        ips: Iterable[str],
+        timeout: float = 0.5,
+        retries: int = 0,
+        rate: int = 20000
+    ) -> Dict[str, float]:
+        """
+        Sweep many addresses. Probes are sent at up to `rate` per second and
+        all wait concurrently; hosts that did not answer are probed again on
+        each retry pass. Returns {ip: rtt_ms} for hosts that replied.
+        """
+        alive: Dict[str, float] = {}
+        remaining = list(dict.fromkeys(ips))
+        for _ in range(retries + 1):
+            if not remaining:
+                break
+            futures = {}
+            started = self._loop.time()
+            for index, ip in enumerate(remaining, 1):
+                futures[ip] = await self._probe(ip, timeout)
+                if index % 256 == 0:
+                    # Pace sends so bursts do not overflow socket/NIC queues
+                    delay = started + index / rate - self._loop.time()
+                    await asyncio.sleep(max(delay, 0))
+            results = await asyncio.gather(*futures.values())
+            remaining = []
+            for ip, rtt in zip(futures, results):
+                if rtt is None:
+                    remaining.append(ip)
+                else:
+                    alive[ip] = rtt
+        return alive
+
+    def close(self):
+        try:
+            self._loop.remove_reader(self.sock.fileno())
+        except Exception:
+            pass
+        self.sock.close()
+        for future, _ in list(self._pending.values()):
+            if not future.done():
+                future.set_result(None)
+        self._pending.clear()
+
+
+_pingers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Optional[AsyncPinger]]" = weakref.WeakKeyDictionary()
+
+
+def get_pinger() -> Optional[AsyncPinger]:
+    """Shared pinger for the running event loop, or None if ICMP sockets are unavailable"""
+    loop = asyncio.get_running_loop()
+    if loop in _pingers:
+        return _pingers[loop]
+    try:
+        pinger = AsyncPinger.open()
+        logger.info(f"ICMP pinger using a {'raw' if pinger.raw else 'datagram'} socket (pid {os.getpid()})")
+    except PingUnavailable as e:
+        logger.info(f"In-process ICMP unavailable ({e}), falling back to the ping command")
+        pinger = None
+    _pingers[loop] = pinger
+    return pinger
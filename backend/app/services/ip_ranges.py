@@ -0,0 +1,104 @@
+"""
+Scan targets as merged integer ranges.
+
+CIDRs are turned into (first, last) integer pairs, overlaps are merged
+(which also de-duplicates), and addresses are only materialised as strings
+while they are being probed, a chunk at a time. A /12 costs a few tuples
+instead of a million strings.
+"""
+import ipaddress
+import logging
+from typing import Iterable, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+Range = Tuple[int, int]  # Inclusive, same address family throughout
+
+MAX_TARGET_ADDRESSES = 1 << 24  # A /8; larger targets (IPv6 subnets) are refused
+
+
+def parse_target(target: str) -> List[Range]:
+    """
+    Host range of a CIDR. A bare IPv4 address means its /24, as the
+    scanner has always treated it.
+    """
+    target = target.strip()
+    if "/" not in target:
+        target = ".".join(target.split(".")[:3]) + ".0/24"
+    net = ipaddress.ip_network(target, strict=False)
+    if net.num_addresses > MAX_TARGET_ADDRESSES:
+        raise ValueError(f"{target} has {net.num_addresses} addresses (max {MAX_TARGET_ADDRESSES})")
+    first, last = int(net.network_address), int(net.broadcast_address)
+    if net.version == 4 and net.prefixlen < 31:
+        first, last = first + 1, last - 1  # Skip network and broadcast, like hosts()
+    elif net.version == 6 and net.prefixlen < 127:
+        first += 1  # Subnet-router anycast
+    return [(first, last)] if first <= last else []
+
+
+def merge_ranges(ranges: Iterable[Range]) -> List[Range]:
+    merged: List[Range] = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def parse_targets(targets: Iterable[str]) -> Tuple[List[Range], List[Range]]:
+    """Merged (IPv4 ranges, IPv6 ranges); invalid targets are logged and skipped"""
+    v4, v6 = [], []
+    for target in targets:
+        try:
+            ranges = parse_target(target)
+        except ValueError as e:
+            logger.error(f"Error parsing IP/CIDR {target}: {e}")
+            continue
+        for first, last in ranges:
+            (v4 if last < 1 << 32 and ":" not in target else v6).append((first, last))
+    return merge_ranges(v4), merge_ranges(v6)
+
+
+def count_addresses(ranges: Iterable[Range]) -> int:
+    return sum(last - first + 1 for first, last in ranges)
+
+
+def iter_addresses(ranges: Iterable[Range], version: int = 4) -> Iterator[str]:
+    to_address = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+    for first, last in ranges:
+        for value in range(first, last + 1):
+            yield str(to_address(value))
+
+
+def iter_chunks(ranges: Iterable[Range], size: int, version: int = 4) -> Iterator[List[str]]:
+    """Addresses in lists of at most `size`"""
+    chunk = []
+    for address in iter_addresses(ranges, version):
+        chunk.append(address)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def split_ranges(ranges: List[Range], shards: int) -> List[List[Range]]:
+    """Split into at most `shards` contiguous pieces of (almost) equal address count"""
+    total = count_addresses(ranges)
+    if total == 0:
+        return []
+    shards = max(1, min(shards, total))
+    per_shard = -(-total // shards)
+    result: List[List[Range]] = [[]]
+    room = per_shard
+    for first, last in ranges:
+        while first <= last:
+            if room == 0:
+                result.append([])
+                room = per_shard
+            take = min(room, last - first + 1)
+            result[-1].append((first, first + take - 1))
+            first += take
+            room -= take
+    return result
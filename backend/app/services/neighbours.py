@@ -0,0 +1,132 @@
+"""
+Bulk reader for the kernel's ARP/neighbour table.
+
+On Linux the whole table is read from /proc/net/arp, a few KB and no
+processes; elsewhere a single `arp -a` call lists every entry at once.
+Lookups are then dictionary hits, and the table is re-read at most every
+`max_age` seconds. prime() fires one UDP datagram per address from a single
+socket so the kernel resolves on-link neighbours before the table is read.
+"""
+import asyncio
+import logging
+import os
+import platform
+import re
+import socket
+import time
+from typing import Dict, Iterable, Optional
+
+from app.services.icmp import sock_sendto
+
+logger = logging.getLogger(__name__)
+
+PROC_ARP = "/proc/net/arp"
+ATF_COM = 0x2  # Completed entry
+
+# "192.168.1.1  00-11-22-33-44-55  dynamic" (Windows) or
+# "? (192.168.1.1) at 0:11:22:33:44:55 on en0" (BSD/macOS)
+_ARP_LINE = re.compile(
+    r"(\d{1,3}(?:\.\d{1,3}){3})\)?\s+(?:at\s+)?([0-9A-Fa-f]{1,2}(?:[:-][0-9A-Fa-f]{1,2}){5})"
+)
+
+
+def normalize_mac(mac: str) -> Optional[str]:
+    """'0:11:22:3:44:55' / '00-11-22-03-44-55' -> '00:11:22:03:44:55', None for empty entries"""
+    parts = re.split(r"[:-]", mac)
+    if len(parts) != 6:
+        return None
+    mac = ":".join(part.zfill(2) for part in parts).upper()
+    if mac in ("00:00:00:00:00:00", "FF:FF:FF:FF:FF:FF"):
+        return None
+    return mac
+
+
+def parse_proc_arp(text: str) -> Dict[str, str]:
+    table = {}
+    for line in text.splitlines()[1:]:
+        fields = line.split()
+        if len(fields) < 4:
+            continue
+        ip, _, flags, mac = fields[:4]
+        try:
+            if not int(flags, 16) & ATF_COM:
+                continue  # Incomplete: resolution still pending or failed
+        except ValueError:
+            continue
+        mac = normalize_mac(mac)
+        if mac:
+            table[ip] = mac
+    return table
+
+
+def parse_arp_output(text: str) -> Dict[str, str]:
+    table = {}
+    for match in _ARP_LINE.finditer(text):
+        mac = normalize_mac(match.group(2))
+        if mac:
+            table[match.group(1)] = mac
+    return table
+
+
+class NeighbourTable:
+    def __init__(self, max_age: float = 2.0):
+        self.max_age = max_age
+        self.entries: Dict[str, str] = {}
+        self._loaded_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self.os_type = platform.system().lower()
+
+    async def refresh(self) -> Dict[str, str]:
+        """Re-read the whole table"""
+        if os.path.exists(PROC_ARP):
+            with open(PROC_ARP) as f:
+                self.entries = parse_proc_arp(f.read())
+        else:
+            self.entries = await self._read_arp_command()
+        self._loaded_at = time.monotonic()
+        return self.entries
+
+    async def _read_arp_command(self) -> Dict[str, str]:
+        cmd = ['arp', '-a'] if self.os_type == 'windows' else ['arp', '-an']
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+            )
+            stdout, _ = await proc.communicate()
+        except Exception as e:
+            logger.debug(f"Reading ARP table failed: {e}")
+            return {}
+        encoding = 'cp1252' if self.os_type == 'windows' else 'utf-8'
+        return parse_arp_output(stdout.decode(encoding, errors='ignore'))
+
+    async def lookup(self, ip: str) -> Optional[str]:
+        """MAC for ip, re-reading the table if it is older than max_age"""
+        if time.monotonic() - self._loaded_at > self.max_age:
+            # Concurrent lookups share one refresh
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                if time.monotonic() - self._loaded_at > self.max_age:
+                    await self.refresh()
+        return self.entries.get(ip)
+
+    async def prime(self, ips: Iterable[str], settle: float = 0.3, rate: int = 20000):
+        """
+        Make the kernel resolve neighbours by sending each address one UDP
+        datagram (discard port), then wait for ARP replies to arrive.
+        """
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        started = loop.time()
+        try:
+            for index, ip in enumerate(ips, 1):
+                try:
+                    await sock_sendto(loop, sock, b"", (ip, 9))
+                except OSError:
+                    pass  # Unreachable, broadcast without SO_BROADCAST, ...
+                if index % 256 == 0:
+                    await asyncio.sleep(max(started + index / rate - loop.time(), 0))
+        finally:
+            sock.close()
+        await asyncio.sleep(settle)
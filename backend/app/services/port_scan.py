@@ -0,0 +1,313 @@
+"""
+Async TCP connect scanner for discovery.
+
+Probes use non-blocking sockets and loop.sock_connect (no stream reader or
+writer per probe). Every (ip, port) is probed at most once per scan: results
+are cached per host (bounded, and expiring after result_ttl) and concurrent
+requests for the same probe share one connection attempt.
+
+The number of probes in flight adapts to the network (AIMD): it grows while
+the timeout and RST rates stay near their running averages and halves when
+either spikes (congestion, or a firewall rate-limiting with resets) or the
+OS runs short of sockets or buffers.
+"""
+import asyncio
+import errno
+import json
+import logging
+import re
+import socket
+import struct
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+OPEN = "open"
+CLOSED = "closed"  # RST: host is up, nothing listening
+FILTERED = "filtered"  # No answer within the timeout, or unreachable
+
+# Ports that prove a firewalled host is alive
+COMMON_PORTS = [80, 443, 22, 3389, 445, 139, 21, 23]
+# Ports reported as has_ssh / has_rdp / ... on discovered devices
+SERVICE_PORTS = {"ssh": 22, "rdp": 3389, "vnc": 5900, "http": 80, "https": 443}
+
+BUILTIN_PROFILES: Dict[str, List[int]] = {
+    "minimal": sorted(set(COMMON_PORTS) | set(SERVICE_PORTS.values())),
+    "default": [
+        21, 22, 23, 25, 53, 80, 110, 139, 143, 161, 389, 443, 445, 548, 631, 993, 995,
+        1883, 3000, 3306, 3389, 5000, 5432, 5900, 6379, 8000, 8080, 8443, 9000, 9090,
+    ],
+    # Web UIs of common self-hosted apps
+    "homelab": [
+        22, 80, 443, 81, 1880, 2283, 3000, 3001, 5000, 5001, 5055, 7575, 8000, 8006, 8080,
+        8081, 8096, 8123, 8181, 8200, 8443, 8888, 8989, 9000, 9090, 9443, 10000, 32400,
+    ],
+}
+
+# Errors that mean the host or network answered "no" rather than timing out
+_UNREACHABLE = {errno.EHOSTUNREACH, errno.ENETUNREACH, errno.EHOSTDOWN}
+# Errors that mean we are the bottleneck
+_RESOURCE = {errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.EAGAIN, errno.EADDRNOTAVAIL}
+
+_APP_LINE = re.compile(r"^(?P<name>[^=]+)=\s*webui ports-(?P<webui>[\w,]+),\s*extra ports-(?P<extra>[\w,]+)\s*=\s*(?P<category>.+)$")
+
+
+def parse_ports(values: Iterable) -> List[int]:
+    """[22, "80", "8000-8010"] -> sorted unique ports"""
+    ports = set()
+    for value in values:
+        text = str(value).strip()
+        if "-" in text:
+            low, high = (int(part) for part in text.split("-", 1))
+            ports.update(range(low, high + 1))
+        elif text.isdigit():
+            ports.add(int(text))
+    return sorted(p for p in ports if 0 < p < 65536)
+
+
+def parse_app_port_list(text: str) -> Dict[str, List[int]]:
+    """
+    Profiles per category from 'Name = webui ports-8006, extra ports-22,5900 = Category'
+    lines (the per-app list used by the frontend's app catalogue).
+    """
+    profiles: Dict[str, set] = {}
+    for line in text.splitlines():
+        match = _APP_LINE.match(line.strip())
+        if not match:
+            continue
+        ports = [p for p in (match["webui"] + "," + match["extra"]).split(",") if p.isdigit()]
+        profiles.setdefault(match["category"].strip(), set()).update(parse_ports(ports))
+    return {name: sorted(ports) for name, ports in profiles.items()}
+
+
+def load_profiles(raw: Optional[str]) -> Dict[str, List[int]]:
+    """
+    Built-in profiles plus user-defined ones from the 'scan_port_profiles'
+    setting: JSON {"name": [ports or "a-b" ranges]} or an app port list.
+    """
+    profiles = dict(BUILTIN_PROFILES)
+    if not raw:
+        return profiles
+    try:
+        custom = json.loads(raw)
+    except ValueError:
+        profiles.update(parse_app_port_list(raw))
+        return profiles
+    try:
+        profiles.update({str(name): parse_ports(ports) for name, ports in custom.items()})
+    except (AttributeError, TypeError, ValueError) as e:
+        logger.warning(f"Ignoring invalid scan_port_profiles setting: {e}")
+    return profiles
+
+
+def _fd_budget(default: int) -> int:
+    """Leave half of the process' file descriptors for everything else"""
+    if resource is None:
+        return default
+    try:
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (ValueError, OSError):
+        return default
+    if soft == resource.RLIM_INFINITY:
+        return default
+    return max(min(default, soft // 2), 16)
+
+
+class AdaptiveLimit:
+    """Semaphore whose size can change while tasks wait on it"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self._changed = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def __aexit__(self, *exc):
+        async with self._changed:
+            self.in_flight -= 1
+            self._changed.notify()
+
+    async def resize(self, limit: int):
+        async with self._changed:
+            grew = limit > self.limit
+            self.limit = limit
+            if grew:
+                self._changed.notify_all()
+
+
+class PortScanner:
+    """
+    One scanner per discovery scan: create it at the start of the scan so the
+    result cache never outlives it. Must be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 0.5,
+        initial_concurrency: int = 256,
+        min_concurrency: int = 32,
+        max_concurrency: int = 2048,
+        window: int = 200,
+        result_ttl: float = 600,
+        max_hosts: int = 65536
+    ):
+        self.timeout = timeout
+        self.max_concurrency = _fd_budget(max_concurrency)
+        self.min_concurrency = min(min_concurrency, self.max_concurrency)
+        self.window = window
+        self.limit = AdaptiveLimit(min(initial_concurrency, self.max_concurrency))
+        self.result_ttl = result_ttl
+        self.max_hosts = max_hosts
+        # ip -> (expires, {port: state}), oldest first
+        self.results: "OrderedDict[str, Tuple[float, Dict[int, str]]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, int], asyncio.Future] = {}
+        # Outcome counts of the current window
+        self._counts = {OPEN: 0, CLOSED: 0, FILTERED: 0, "resource": 0}
+        # Running averages of the timeout and RST rates per window
+        self._timeout_baseline: Optional[float] = None
+        self._reset_baseline: Optional[float] = None
+        self._background: set = set()
+        self.stats = {"probes": 0, "cached": 0}
+
+    async def probe(self, ip: str, port: int) -> str:
+        """State of one port; cached for the scanner's lifetime"""
+        key = (ip, port)
+        state = self._host_results(ip).get(port)
+        if state is not None:
+            self.stats["cached"] += 1
+            return state
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["cached"] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            async with self.limit:
+                state = await self._connect(ip, port)
+            self._host_results(ip, create=True)[port] = state
+            future.set_result(state)
+            await self._record(state)
+            return state
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+                future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _host_results(self, ip: str, create: bool = False) -> Dict[int, str]:
+        """Cached port states of one host, dropping expired hosts and the oldest beyond max_hosts"""
+        now = time.monotonic()
+        while self.results:
+            oldest = next(iter(self.results))
+            if self.results[oldest][0] > now:
+                break
+            del self.results[oldest]
+        entry = self.results.get(ip)
+        if entry is None:
+            if not create:
+                return {}
+            entry = self.results[ip] = (now + self.result_ttl, {})
+            while len(self.results) > self.max_hosts:
+                self.results.popitem(last=False)
+        return entry[1]
+
+    async def _connect(self, ip: str, port: int) -> str:
+        loop = asyncio.get_running_loop()
+        family = socket.AF_INET6 if ":" in ip else socket.AF_INET
+        self.stats["probes"] += 1
+        try:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+        except OSError as e:
+            self._counts["resource"] += e.errno in _RESOURCE
+            return FILTERED
+        try:
+            sock.setblocking(False)
+            # Close with RST instead of lingering in TIME_WAIT
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), timeout=self.timeout)
+            return OPEN
+        except ConnectionRefusedError:
+            return CLOSED
+        except asyncio.TimeoutError:
+            return FILTERED
+        except OSError as e:
+            if e.errno in _RESOURCE:
+                self._counts["resource"] += 1
+            elif e.errno not in _UNREACHABLE:
+                logger.debug(f"Probe {ip}:{port} failed: {e}")
+            return FILTERED
+        finally:
+            sock.close()
+
+    async def _record(self, state: str):
+        self._counts[state] += 1
+        total = self._counts[OPEN] + self._counts[CLOSED] + self._counts[FILTERED]
+        if total < self.window:
+            return
+
+        timeout_rate = self._counts[FILTERED] / total
+        reset_rate = self._counts[CLOSED] / total
+        baseline, reset_baseline = self._timeout_baseline, self._reset_baseline
+        spiked = baseline is not None and (timeout_rate > baseline + 0.2 or reset_rate > reset_baseline + 0.2)
+        current = self.limit.limit
+        if self._counts["resource"] or spiked:
+            # Congestion, RST rate limiting or fd/buffer exhaustion: back off hard
+            new_limit = max(self.min_concurrency, current // 2)
+        else:
+            new_limit = min(self.max_concurrency, current + max(current // 8, 8))
+        if baseline is None:
+            self._timeout_baseline, self._reset_baseline = timeout_rate, reset_rate
+        else:
+            self._timeout_baseline = 0.8 * baseline + 0.2 * timeout_rate
+            self._reset_baseline = 0.8 * reset_baseline + 0.2 * reset_rate
+        self._counts = {OPEN: 0, CLOSED: 0, FILTERED: 0, "resource": 0}
+        if new_limit != current:
+            logger.debug(
+                f"Port scan concurrency {current} -> {new_limit} (timeouts {timeout_rate:.0%}, resets {reset_rate:.0%})"
+            )
+            await self.limit.resize(new_limit)
+
+    async def scan_host(self, ip: str, ports: Iterable[int]) -> Dict[int, str]:
+        ports = list(dict.fromkeys(ports))
+        states = await asyncio.gather(*(self.probe(ip, port) for port in ports))
+        return dict(zip(ports, states))
+
+    async def any_open(self, ip: str, ports: Iterable[int]) -> bool:
+        """
+        True as soon as one port answers (open or RST). The other probes keep
+        running in the background and still land in the cache.
+        """
+        tasks = [asyncio.ensure_future(self.probe(ip, port)) for port in dict.fromkeys(ports)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                if await next_done in (OPEN, CLOSED):
+                    return True
+            return False
+        finally:
+            for task in tasks:
+                if not task.done():
+                    self._background.add(task)
+                    task.add_done_callback(self._background_done)
+
+    def _background_done(self, task: asyncio.Future):
+        self._background.discard(task)
+        if not task.cancelled():
+            task.exception()  # Nobody awaits it any more
+
+    def open_ports(self, ip: str) -> List[int]:
+        return sorted(port for port, state in self._host_results(ip).items() if state == OPEN)
@@ -1,46 +1,195 @@
 import socket
 import asyncio
-from typing import Optional
-from zeroconf import Zeroconf, ServiceBrowser, ServiceStateChange
-from zeroconf.asyncio import AsyncServiceBrowser, AsyncZeroconf
+import ipaddress
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from zeroconf import IPVersion, Zeroconf, ServiceStateChange
+from zeroconf.asyncio import AsyncServiceBrowser, AsyncServiceInfo, AsyncZeroconf
 
-def resolve_hostname(ip: str) -> str:
+async def resolve_hostname(ip: str) -> str:
     """
-    Attempt to resolve hostname via Reverse DNS.
+    Attempt to resolve hostname via Reverse DNS (shared async PTR resolver).
     """
-    try:
-        # Set a short timeout for DNS operations
-        socket.setdefaulttimeout(1)
-        hostname, _, _ = socket.gethostbyaddr(ip)
-        return hostname
-    except (socket.herror, socket.gaierror, socket.timeout):
-        return ip
-
-# mDNS Cache (Simple in-memory cache)
-mdns_cache = {}
-
-class MDNSListener:
-    def update_service(self, zc: Zeroconf, type_: str, name: str) -> None:
-        pass
-
-    def remove_service(self, zc: Zeroconf, type_: str, name: str) -> None:
-        pass
-
-    def add_service(self, zc: Zeroconf, type_: str, name: str) -> None:
-        info = zc.get_service_info(type_, name)
-        if info and info.addresses:
-            # Convert bytes to string IP
-            ip = socket.inet_ntoa(info.addresses[0])
-            # Store server name (e.g., "MyMac.local.")
-            mdns_cache[ip] = info.server.rstrip(".")
-
-async def start_mdns_discovery():
+    from app.services.reverse_dns import ptr_resolver
+    hostname = await ptr_resolver.lookup(ip)
+    return hostname or ip
+
+class AddressCache:
+    """
+    Forward-lookup cache (hostname -> address) with a TTL.
+    Lets repeated checks against the same hosts skip getaddrinfo.
+    """
+
+    def __init__(self, ttl: int = 300, max_entries: int = 4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+
+    async def resolve(self, host: str, port: int = 0) -> str:
+        """Return an address for host, or host itself if it is already an IP literal"""
+        try:
+            ipaddress.ip_address(host)
+            return host
+        except ValueError:
+            pass
+
+        entry = self._entries.get(host)
+        if entry and entry[1] > time.monotonic():
+            self._entries.move_to_end(host)
+            return entry[0]
+
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        address = infos[0][4][0]
+
+        self._entries[host] = (address, time.monotonic() + self.ttl)
+        self._entries.move_to_end(host)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return address
+
+    def clear(self):
+        self._entries.clear()
+
+# Service types browsed for passive discovery; instance ports become the host's open ports
+MDNS_SERVICE_TYPES = [
+    "_http._tcp.local.", "_https._tcp.local.", "_workstation._tcp.local.", "_ssh._tcp.local.",
+    "_sftp-ssh._tcp.local.", "_smb._tcp.local.", "_afpovertcp._tcp.local.", "_device-info._tcp.local.",
+    "_ipp._tcp.local.", "_printer._tcp.local.", "_rfb._tcp.local.", "_googlecast._tcp.local.",
+    "_airplay._tcp.local.", "_raop._tcp.local.", "_hap._tcp.local.", "_mqtt._tcp.local.",
+    "_home-assistant._tcp.local.", "_esphomelib._tcp.local.",
+]
+
+
+def _seconds_left(expires: float, now: float) -> Optional[int]:
+    return None if expires == float("inf") else round(expires - now)
+
+
+class MDNSHostIndex:
     """
-    Start mDNS listener in background to populate cache.
+    Hosts announced over mDNS, keyed by every address they announce (IPv4
+    and IPv6). A service instance stays until the browser reports it
+    removed, which zeroconf does on a goodbye packet or when the cached PTR
+    record expires; refreshed announcements keep it. Entries added with an
+    explicit ttl expire on their own.
     """
-    zc = AsyncZeroconf()
-    services = ["_http._tcp.local.", "_workstation._tcp.local.", "_ssh._tcp.local."]
-    browser = AsyncServiceBrowser(zc.zeroconf, services, handlers=[MDNSListener().add_service])
-    # Keep browser running...
-    # In a real app we might want to manage this lifecycle better
-    return zc, browser
+
+    def __init__(self):
+        # instance name -> (hostname, addresses, service type, port, expires)
+        self._services: Dict[str, tuple] = {}
+        self._by_address: Dict[str, set] = {}
+
+    def add(self, name: str, hostname: Optional[str], addresses: List[str], service_type: str,
+            port: Optional[int], ttl: Optional[int] = None):
+        self.remove_service(name)
+        addresses = [address.split("%")[0] for address in addresses]  # Drop IPv6 scope ids
+        expires = time.monotonic() + ttl if ttl else float("inf")
+        self._services[name] = ((hostname or "").rstrip(".") or None, addresses, service_type, port, expires)
+        for address in addresses:
+            self._by_address.setdefault(address, set()).add(name)
+
+    def remove_service(self, name: str):
+        record = self._services.pop(name, None)
+        if record is None:
+            return
+        for address in record[1]:
+            names = self._by_address.get(address)
+            if names:
+                names.discard(name)
+                if not names:
+                    del self._by_address[address]
+
+    def purge(self):
+        now = time.monotonic()
+        for name in [name for name, record in self._services.items() if record[4] <= now]:
+            self.remove_service(name)
+
+    def get(self, ip: str) -> Optional[Dict]:
+        """Hostname, all announced addresses and {service type: port} of the host at ip"""
+        now = time.monotonic()
+        records = [self._services[name] for name in self._by_address.get(ip, ())]
+        records = [record for record in records if record[4] > now]
+        if not records:
+            return None
+        addresses = []
+        for record in records:
+            addresses.extend(a for a in record[1] if a not in addresses)
+        return {
+            "ip": ip,
+            "hostname": next((record[0] for record in records if record[0]), None),
+            "addresses": addresses,
+            "services": {record[2]: record[3] for record in records},
+            "expires_in": _seconds_left(max(record[4] for record in records), now),
+        }
+
+    def hosts(self) -> List[Dict]:
+        self.purge()
+        return [self.get(ip) for ip in sorted(self._by_address)]
+
+    def __len__(self):
+        self.purge()
+        return len(self._by_address)
+
+
+class MDNSBrowser:
+    """Passive mDNS browsing feeding an MDNSHostIndex; runs on the app's event loop"""
+
+    def __init__(self, index: MDNSHostIndex, service_types: List[str] = None):
+        self.index = index
+        self.service_types = service_types or MDNS_SERVICE_TYPES
+        self._zeroconf: Optional[AsyncZeroconf] = None
+        self._browser: Optional[AsyncServiceBrowser] = None
+        self._pending: set = set()
+
+    @property
+    def running(self) -> bool:
+        return self._browser is not None
+
+    async def start(self):
+        if self.running:
+            return
+        try:
+            self._zeroconf = AsyncZeroconf(ip_version=IPVersion.All)
+        except OSError:
+            # No IPv6 on this host
+            self._zeroconf = AsyncZeroconf(ip_version=IPVersion.V4Only)
+        self._browser = AsyncServiceBrowser(
+            self._zeroconf.zeroconf, self.service_types, handlers=[self._on_state_change]
+        )
+
+    def _on_state_change(self, zeroconf: Zeroconf, service_type: str, name: str,
+                         state_change: ServiceStateChange) -> None:
+        if state_change is ServiceStateChange.Removed:
+            self.index.remove_service(name)
+            return
+        task = asyncio.ensure_future(self._resolve(service_type, name))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _resolve(self, service_type: str, name: str):
+        info = AsyncServiceInfo(service_type, name)
+        try:
+            if not await info.async_request(self._zeroconf.zeroconf, 3000):
+                return
+        except Exception:
+            return
+        addresses = info.parsed_scoped_addresses(IPVersion.All)
+        if addresses:
+            # No ttl: info.other_ttl is zeroconf's outgoing default, not the received
+            # record's, and unchanged refreshes fire no callback to extend it
+            self.index.add(name, info.server, addresses, service_type, info.port)
+
+    async def stop(self):
+        for task in list(self._pending):
+            task.cancel()
+        if self._browser:
+            await self._browser.async_cancel()
+            self._browser = None
+        if self._zeroconf:
+            await self._zeroconf.async_close()
+            self._zeroconf = None
+
+
+mdns_index = MDNSHostIndex()
+mdns_browser = MDNSBrowser(mdns_index)
@@ -0,0 +1,134 @@
+"""
+Write-behind sink for monitor check results.
+
+Checks hand their outcome to the sink instead of committing on their own.
+Buffered results are written in one transaction per flush - a bulk INSERT
+into ServiceHistory and executemany UPDATEs of Service state - either every
+flush_interval seconds or as soon as max_batch history rows are waiting.
+On SQLite that is one fsync per batch instead of one per check.
+"""
+import asyncio
+import threading
+from typing import Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import bindparam, insert, update
+from sqlmodel import Session
+
+from app.models.history import ServiceHistory
+from app.models.service import Service
+
+
+class ResultSink:
+    """Thread-safe buffer of check results, flushed in batches"""
+
+    def __init__(self, engine, flush_interval: float = 0.5, max_batch: int = 500, max_pending: int = 50000):
+        self.engine = engine
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        # Upper bound on buffered history rows while the database is failing
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._updates: Dict[int, dict] = {}
+        self._history: List[dict] = []
+        # Set while run() is active on a loop
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._full: Optional[asyncio.Event] = None
+
+    def add(self, service_id: int, changes: dict, history: Optional[dict] = None):
+        """
+        Queue a Service update and an optional ServiceHistory row.
+        Updates to the same service are merged; the latest value of each column wins.
+        """
+        with self._lock:
+            self._updates.setdefault(service_id, {}).update(changes)
+            if history is not None:
+                self._history.append(history)
+            full = len(self._history) >= self.max_batch
+        if full:
+            self._signal_full()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._history)
+
+    def _signal_full(self):
+        loop, event = self._loop, self._full
+        if loop and event and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # Loop closed between the check and the call
+
+    def flush(self) -> int:
+        """
+        Write everything buffered in one transaction (blocking).
+        Returns the number of history rows written. On failure the batch is
+        put back and retried on the next flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                updates, history = self._updates, self._history
+                self._updates, self._history = {}, []
+            if not updates and not history:
+                return 0
+
+            try:
+                with Session(self.engine) as session:
+                    for statement, rows in self._update_batches(updates):
+                        session.execute(statement, rows)
+                    if history:
+                        session.execute(insert(ServiceHistory.__table__), history)
+                    session.commit()
+            except Exception as e:
+                logger.error(f"Failed to write {len(history)} check results: {e}")
+                self._requeue(updates, history)
+                return 0
+            return len(history)
+
+    @staticmethod
+    def _update_batches(updates: Dict[int, dict]):
+        """Group updates by column set so each group is a single executemany"""
+        table = Service.__table__
+        groups: Dict[tuple, list] = {}
+        for service_id, changes in updates.items():
+            columns = tuple(sorted(changes))
+            row = {f"v_{column}": value for column, value in changes.items()}
+            row["target_id"] = service_id
+            groups.setdefault(columns, []).append(row)
+
+        for columns, rows in groups.items():
+            statement = (
+                update(table)
+                .where(table.c.id == bindparam("target_id"))
+                .values({column: bindparam(f"v_{column}") for column in columns})
+            )
+            yield statement, rows
+
+    def _requeue(self, updates: Dict[int, dict], history: List[dict]):
+        with self._lock:
+            for service_id, changes in updates.items():
+                # Anything queued since the failed flush is newer and wins
+                self._updates[service_id] = {**changes, **self._updates.get(service_id, {})}
+            self._history = history + self._history
+            overflow = len(self._history) - self.max_pending
+            if overflow > 0:
+                del self._history[:overflow]
+                logger.warning(f"Result sink over capacity, dropped {overflow} history rows")
+
+    async def run(self):
+        """Flush periodically (or when a batch fills up) until cancelled"""
+        self._loop = asyncio.get_running_loop()
+        self._full = asyncio.Event()
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._full.clear()
+                await asyncio.to_thread(self.flush)
+        finally:
+            self._loop = None
+            self._full = None
@@ -0,0 +1,308 @@
+"""
+Async reverse DNS (PTR) resolver.
+
+Queries go straight to the system's nameservers over UDP from one datagram
+endpoint per address family and event loop, so lookups cost no threads and
+never touch the process-wide socket timeout. A reply is only accepted from
+the nameserver asked and when its id and question both match the query.
+Answers are cached with their TTL (capped), failures and NXDOMAINs are
+cached too, and concurrent lookups of the same address share one query.
+/etc/hosts is consulted first, like gethostbyaddr.
+
+Without a usable resolv.conf (Windows) lookups fall back to gethostbyaddr
+in the default executor, limited to a few at a time.
+"""
+import asyncio
+import ipaddress
+import logging
+import random
+import socket
+import struct
+import time
+import weakref
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RESOLV_CONF = "/etc/resolv.conf"
+HOSTS_FILE = "/etc/hosts"
+
+TYPE_PTR = 12
+TYPE_SOA = 6
+CLASS_IN = 1
+RCODE_NXDOMAIN = 3
+
+
+def reverse_name(ip: str) -> str:
+    """'192.168.1.10' -> '10.1.168.192.in-addr.arpa' (ip6.arpa nibbles for IPv6)"""
+    return ipaddress.ip_address(ip).reverse_pointer
+
+
+def build_query(query_id: int, name: str, qtype: int = TYPE_PTR) -> bytes:
+    header = struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 0)  # RD, one question
+    qname = b"".join(bytes([len(label)]) + label.encode("ascii") for label in name.split(".") if label)
+    return header + qname + b"\x00" + struct.pack("!HH", qtype, CLASS_IN)
+
+
+def _read_name(data: bytes, offset: int) -> Tuple[str, int]:
+    """Decode a (possibly compressed) domain name; returns (name, offset after it)"""
+    labels = []
+    end = None
+    for _ in range(128):  # Bound pointer loops
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(data[offset:offset + length].decode("ascii", errors="replace"))
+        offset += length
+    return ".".join(labels), end if end is not None else offset
+
+
+def parse_response(data: bytes) -> Tuple[int, int, Optional[str], Optional[int]]:
+    """
+    (query id, rcode, PTR name or None, ttl or None). For negative answers
+    the ttl is the SOA minimum from the authority section when present.
+    """
+    query_id, flags, qdcount, ancount, nscount, _ = struct.unpack("!HHHHHH", data[:12])
+    rcode = flags & 0x000F
+    offset = 12
+    for _ in range(qdcount):
+        _, offset = _read_name(data, offset)
+        offset += 4
+
+    negative_ttl = None
+    for index in range(ancount + nscount):
+        _, offset = _read_name(data, offset)
+        rtype, _, ttl, length = struct.unpack("!HHIH", data[offset:offset + 10])
+        offset += 10
+        if index < ancount and rtype == TYPE_PTR:
+            name, _ = _read_name(data, offset)
+            return query_id, rcode, name.rstrip("."), ttl
+        if index >= ancount and rtype == TYPE_SOA:
+            _, rdata = _read_name(data, offset)
+            _, rdata = _read_name(data, rdata)
+            minimum = struct.unpack("!I", data[rdata + 16:rdata + 20])[0]
+            negative_ttl = min(ttl, minimum)
+        offset += length
+    return query_id, rcode, None, negative_ttl
+
+
+def read_nameservers(path: str = RESOLV_CONF) -> List[str]:
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+    servers = []
+    for line in lines:
+        fields = line.split()
+        if len(fields) >= 2 and fields[0] == "nameserver":
+            address = fields[1].split("%")[0]
+            try:
+                ipaddress.ip_address(address)
+            except ValueError:
+                continue
+            servers.append(address)
+    return servers
+
+
+def read_hosts_file(path: str = HOSTS_FILE) -> Dict[str, str]:
+    """address -> first hostname listed for it"""
+    hosts = {}
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return hosts
+    for line in lines:
+        fields = line.split("#", 1)[0].split()
+        if len(fields) >= 2:
+            hosts.setdefault(fields[0], fields[1])
+    return hosts
+
+
+class _DNSProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.transport = None
+        # query id -> (future, (nameserver, port), name asked)
+        self.pending: Dict[int, Tuple[asyncio.Future, Tuple[str, int], str]] = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            query_id, flags, qdcount = struct.unpack("!HHH", data[:6])
+            pending = self.pending.get(query_id)
+            if pending is None or not flags & 0x8000 or qdcount != 1:
+                return
+            qname, _ = _read_name(data, 12)
+        except (struct.error, IndexError):
+            return
+        # The 16-bit id alone is easy to guess: a forged reply also has to echo the question
+        future, server, name = pending
+        if tuple(addr[:2]) == server and qname.lower() == name.lower() and not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc):
+        pass
+
+    def connection_lost(self, exc):
+        for future, _, _ in self.pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("DNS socket closed"))
+
+
+class PTRResolver:
+    def __init__(
+        self,
+        nameservers: Optional[List[str]] = None,
+        timeout: float = 1.0,
+        max_ttl: int = 3600,
+        negative_ttl: int = 300,
+        failure_ttl: int = 60,
+        max_entries: int = 65536,
+        max_in_flight: int = 256,
+        port: int = 53
+    ):
+        self.nameservers = nameservers if nameservers is not None else read_nameservers()
+        self.timeout = timeout
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.failure_ttl = failure_ttl
+        self.max_entries = max_entries
+        self.max_in_flight = max_in_flight
+        self.port = port
+        self.hosts = read_hosts_file()
+        # ip -> (hostname or None, expires)
+        self._cache: OrderedDict = OrderedDict()
+        self._loops: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self.stats = {"queries": 0, "hits": 0, "coalesced": 0}
+
+    def _loop_state(self) -> dict:
+        """Per event loop: DNS endpoints by family, in-flight lookups and the concurrency limit"""
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            limit = self.max_in_flight if self.nameservers else 8
+            state = {"protocols": {}, "inflight": {}, "limit": asyncio.Semaphore(limit), "lock": asyncio.Lock()}
+            self._loops[loop] = state
+        return state
+
+    def _cached(self, ip: str):
+        entry = self._cache.get(ip)
+        if entry is None:
+            return False, None
+        if entry[1] <= time.monotonic():
+            del self._cache[ip]
+            return False, None
+        self._cache.move_to_end(ip)
+        return True, entry[0]
+
+    def _store(self, ip: str, hostname: Optional[str], ttl: float):
+        self._cache[ip] = (hostname, time.monotonic() + ttl)
+        self._cache.move_to_end(ip)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def lookup(self, ip: str) -> Optional[str]:
+        """Hostname for ip, or None"""
+        if ip in self.hosts:
+            return self.hosts[ip]
+        found, hostname = self._cached(ip)
+        if found:
+            self.stats["hits"] += 1
+            return hostname
+
+        state = self._loop_state()
+        future = state["inflight"].get(ip)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        state["inflight"][ip] = future
+        try:
+            async with state["limit"]:
+                hostname, ttl = await self._resolve(ip, state)
+            self._store(ip, hostname, ttl)
+            future.set_result(hostname)
+            return hostname
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+                future.exception()
+            raise
+        finally:
+            state["inflight"].pop(ip, None)
+
+    async def _resolve(self, ip: str, state: dict) -> Tuple[Optional[str], float]:
+        try:
+            name = reverse_name(ip)
+        except ValueError:
+            return None, self.negative_ttl
+        if not self.nameservers:
+            return await self._resolve_system(ip)
+
+        for nameserver in self.nameservers:
+            family = socket.AF_INET6 if ":" in nameserver else socket.AF_INET
+            try:
+                protocol = await self._protocol(state, family)
+                data = await self._query(protocol, nameserver, name)
+                _, rcode, hostname, ttl = parse_response(data)
+            except (asyncio.TimeoutError, OSError, ConnectionError, struct.error, IndexError, UnicodeError):
+                continue
+            if hostname:
+                return hostname, min(max(ttl or 0, 30), self.max_ttl)
+            if rcode in (0, RCODE_NXDOMAIN):
+                return None, min(ttl or self.negative_ttl, self.negative_ttl)
+            # SERVFAIL, REFUSED, ...: ask the next nameserver
+        return None, self.failure_ttl
+
+    async def _protocol(self, state: dict, family: int) -> _DNSProtocol:
+        """The loop's endpoint for one address family, (re)opened on first use"""
+        async with state["lock"]:
+            protocol = state["protocols"].get(family)
+            if protocol is None or protocol.transport is None or protocol.transport.is_closing():
+                loop = asyncio.get_running_loop()
+                _, protocol = await loop.create_datagram_endpoint(_DNSProtocol, family=family)
+                state["protocols"][family] = protocol
+            return protocol
+
+    async def _query(self, protocol: _DNSProtocol, nameserver: str, name: str) -> bytes:
+        loop = asyncio.get_running_loop()
+        query_id = random.randint(0, 0xFFFF)
+        while query_id in protocol.pending:
+            query_id = random.randint(0, 0xFFFF)
+        future = loop.create_future()
+        protocol.pending[query_id] = (future, (nameserver, self.port), name)
+        self.stats["queries"] += 1
+        try:
+            protocol.transport.sendto(build_query(query_id, name), (nameserver, self.port))
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            protocol.pending.pop(query_id, None)
+
+    async def _resolve_system(self, ip: str) -> Tuple[Optional[str], float]:
+        loop = asyncio.get_running_loop()
+        try:
+            hostname, _, _ = await asyncio.wait_for(
+                loop.run_in_executor(None, socket.gethostbyaddr, ip), timeout=self.timeout * 2
+            )
+            return hostname, self.max_ttl
+        except (socket.herror, socket.gaierror):
+            return None, self.negative_ttl
+        except (asyncio.TimeoutError, OSError):
+            return None, self.failure_ttl
+
+    def clear(self):
+        self._cache.clear()
+
+
+ptr_resolver = PTRResolver()
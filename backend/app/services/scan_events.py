@@ -0,0 +1,106 @@
+"""
+Live events for network scans.
+
+The discovery engine publishes every device as soon as it is found, plus
+progress and a final diff against the previous scan. Each subscriber (an SSE
+connection) gets its own bounded queue, so a slow client can never stall the
+scan: when its queue fills up it is dropped and has to reconnect and resync.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Device fields that change on every scan and must not count as a change
+VOLATILE_FIELDS = {"discovered_at", "snmp_uptime"}
+
+
+def _normalized(value):
+    """Empty strings and collections compare equal to None (stored hosts keep them as NULL)"""
+    if isinstance(value, (str, list, dict)) and not value:
+        return None
+    return value
+
+
+def device_changes(old: Dict, new: Dict) -> Dict[str, list]:
+    """{field: [old, new]} for fields that differ between two scans of a host"""
+    return {
+        key: [old.get(key), new.get(key)]
+        for key in set(old) | set(new)
+        if key not in VOLATILE_FIELDS and _normalized(old.get(key)) != _normalized(new.get(key))
+    }
+
+
+def classify_device(previous: Dict[str, Dict], device: Dict) -> Dict:
+    """Delta for one device: new, changed (with the changed fields) or unchanged"""
+    old = previous.get(device["ip"])
+    if old is None:
+        return {"change": "new", "device": device}
+    changes = device_changes(old, device)
+    if changes:
+        return {"change": "changed", "device": device, "changes": changes}
+    return {"change": "unchanged", "device": device}
+
+
+def diff_results(previous: List[Dict], current: List[Dict]) -> Dict[str, list]:
+    """New, gone and changed hosts between two scans, keyed by IP"""
+    before = {device["ip"]: device for device in previous}
+    after = {device["ip"]: device for device in current}
+    changed = []
+    for ip, device in after.items():
+        if ip in before:
+            changes = device_changes(before[ip], device)
+            if changes:
+                changed.append({"ip": ip, "changes": changes})
+    return {
+        "new": [after[ip] for ip in after if ip not in before],
+        "gone": [before[ip] for ip in before if ip not in after],
+        "changed": changed,
+    }
+
+
+class Subscription:
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    async def get(self, timeout: float) -> Optional[Dict]:
+        """Next event, or None if nothing arrived within timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class ScanEventHub:
+    """Fan-out of scan events to subscribers on the engine's event loop"""
+
+    def __init__(self, queue_size: int = 1000):
+        self.queue_size = queue_size
+        self._subscribers: List[Subscription] = []
+        self._sequence = 0
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription in self._subscribers:
+            self._subscribers.remove(subscription)
+
+    def publish(self, event_type: str, **data):
+        self._sequence += 1
+        event = {"type": event_type, "seq": self._sequence, **data}
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.warning("Dropping slow scan event subscriber")
+                subscription.dropped = True
+                self.unsubscribe(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
@@ -0,0 +1,359 @@
+"""
+Minimal asyncio SNMP v2c client.
+
+Speaks just enough BER to send GET / GETNEXT / GETBULK requests and decode
+responses. One UDP socket per address family is shared by every request on the
+event loop; responses are matched to requests by request-id, so hundreds of
+devices can be polled concurrently and the whole batch takes about one timeout
+window. Replaces the blocking pysnmp hlapi calls that built a new SnmpEngine
+per request.
+"""
+import asyncio
+import ipaddress
+import itertools
+import random
+import socket
+import weakref
+from typing import Dict, List, Sequence, Tuple
+
+# PDU tags
+GET_REQUEST = 0xA0
+GET_NEXT_REQUEST = 0xA1
+GET_RESPONSE = 0xA2
+GET_BULK_REQUEST = 0xA5
+
+# Universal / application tags
+_INTEGER = 0x02
+_OCTET_STRING = 0x04
+_NULL = 0x05
+_OID = 0x06
+_SEQUENCE = 0x30
+_IP_ADDRESS = 0x40
+_COUNTER32 = 0x41
+_GAUGE32 = 0x42
+_TIMETICKS = 0x43
+_OPAQUE = 0x44
+_COUNTER64 = 0x46
+
+_ERROR_STATUS = {
+    1: "tooBig", 2: "noSuchName", 3: "badValue", 4: "readOnly", 5: "genErr",
+    6: "noAccess", 7: "wrongType", 8: "wrongLength", 9: "wrongEncoding",
+    10: "wrongValue", 11: "noCreation", 12: "inconsistentValue",
+    13: "resourceUnavailable", 14: "commitFailed", 15: "undoFailed",
+    16: "authorizationError", 17: "notWritable", 18: "inconsistentName",
+}
+
+
+class NoSuchValue:
+    """Varbind exception value (noSuchObject, noSuchInstance, endOfMibView)"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+    def __bool__(self):
+        return False
+
+
+NO_SUCH_OBJECT = NoSuchValue("noSuchObject")
+NO_SUCH_INSTANCE = NoSuchValue("noSuchInstance")
+END_OF_MIB_VIEW = NoSuchValue("endOfMibView")
+_EXCEPTION_VALUES = {0x80: NO_SUCH_OBJECT, 0x81: NO_SUCH_INSTANCE, 0x82: END_OF_MIB_VIEW}
+
+
+class SnmpError(Exception):
+    pass
+
+
+class SnmpTimeout(SnmpError):
+    pass
+
+
+# --- BER encoding -------------------------------------------------------
+
+def _encode_length(length: int) -> bytes:
+    if length < 0x80:
+        return bytes([length])
+    body = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes([0x80 | len(body)]) + body
+
+
+def _tlv(tag: int, payload: bytes) -> bytes:
+    return bytes([tag]) + _encode_length(len(payload)) + payload
+
+
+def _encode_int(value: int) -> bytes:
+    length = max(1, (value.bit_length() + 8) // 8)
+    return _tlv(_INTEGER, value.to_bytes(length, "big", signed=True))
+
+
+def _encode_oid(oid: str) -> bytes:
+    parts = [int(p) for p in oid.strip(".").split(".")]
+    if len(parts) < 2:
+        raise ValueError(f"Invalid OID: {oid}")
+    body = bytearray([parts[0] * 40 + parts[1]])
+    for part in parts[2:]:
+        chunk = [part & 0x7F]
+        part >>= 7
+        while part:
+            chunk.append(0x80 | (part & 0x7F))
+            part >>= 7
+        body.extend(reversed(chunk))
+    return _tlv(_OID, bytes(body))
+
+
+def encode_request(
+    pdu_type: int,
+    request_id: int,
+    community: str,
+    oids: Sequence[str],
+    non_repeaters: int = 0,
+    max_repetitions: int = 0
+) -> bytes:
+    """Build an SNMP v2c request message"""
+    varbinds = b"".join(_tlv(_SEQUENCE, _encode_oid(oid) + _tlv(_NULL, b"")) for oid in oids)
+    if pdu_type == GET_BULK_REQUEST:
+        fields = _encode_int(non_repeaters) + _encode_int(max_repetitions)
+    else:
+        fields = _encode_int(0) + _encode_int(0)
+    pdu = _tlv(pdu_type, _encode_int(request_id) + fields + _tlv(_SEQUENCE, varbinds))
+    return _tlv(_SEQUENCE, _encode_int(1) + _tlv(_OCTET_STRING, community.encode()) + pdu)
+
+
+# --- BER decoding -------------------------------------------------------
+
+def _decode_tlv(data: bytes, pos: int) -> Tuple[int, bytes, int]:
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        count = length & 0x7F
+        length = int.from_bytes(data[pos:pos + count], "big")
+        pos += count
+    end = pos + length
+    if end > len(data):
+        raise SnmpError("Truncated BER value")
+    return tag, data[pos:end], end
+
+
+def _decode_oid(payload: bytes) -> str:
+    first = payload[0]
+    parts = [first // 40, first % 40] if first < 80 else [2, first - 80]
+    value = 0
+    for byte in payload[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            parts.append(value)
+            value = 0
+    return ".".join(str(p) for p in parts)
+
+
+def _decode_value(tag: int, payload: bytes):
+    if tag == _INTEGER:
+        return int.from_bytes(payload, "big", signed=True)
+    if tag in (_COUNTER32, _GAUGE32, _TIMETICKS, _COUNTER64):
+        return int.from_bytes(payload, "big", signed=False)
+    if tag in (_OCTET_STRING, _OPAQUE):
+        return payload
+    if tag == _OID:
+        return _decode_oid(payload)
+    if tag == _IP_ADDRESS:
+        return ".".join(str(b) for b in payload)
+    if tag == _NULL:
+        return None
+    if tag in _EXCEPTION_VALUES:
+        return _EXCEPTION_VALUES[tag]
+    return payload
+
+
+def decode_response(data: bytes) -> Tuple[int, int, int, List[Tuple[str, object]]]:
+    """Decode a response message into (request_id, error_status, error_index, varbinds)"""
+    _, message, _ = _decode_tlv(data, 0)
+    _, _, pos = _decode_tlv(message, 0)  # version
+    _, _, pos = _decode_tlv(message, pos)  # community
+    pdu_tag, pdu, _ = _decode_tlv(message, pos)
+    if pdu_tag != GET_RESPONSE:
+        raise SnmpError(f"Unexpected PDU type 0x{pdu_tag:02x}")
+
+    _, request_id, pos = _decode_tlv(pdu, 0)
+    _, error_status, pos = _decode_tlv(pdu, pos)
+    _, error_index, pos = _decode_tlv(pdu, pos)
+    _, varbind_list, _ = _decode_tlv(pdu, pos)
+
+    varbinds = []
+    pos = 0
+    while pos < len(varbind_list):
+        _, varbind, pos = _decode_tlv(varbind_list, pos)
+        _, oid, inner = _decode_tlv(varbind, 0)
+        tag, value, _ = _decode_tlv(varbind, inner)
+        varbinds.append((_decode_oid(oid), _decode_value(tag, value)))
+
+    return (
+        int.from_bytes(request_id, "big", signed=True),
+        int.from_bytes(error_status, "big"),
+        int.from_bytes(error_index, "big"),
+        varbinds,
+    )
+
+
+def to_text(value) -> str:
+    """Render a decoded value for display (OCTET STRINGs are bytes)"""
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return str(value)
+
+
+# --- Transport ----------------------------------------------------------
+
+class _SnmpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, client: "AsyncSnmpClient"):
+        self.client = client
+
+    def datagram_received(self, data: bytes, addr):
+        self.client._on_datagram(data, addr)
+
+    def error_received(self, exc):
+        # ICMP port unreachable etc.; the request will simply time out
+        pass
+
+
+class AsyncSnmpClient:
+    """
+    SNMP v2c client sharing one UDP socket per address family.
+    Must be used from the event loop it was created on (see get_snmp_client).
+    """
+
+    def __init__(self, recv_buffer: int = 1 << 20):
+        self.recv_buffer = recv_buffer
+        self._transports: Dict[int, asyncio.DatagramTransport] = {}
+        self._opening: Dict[int, asyncio.Lock] = {}
+        # request_id -> (future, expected source ip)
+        self._pending: Dict[int, Tuple[asyncio.Future, str]] = {}
+        self._ids = itertools.count(random.randint(1, 1 << 30))
+
+    def _next_request_id(self) -> int:
+        while True:
+            request_id = next(self._ids) & 0x7FFFFFFF
+            if request_id and request_id not in self._pending:
+                return request_id
+
+    async def _transport(self, family: int) -> asyncio.DatagramTransport:
+        transport = self._transports.get(family)
+        if transport is not None and not transport.is_closing():
+            return transport
+
+        lock = self._opening.setdefault(family, asyncio.Lock())
+        async with lock:
+            transport = self._transports.get(family)
+            if transport is None or transport.is_closing():
+                sock = socket.socket(family, socket.SOCK_DGRAM)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer)
+                sock.bind(("::", 0) if family == socket.AF_INET6 else ("0.0.0.0", 0))
+                sock.setblocking(False)
+                loop = asyncio.get_running_loop()
+                transport, _ = await loop.create_datagram_endpoint(
+                    lambda: _SnmpProtocol(self), sock=sock
+                )
+                self._transports[family] = transport
+        return transport
+
+    def _on_datagram(self, data: bytes, addr):
+        try:
+            request_id, error_status, error_index, varbinds = decode_response(data)
+        except Exception:
+            return  # Not something we can parse; ignore
+        pending = self._pending.get(request_id)
+        if pending is None:
+            return
+        future, expected_ip = pending
+        if addr[0] != expected_ip or future.done():
+            return
+        if error_status:
+            name = _ERROR_STATUS.get(error_status, str(error_status))
+            future.set_exception(SnmpError(f"{name} at index {error_index}"))
+        else:
+            future.set_result(varbinds)
+
+    async def _resolve(self, host: str, port: int) -> Tuple[int, str]:
+        try:
+            addr = ipaddress.ip_address(host)
+            return (socket.AF_INET6 if addr.version == 6 else socket.AF_INET), str(addr)
+        except ValueError:
+            loop = asyncio.get_running_loop()
+            infos = await loop.getaddrinfo(host, port, type=socket.SOCK_DGRAM)
+            family, _, _, _, sockaddr = infos[0]
+            return family, sockaddr[0]
+
+    async def request(
+        self,
+        host: str,
+        oids: Sequence[str],
+        community: str = "public",
+        port: int = 161,
+        pdu_type: int = GET_REQUEST,
+        timeout: float = 1.0,
+        retries: int = 0,
+        non_repeaters: int = 0,
+        max_repetitions: int = 0
+    ) -> List[Tuple[str, object]]:
+        """Send one request and wait for its response. Raises SnmpTimeout/SnmpError."""
+        family, ip = await self._resolve(host, port)
+        transport = await self._transport(family)
+        loop = asyncio.get_running_loop()
+
+        request_id = self._next_request_id()
+        message = encode_request(pdu_type, request_id, community, oids, non_repeaters, max_repetitions)
+        future = loop.create_future()
+        self._pending[request_id] = (future, ip)
+        try:
+            for _ in range(retries + 1):
+                transport.sendto(message, (ip, port))
+                try:
+                    return await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+                except asyncio.TimeoutError:
+                    continue
+            raise SnmpTimeout(f"No SNMP response from {host}:{port}")
+        finally:
+            self._pending.pop(request_id, None)
+            if not future.done():
+                future.cancel()
+
+    async def get(self, host: str, oids: Sequence[str], **kwargs) -> List[Tuple[str, object]]:
+        return await self.request(host, oids, pdu_type=GET_REQUEST, **kwargs)
+
+    async def get_bulk(
+        self,
+        host: str,
+        oids: Sequence[str],
+        non_repeaters: int = 0,
+        max_repetitions: int = 10,
+        **kwargs
+    ) -> List[Tuple[str, object]]:
+        return await self.request(
+            host, oids, pdu_type=GET_BULK_REQUEST,
+            non_repeaters=non_repeaters, max_repetitions=max_repetitions, **kwargs
+        )
+
+    def close(self):
+        for transport in self._transports.values():
+            transport.close()
+        self._transports.clear()
+        for future, _ in self._pending.values():
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncSnmpClient]" = weakref.WeakKeyDictionary()
+
+
+def get_snmp_client() -> AsyncSnmpClient:
+    """Shared client for the running event loop (the monitor and API loops each get one)"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = AsyncSnmpClient()
+        _clients[loop] = client
+    return client
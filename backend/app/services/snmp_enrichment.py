@@ -0,0 +1,165 @@
+"""
+SNMP enrichment of discovered hosts.
+
+One v2c GETBULK per host fetches the system group (sysDescr, sysObjectID,
+sysUpTime, sysName) as non-repeaters and, when interfaces are wanted, the
+first rows of the interface table as repeaters in the same PDU; longer
+tables are walked with further GETBULKs from where the last one stopped.
+Every request goes over the shared per-loop socket of the async client, so
+a batch of hosts costs about one timeout window, not one per host.
+"""
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.snmp_client import END_OF_MIB_VIEW, NoSuchValue, SnmpError, get_snmp_client, to_text
+
+logger = logging.getLogger(__name__)
+
+# GETBULK non-repeaters act as GETNEXT: ask for the object, get its .0 instance
+SYSTEM_OIDS = {
+    "descr": "1.3.6.1.2.1.1.1",
+    "object_id": "1.3.6.1.2.1.1.2",
+    "uptime": "1.3.6.1.2.1.1.3",
+    "name": "1.3.6.1.2.1.1.5",
+}
+
+# ifTable columns, walked as repeaters
+INTERFACE_COLUMNS = {
+    "descr": "1.3.6.1.2.1.2.2.1.2",
+    "speed": "1.3.6.1.2.1.2.2.1.5",
+    "mac": "1.3.6.1.2.1.2.2.1.6",
+    "oper_status": "1.3.6.1.2.1.2.2.1.8",
+}
+
+OPER_STATUS = {
+    1: "up", 2: "down", 3: "testing", 4: "unknown",
+    5: "dormant", 6: "notPresent", 7: "lowerLayerDown",
+}
+
+
+def parse_system(varbinds: List[Tuple[str, object]]) -> Dict:
+    """System group from the non-repeater part of a GETBULK response"""
+    info = {"descr": None, "object_id": None, "uptime": None, "name": None}
+    for (field, oid), (answer_oid, value) in zip(SYSTEM_OIDS.items(), varbinds):
+        if answer_oid != oid + ".0" or isinstance(value, NoSuchValue):
+            continue  # Object missing; GETNEXT ran on to something else
+        if field == "uptime":
+            info[field] = int(value) // 100  # TimeTicks -> seconds
+        elif field == "object_id":
+            info[field] = str(value)
+        else:
+            info[field] = to_text(value).strip() or None
+    return info
+
+
+def _interface_value(field: str, value):
+    if field == "mac":
+        return ":".join(f"{b:02x}" for b in value) if isinstance(value, bytes) and value else None
+    if field == "oper_status":
+        return OPER_STATUS.get(value, str(value))
+    if field == "descr":
+        return to_text(value)
+    return value
+
+
+class SnmpEnricher:
+    def __init__(
+        self,
+        community: Optional[str] = None,
+        port: int = 161,
+        timeout: Optional[float] = None,
+        retries: int = 0,
+        max_repetitions: int = 16,
+        max_interfaces: int = 256,
+        max_in_flight: int = 512
+    ):
+        self._community = community
+        self.port = port
+        self._timeout = timeout
+        self.retries = retries
+        self.max_repetitions = max_repetitions
+        self.max_interfaces = max_interfaces
+        self.max_in_flight = max_in_flight
+
+    @property
+    def community(self) -> str:
+        return self._community if self._community is not None else settings.SNMP_COMMUNITY
+
+    @property
+    def timeout(self) -> float:
+        return self._timeout if self._timeout is not None else settings.DISCOVERY_SNMP_TIMEOUT_MS / 1000
+
+    async def _bulk(self, ip: str, oids: List[str], non_repeaters: int, max_repetitions: int):
+        return await get_snmp_client().get_bulk(
+            ip, oids,
+            non_repeaters=non_repeaters,
+            max_repetitions=max_repetitions,
+            community=self.community,
+            port=self.port,
+            timeout=self.timeout,
+            retries=self.retries
+        )
+
+    async def enrich(self, ip: str, interfaces: bool = False) -> Optional[Dict]:
+        """System group (and interface table) of one host, or None if it has no SNMP agent"""
+        columns = list(INTERFACE_COLUMNS.values()) if interfaces else []
+        try:
+            varbinds = await self._bulk(
+                ip, [*SYSTEM_OIDS.values(), *columns], len(SYSTEM_OIDS),
+                self.max_repetitions if columns else 0
+            )
+        except (SnmpError, OSError):
+            return None
+        info = parse_system(varbinds[:len(SYSTEM_OIDS)])
+        if interfaces:
+            info["interfaces"] = await self._walk_interfaces(ip, varbinds[len(SYSTEM_OIDS):])
+        return info
+
+    async def _walk_interfaces(self, ip: str, varbinds: List[Tuple[str, object]]) -> List[Dict]:
+        """
+        Interface rows from repeater varbinds, continuing with more GETBULKs
+        until every column has left its subtree (or the row limit is hit).
+        """
+        fields = list(INTERFACE_COLUMNS.items())
+        rows: Dict[int, Dict] = {}
+        cursor = {index: column for index, (_, column) in enumerate(fields)}
+        active = list(cursor)
+        for _ in range(self.max_interfaces):
+            if not varbinds:
+                break
+            # Repetitions come back interleaved: one varbind per active column
+            width = len(active)
+            for position, (oid, value) in enumerate(varbinds):
+                index = active[position % width]
+                if index not in cursor:
+                    continue
+                field, column = fields[index]
+                if value is END_OF_MIB_VIEW or not oid.startswith(column + "."):
+                    del cursor[index]
+                    continue
+                if_index = int(oid.rsplit(".", 1)[1])
+                rows.setdefault(if_index, {"index": if_index})[field] = _interface_value(field, value)
+                cursor[index] = oid
+            active = [index for index in active if index in cursor]
+            if not active or len(rows) >= self.max_interfaces:
+                break
+            try:
+                varbinds = await self._bulk(ip, [cursor[index] for index in active], 0, self.max_repetitions)
+            except (SnmpError, OSError):
+                break  # Keep what we have
+        return [rows[index] for index in sorted(rows)][:self.max_interfaces]
+
+    async def enrich_many(self, ips: Iterable[str], interfaces: bool = False) -> Dict[str, Optional[Dict]]:
+        """Enrich hosts concurrently; hosts without an agent map to None"""
+        limit = asyncio.Semaphore(self.max_in_flight)
+
+        async def one(ip: str):
+            async with limit:
+                return ip, await self.enrich(ip, interfaces)
+
+        return dict(await asyncio.gather(*(one(ip) for ip in ips)))
+
+
+snmp_enricher = SnmpEnricher()
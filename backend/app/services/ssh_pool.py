@@ -0,0 +1,239 @@
+"""
+Keyed pool of persistent SSH connections for agentless stats and remote commands.
+
+Connections are keyed by (host, port, username) and reused across check
+cycles. Idle connections are evicted, and a connection that has been idle for
+a while is probed before use. All paramiko I/O runs on the pool's own thread
+pool so the monitor's event loop never blocks on SSH.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+import paramiko
+from loguru import logger
+
+# One round trip for CPU, memory and root filesystem usage
+STATS_COMMAND = (
+    "head -n 1 /proc/stat; "
+    "grep -E '^(MemTotal|MemAvailable):' /proc/meminfo; "
+    "df -P / | tail -n 1"
+)
+
+
+class _PooledConnection:
+    def __init__(self, client: paramiko.SSHClient, password: Optional[str]):
+        self.client = client
+        self.password = password
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        # Previous /proc/stat sample (busy, total) for CPU deltas between checks
+        self.cpu_sample: Optional[Tuple[int, int]] = None
+
+    def is_alive(self, probe: bool) -> bool:
+        transport = self.client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        if probe:
+            try:
+                transport.send_ignore()
+            except Exception:
+                return False
+        return True
+
+    def close(self):
+        try:
+            self.client.close()
+        except Exception:
+            pass
+
+
+class SSHConnectionPool:
+    """Thread-safe pool of SSHClient connections keyed by host, port and user"""
+
+    def __init__(
+        self,
+        idle_timeout: int = 300,
+        probe_after: int = 60,
+        connect_timeout: int = 5,
+        max_workers: int = 32
+    ):
+        self.idle_timeout = idle_timeout
+        self.probe_after = probe_after
+        self.connect_timeout = connect_timeout
+        self.max_workers = max_workers
+        self._connections: Dict[tuple, _PooledConnection] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._last_eviction = time.monotonic()
+
+    async def run(self, func, *args):
+        """Run a blocking pool call on the pool's own worker threads"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="ssh-pool"
+                    )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connect(self, host: str, port: int, username: str, password: Optional[str]) -> paramiko.SSHClient:
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(
+            host,
+            port=port,
+            username=username,
+            password=password,
+            timeout=self.connect_timeout,
+            banner_timeout=self.connect_timeout,
+            auth_timeout=self.connect_timeout
+        )
+        # Keep NAT/firewall state alive between check cycles
+        client.get_transport().set_keepalive(30)
+        return client
+
+    def _checkout(self, host: str, port: int, username: str, password: Optional[str]) -> _PooledConnection:
+        key = (host, port, username)
+        while True:
+            with self._lock:
+                conn = self._connections.get(key)
+                if conn is None:
+                    conn = _PooledConnection(None, password)
+                    self._connections[key] = conn
+            conn.lock.acquire()
+            # evict_idle() may have dropped this entry while we waited for it
+            if self._connections.get(key) is conn:
+                break
+            conn.lock.release()
+
+        probe = time.monotonic() - conn.last_used > self.probe_after
+        if conn.client is None or conn.password != password or not conn.is_alive(probe):
+            if conn.client is not None:
+                conn.close()
+            try:
+                conn.client = self._connect(host, port, username, password)
+            except Exception:
+                conn.client = None
+                conn.lock.release()
+                raise
+            conn.password = password
+            conn.cpu_sample = None
+        return conn
+
+    def _checkin(self, conn: _PooledConnection):
+        conn.last_used = time.monotonic()
+        conn.lock.release()
+        if conn.last_used - self._last_eviction > 60:
+            self.evict_idle()
+
+    def _discard(self, conn: _PooledConnection):
+        conn.close()
+        conn.client = None
+
+    def exec(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: Optional[str],
+        command: str,
+        timeout: int = 10,
+        handle: Optional[Callable] = None
+    ):
+        """
+        Run a command on a pooled connection (blocking). Retries once on a
+        fresh connection if the pooled one turns out to be dead.
+
+        Returns:
+            (stdout, stderr), or whatever handle(stdout, stderr, connection)
+            returns. handle runs before the connection goes back to the pool,
+            so it can safely keep per-host state such as the previous CPU sample.
+        """
+        for attempt in range(2):
+            conn = self._checkout(host, port, username, password)
+            try:
+                _, stdout, stderr = conn.client.exec_command(command, timeout=timeout)
+                out = stdout.read().decode(errors="ignore")
+                err = stderr.read().decode(errors="ignore")
+                return handle(out, err, conn) if handle else (out, err)
+            except (paramiko.SSHException, EOFError, OSError) as e:
+                self._discard(conn)
+                if attempt:
+                    raise
+                logger.debug(f"Pooled SSH connection to {host}:{port} failed ({e}), reconnecting")
+            finally:
+                self._checkin(conn)
+
+    def get_stats(self, host: str, port: int, username: str, password: Optional[str]) -> dict:
+        """CPU/RAM/disk usage (%) from a single combined command"""
+        def parse(out: str, err: str, conn: _PooledConnection) -> dict:
+            stats, conn.cpu_sample = parse_stats(out, conn.cpu_sample)
+            return stats
+
+        return self.exec(host, port, username, password, STATS_COMMAND, handle=parse)
+
+    def evict_idle(self):
+        """Close connections that have not been used for idle_timeout seconds"""
+        now = time.monotonic()
+        self._last_eviction = now
+        with self._lock:
+            for key, conn in list(self._connections.items()):
+                if now - conn.last_used > self.idle_timeout and conn.lock.acquire(blocking=False):
+                    try:
+                        self._discard(conn)
+                        del self._connections[key]
+                    finally:
+                        conn.lock.release()
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+            if self._executor:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def parse_stats(output: str, previous_cpu: Optional[Tuple[int, int]] = None) -> tuple:
+    """
+    Parse STATS_COMMAND output.
+
+    CPU usage is the busy share since previous_cpu when given, otherwise the
+    average since boot. Returns (stats, cpu_sample).
+    """
+    stats = {}
+    cpu_sample = previous_cpu
+    mem = {}
+
+    for line in output.splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] == "cpu":
+            values = [int(v) for v in parts[1:]]
+            # user nice system idle iowait irq softirq steal ...
+            idle = values[3] + (values[4] if len(values) > 4 else 0)
+            total = sum(values[:8])
+            busy = total - idle
+            if previous_cpu and total > previous_cpu[1]:
+                busy_delta = busy - previous_cpu[0]
+                total_delta = total - previous_cpu[1]
+                stats['cpu'] = round(100.0 * busy_delta / total_delta, 1)
+            elif total:
+                stats['cpu'] = round(100.0 * busy / total, 1)
+            cpu_sample = (busy, total)
+        elif parts[0] in ("MemTotal:", "MemAvailable:"):
+            mem[parts[0]] = int(parts[1])
+        elif len(parts) >= 5 and parts[4].endswith('%'):
+            stats['disk'] = float(parts[4].rstrip('%'))
+
+    total_mem = mem.get("MemTotal:")
+    if total_mem and "MemAvailable:" in mem:
+        stats['ram'] = round((total_mem - mem["MemAvailable:"]) / total_mem * 100, 1)
+
+    return stats, cpu_sample
@@ -1,109 +1,79 @@
 import asyncio
-import httpx
 import time
 import sys
 import tempfile
 import os
 import subprocess
-import paramiko
 from datetime import datetime
+from typing import Optional
 from sqlalchemy.orm import Session
 from app.models.service import Service, CheckType
-from app.models.history import ServiceHistory
+from app.services.resolver import AddressCache
+from app.services.http_check import HttpCheckEngine
+from app.services.ssh_pool import SSHConnectionPool
+from app.services.result_sink import ResultSink
+from app.services.snmp_client import get_snmp_client, to_text
 from loguru import logger
-from pysnmp.hlapi import *
 
-import ipaddress
-from pysnmp.hlapi import *
+# sysDescr, sysUpTime
+SNMP_SYSTEM_OIDS = ['1.3.6.1.2.1.1.1.0', '1.3.6.1.2.1.1.3.0']
+# UCD-SNMP: ssCpuIdle, memTotalReal, memAvailReal, dskPercent (root partition usually index 1)
+SNMP_UCD_STATS_OIDS = [
+    '1.3.6.1.4.1.2021.11.11.0',
+    '1.3.6.1.4.1.2021.4.5.0',
+    '1.3.6.1.4.1.2021.4.6.0',
+    '1.3.6.1.4.1.2021.9.1.9.1',
+]
+
+def _parse_ucd_stats(values: list) -> dict:
+    """CPU/RAM/disk % from the UCD-SNMP values; agents without UCD return noSuch* values"""
+    stats = {}
+    cpu_idle, mem_total, mem_avail, disk_percent = values
+    if isinstance(cpu_idle, int):
+        stats['cpu'] = round(100.0 - cpu_idle, 1)
+    if isinstance(mem_total, int) and isinstance(mem_avail, int) and mem_total > 0:
+        stats['ram'] = round(((mem_total - mem_avail) / mem_total) * 100, 1)
+    if isinstance(disk_percent, int):
+        stats['disk'] = float(disk_percent)
+    return stats
 
-async def check_snmp(ip: str, community: str = 'public', port: int = 161) -> tuple[bool, str]:
+async def poll_snmp(ip: str, community: str = 'public', port: int = 161) -> tuple[bool, str, dict]:
+    """
+    Status and resource stats in a single GET PDU on the shared SNMP socket.
+    Returns (is_active, "SNMP OK. {descr} | Uptime: {uptime}", stats).
+    """
     try:
-        # Determine Transport Target (IPv4 vs IPv6)
-        is_ipv6 = False
-        try:
-             addr = ipaddress.ip_address(ip)
-             is_ipv6 = isinstance(addr, ipaddress.IPv6Address)
-        except ValueError:
-             pass # Hostname or invalid IP, assume IPv4/Hostname default
-             
-        transport = Udp6TransportTarget((ip, port), timeout=1.0, retries=0) if is_ipv6 else UdpTransportTarget((ip, port), timeout=1.0, retries=0)
-
-        # Query sysDescr (1.3.6.1.2.1.1.1.0)
-        iterator = getCmd(
-            SnmpEngine(),
-            CommunityData(community, mpModel=1), # v2c
-            transport,
-            ContextData(),
-            ObjectType(ObjectIdentity('1.3.6.1.2.1.1.1.0')), # sysDescr
-            ObjectType(ObjectIdentity('1.3.6.1.2.1.1.3.0'))  # sysUpTime
+        varbinds = await get_snmp_client().get(
+            ip, SNMP_SYSTEM_OIDS + SNMP_UCD_STATS_OIDS,
+            community=community, port=port, timeout=1.0, retries=0
         )
-        
-        # Pysnmp is sync, so we should run it in executor if possible, but for now blocking is okay-ish 
-        # or we wrap it. Let's assume low load or wrap in to_thread later if needed.
-        # Actually, let's keep it simple.
-        
-        errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
-        
-        if errorIndication:
-            return False, str(errorIndication)
-        elif errorStatus:
-             return False, str(errorStatus)
-        else:
-             # Success
-             descr = str(varBinds[0][1])
-             uptime = str(varBinds[1][1]) 
-             return True, f"SNMP OK. {descr} | Uptime: {uptime}"
     except Exception as e:
-        return False, str(e)
+        return False, str(e), {}
+
+    values = [value for _, value in varbinds]
+    if len(values) != len(SNMP_SYSTEM_OIDS) + len(SNMP_UCD_STATS_OIDS):
+        return False, "Malformed SNMP response", {}
 
+    descr = to_text(values[0])
+    uptime = values[1]
+    return True, f"SNMP OK. {descr} | Uptime: {uptime}", _parse_ucd_stats(values[2:])
+
+async def check_snmp(ip: str, community: str = 'public', port: int = 161) -> tuple[bool, str]:
+    is_active, content, _ = await poll_snmp(ip, community, port)
+    return is_active, content
 
 def get_ssh_stats(ip, port, username, password):
+    """Blocking; run through ssh_pool.run() so it stays off the event loop"""
     try:
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        client.connect(ip, port=port or 22, username=username, password=password, timeout=5)
-        stats = {}
-
-        # 1. CPU Usage
-        # top -bn1 | grep "Cpu(s)"
-        stdin, stdout, stderr = client.exec_command("top -bn1 | grep 'Cpu(s)'")
-        cpu_line = stdout.read().decode().strip()
-        if cpu_line:
-            parts = cpu_line.split(',')
-            for p in parts:
-                if 'id' in p:
-                    idle = float(p.strip().split()[0])
-                    stats['cpu'] = round(100 - idle, 1)
-                    break
-        if 'cpu' not in stats: stats['cpu'] = 0.0
-
-        # 2. RAM Usage
-        # free -m | grep Mem
-        stdin, stdout, stderr = client.exec_command("free -m | grep Mem")
-        mem_line = stdout.read().decode().strip()
-        if mem_line:
-            parts = mem_line.split()
-            total = int(parts[1])
-            used = int(parts[2])
-            stats['ram'] = round((used / total) * 100, 1)
-
-        # 3. Disk Usage (Root)
-        # df -h / | tail -1
-        stdin, stdout, stderr = client.exec_command("df -h / | tail -1")
-        disk_line = stdout.read().decode().strip()
-        if disk_line:
-            parts = disk_line.split()
-            percent = parts[4].replace('%', '')
-            stats['disk'] = float(percent)
-
-        client.close()
-        return stats
+        return ssh_pool.get_stats(ip, port or 22, username, password)
     except Exception as e:
         logger.warning(f"SSH Stats Failed: {e}")
         return None
 
-async def check_tcp(host: str, port: int, timeout: int = 2) -> tuple[bool, str]:
+async def check_tcp(host: str, port: int, timeout: int = 2, addresses: Optional[AddressCache] = None) -> tuple[bool, str]:
     try:
+        if addresses:
+            host = await asyncio.wait_for(addresses.resolve(host, port), timeout=timeout)
         reader, writer = await asyncio.wait_for(
             asyncio.open_connection(host, port), timeout=timeout
         )
@@ -124,18 +94,26 @@ async def check_tcp(host: str, port: int, timeout: int = 2) -> tuple[bool, str]:
     except Exception as e:
         return False, str(e)
 
-async def check_http(url: str, timeout: int = 5) -> tuple[bool, str]:
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, timeout=timeout)
-            is_ok = 200 <= response.status_code < 400
-            return is_ok, response.text
-    except httpx.TimeoutException:
-        return False, "Timeout"
-    except httpx.ConnectError:
-        return False, "Connection Refused"
-    except Exception as e:
-        return False, str(e)
+async def check_http(
+    url: str,
+    timeout: int = 5,
+    engine: Optional[HttpCheckEngine] = None,
+    expected: Optional[str] = None
+) -> tuple[bool, str]:
+    if engine is None:
+        # Outside the monitor loop: one-off engine, still streamed and capped
+        engine = HttpCheckEngine(max_connections=1, max_body_bytes=settings.MONITOR_HTTP_MAX_BODY_BYTES)
+        try:
+            result = await engine.check(url, timeout=timeout, expected=expected)
+        finally:
+            await engine.aclose()
+    else:
+        result = await engine.check(url, timeout=timeout, expected=expected)
+
+    logger.debug(f"HTTP check {url}: status={result.status_code} timings={result.timings}")
+    if result.error:
+        return False, result.error
+    return result.is_ok, result.body
 
 async def check_script(content: str, timeout: int = 5) -> tuple[bool, str]:
     if not content: return False, ""
@@ -166,7 +144,11 @@ async def check_script(content: str, timeout: int = 5) -> tuple[bool, str]:
         logger.error(f"Script check failed: {e}")
         return False, str(e)
 
-async def perform_check(service: Service) -> tuple[bool, int, str]:
+async def perform_check(
+    service: Service,
+    http_engine: Optional[HttpCheckEngine] = None,
+    addresses: Optional[AddressCache] = None
+) -> tuple[bool, int, str]:
     start_time = time.time()
     is_active = False
     response_content = ""
@@ -174,7 +156,7 @@ async def perform_check(service: Service) -> tuple[bool, int, str]:
     try:
         if service.check_type == CheckType.TCP:
             if service.port:
-                is_active, response_content = await check_tcp(service.ip, service.port)
+                is_active, response_content = await check_tcp(service.ip, service.port, addresses=addresses)
         elif service.check_type == CheckType.HTTP:
             target = service.check_target or ""
             if not target.startswith("http"):
@@ -182,12 +164,23 @@ async def perform_check(service: Service) -> tuple[bool, int, str]:
                  url = f"http://{service.ip}{port_str}{target}"
             else:
                  url = target
-            is_active, response_content = await check_http(url)
+            is_active, response_content = await check_http(
+                url, engine=http_engine, expected=service.expected_response
+            )
         elif service.check_type == CheckType.SCRIPT:
             is_active, response_content = await check_script(service.script_content)
         elif service.check_type == CheckType.SNMP:
-            is_active, response_content = await check_snmp(service.ip, service.snmp_community, service.snmp_port)
+            is_active, response_content, snmp_stats = await poll_snmp(
+                service.ip, service.snmp_community, service.snmp_port
+            )
             if is_active:
+                 # Resource stats arrive in the same PDU as the status. SSH stats,
+                 # when configured, override these in check_and_update_service.
+                 if snmp_stats:
+                     service.cpu_usage = snmp_stats.get('cpu')
+                     service.ram_usage = snmp_stats.get('ram')
+                     service.disk_usage = snmp_stats.get('disk')
+
                  # Parse response to update service fields if we wanted, 
                  # but check_and_update_service handles the string content.
                  # We might want to parse 'sys_descr' from the content string here if we want to save it separately.
@@ -209,207 +202,336 @@ async def perform_check(service: Service) -> tuple[bool, int, str]:
     duration = int((time.time() - start_time) * 1000)
     return is_active, duration, response_content
 
+from app.core.config import settings
 from app.core.database import engine
 from sqlmodel import Session, select
 
-def get_snmp_stats(ip: str, community: str = 'public', port: int = 161) -> dict:
-    stats = {}
-    try:
-        # Determine Transport (Basic IPv4 support for stats for now, can expand later if needed)
-        transport = UdpTransportTarget((ip, port), timeout=1.0, retries=0)
-        
-        # UCD-SNMP OIDs
-        # ssCpuIdle: .1.3.6.1.4.1.2021.11.11.0
-        # memTotalReal: .1.3.6.1.4.1.2021.4.5.0
-        # memAvailReal: .1.3.6.1.4.1.2021.4.6.0
-        # dskPercent (root partition usually index 1): .1.3.6.1.4.1.2021.9.1.9.1
-        
-        iterator = getCmd(
-            SnmpEngine(),
-            CommunityData(community, mpModel=1),
-            transport,
-            ContextData(),
-            ObjectType(ObjectIdentity('1.3.6.1.4.1.2021.11.11.0')), 
-            ObjectType(ObjectIdentity('1.3.6.1.4.1.2021.4.5.0')),  
-            ObjectType(ObjectIdentity('1.3.6.1.4.1.2021.4.6.0')),
-            ObjectType(ObjectIdentity('1.3.6.1.4.1.2021.9.1.9.1')) 
-        )
-        
-        errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
-        
-        if not errorIndication and not errorStatus:
-            try:
-                # Type check/conversion can be tricky with pysnmp types, casting to int usually works
-                cpu_idle = int(varBinds[0][1])
-                mem_total = int(varBinds[1][1])
-                mem_avail = int(varBinds[2][1])
-                disk_percent = int(varBinds[3][1])
-                
-                stats['cpu'] = round(100.0 - cpu_idle, 1)
-                if mem_total > 0:
-                    stats['ram'] = round(((mem_total - mem_avail) / mem_total) * 100, 1)
-                stats['disk'] = float(disk_percent)
-            except Exception as e:
-                # logger.warning(f"SNMP Stats parse error: {e}")
-                pass
+ssh_pool = SSHConnectionPool(
+    idle_timeout=settings.SSH_POOL_IDLE_SECONDS,
+    connect_timeout=5,
+    max_workers=settings.SSH_POOL_WORKERS
+)
 
-    except Exception:
-        pass
-    return stats
+result_sink = ResultSink(
+    engine,
+    flush_interval=settings.MONITOR_FLUSH_INTERVAL_MS / 1000,
+    max_batch=settings.MONITOR_FLUSH_MAX_ROWS
+)
+
+# Service columns written back after every check
+RESULT_FIELDS = (
+    'is_active', 'response_time_ms', 'last_checked', 'drift_detected',
+    'cpu_usage', 'ram_usage', 'disk_usage', 'sys_descr', 'last_healed'
+)
 
 async def check_and_update_service(service_id: int):
+    # Read-only lookup; results are written back in batches by result_sink
     with Session(engine) as session:
         service = session.get(Service, service_id)
-        if not service:
-            return
+    if not service:
+        return
 
-        is_active, duration, content = await perform_check(service)
-        
-        # Drift Detection Logic
-        drift = False
-        if is_active and service.expected_response:
-            if service.expected_response not in content:
-                drift = True
-        
-        service.is_active = is_active
-        service.response_time_ms = duration
-        service.last_checked = datetime.utcnow()
-        service.drift_detected = drift
-        
-        # Collect Resource Stats (SSH or SNMP)
-        stats = {}
-        
-        # 1. Try SSH if credentials exist
-        if service.ssh_username and service.ssh_password:
-             from app.core.security import decrypt_password
-             plain_pass = decrypt_password(service.ssh_password)
-             stats = get_ssh_stats(service.ip, service.port, service.ssh_username, plain_pass) or {}
-             
-        # 2. If no SSH stats and check_type is SNMP, try SNMP stats
-        if not stats and service.check_type == CheckType.SNMP:
-            # We wrap this because get_snmp_stats is sync
-            # For simplicity, calling directly as it's fast UDP, but technically blocking. 
-            # Given single thread loop in monitor, it's acceptable for now.
-            stats = get_snmp_stats(service.ip, service.snmp_community, service.snmp_port)
-
-        # Update Service Model
-        if stats:
-             service.cpu_usage = stats.get('cpu')
-             service.ram_usage = stats.get('ram')
-             service.disk_usage = stats.get('disk')
-
-        session.add(service)
-
-        # Record History
-        history = ServiceHistory(
-            service_id=service.id,
-            is_active=is_active,
-            latency_ms=duration,
-            cpu_usage=service.cpu_usage,
-            ram_usage=service.ram_usage,
-            disk_usage=service.disk_usage
-        )
-        
-        # Webhook Notification (on Status Change)
-        if service.is_active != is_active:
-             # Status changed!
-             # Fire and forget webhook
-             from app.services.notification import notification_service
-             
-             payload = {
-                 "event": "status_change",
-                 "service_id": service.id,
-                 "service_name": service.name,
-                 "ip": service.ip,
-                 "status": "UP" if is_active else "DOWN",
-                 "timestamp": datetime.utcnow().isoformat()
-             }
-             
-             await notification_service.send_notification("status_change", payload)
-
-             # Auto-Healing Logic (Trigger only when going DOWN)
-             if not is_active and service.auto_restart and service.restart_command:
-                 now = datetime.utcnow()
-                 # Check cooldown (15 minutes = 900 seconds)
-                 if not service.last_healed or (now - service.last_healed).total_seconds() > 900:
-                     logger.info(f"Auto-Healing triggered for {service.name} ({service.ip})")
-                     try:
-                         # For now, only SSH commands supported
-                         if service.ssh_username and service.ssh_password:
-                             from app.core.security import decrypt_password
-                             plain_pass = decrypt_password(service.ssh_password)
-                             
-                             # We use paramiko to exec command
-                             client = paramiko.SSHClient()
-                             client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-                             client.connect(
-                                 service.ip, 
-                                 port=service.port or 22, 
-                                 username=service.ssh_username, 
-                                 password=plain_pass, 
-                                 timeout=10
-                             )
-                             stdin, stdout, stderr = client.exec_command(service.restart_command)
-                             # We don't really care about output for now, just that we sent it.
-                             # But maybe log it?
-                             out = stdout.read().decode().strip()
-                             err = stderr.read().decode().strip()
-                             client.close()
-                             
-                             service.last_healed = now
-                             logger.info(f"Auto-Heal Command Executed: {service.restart_command} | Out: {out} | Err: {err}")
-                             
-                             # Log to Audit/History? 
-                             # Maybe add a special event to history or separate log?
-                             # For now, just relying on logger.
-                             
-                     except Exception as e:
-                         logger.error(f"Auto-Healing Failed: {e}")
-
-        session.add(history)
-        
-        session.commit()
+    was_active = service.is_active
+    is_active, duration, content = await perform_check(service, **service_monitor.shared_resources())
+    
+    # Drift Detection Logic
+    drift = False
+    if is_active and service.expected_response:
+        if service.expected_response not in content:
+            drift = True
+    
+    service.is_active = is_active
+    service.response_time_ms = duration
+    service.last_checked = datetime.utcnow()
+    service.drift_detected = drift
+    
+    # Collect Resource Stats (SSH or SNMP)
+    stats = {}
+    
+    # 1. Try SSH if credentials exist
+    if service.ssh_username and service.ssh_password:
+         from app.core.security import decrypt_password
+         plain_pass = decrypt_password(service.ssh_password)
+         # paramiko is blocking; the pool runs it on its own worker threads
+         stats = await ssh_pool.run(
+             get_ssh_stats, service.ip, service.port, service.ssh_username, plain_pass
+         ) or {}
+         
+    # 2. SNMP services already collected stats with the status poll (perform_check)
+
+    # Update Service Model
+    if stats:
+         service.cpu_usage = stats.get('cpu')
+         service.ram_usage = stats.get('ram')
+         service.disk_usage = stats.get('disk')
+
+    # Webhook Notification (on Status Change)
+    if was_active != is_active:
+         # Status changed!
+         # Fire and forget webhook
+         from app.services.notification import notification_service
+         
+         payload = {
+             "event": "status_change",
+             "service_id": service.id,
+             "service_name": service.name,
+             "ip": service.ip,
+             "status": "UP" if is_active else "DOWN",
+             "timestamp": datetime.utcnow().isoformat()
+         }
+         
+         await notification_service.send_notification("status_change", payload)
+
+         # Auto-Healing Logic (Trigger only when going DOWN)
+         if not is_active and service.auto_restart and service.restart_command:
+             now = datetime.utcnow()
+             # Check cooldown (15 minutes = 900 seconds)
+             if not service.last_healed or (now - service.last_healed).total_seconds() > 900:
+                 logger.info(f"Auto-Healing triggered for {service.name} ({service.ip})")
+                 try:
+                     # For now, only SSH commands supported
+                     if service.ssh_username and service.ssh_password:
+                         from app.core.security import decrypt_password
+                         plain_pass = decrypt_password(service.ssh_password)
+                         
+                         # Reuse the pooled connection, off the event loop
+                         out, err = await ssh_pool.run(
+                             ssh_pool.exec,
+                             service.ip,
+                             service.port or 22,
+                             service.ssh_username,
+                             plain_pass,
+                             service.restart_command
+                         )
+                         out, err = out.strip(), err.strip()
+                         
+                         service.last_healed = now
+                         logger.info(f"Auto-Heal Command Executed: {service.restart_command} | Out: {out} | Err: {err}")
+                         
+                         # Log to Audit/History? 
+                         # Maybe add a special event to history or separate log?
+                         # For now, just relying on logger.
+                         
+                 except Exception as e:
+                     logger.error(f"Auto-Healing Failed: {e}")
+
+    # Record History
+    result_sink.add(
+        service.id,
+        {field: getattr(service, field) for field in RESULT_FIELDS},
+        {
+            "service_id": service.id,
+            "is_active": is_active,
+            "latency_ms": duration,
+            "cpu_usage": service.cpu_usage,
+            "ram_usage": service.ram_usage,
+            "disk_usage": service.disk_usage,
+            "timestamp": service.last_checked
+        }
+    )
 
 import threading
+from app.services.check_scheduler import CheckScheduler
 
 class ServiceMonitor:
+    """
+    Runs scheduled checks on one long-lived event loop in a background thread.
+
+    The loop owns the resources that should outlive a single check: the pooled
+    HTTP check engine, the forward-DNS cache and the concurrency semaphores. Checks
+    requested from other loops (API handlers) are handed over with run_check().
+    """
+
     def __init__(self):
         self._stop_event = threading.Event()
         self._thread = None
+        self._loop = None
+        self._wakeup = None
+        self._tasks = set()
+        self.scheduler = CheckScheduler()
+        self._check_types = {}
+
+        # Owned by the monitor loop; created in _main()
+        self.http_engine = None
+        self.addresses = None
+        self._global_limit = None
+        self._type_limits = {}
 
     def start(self):
         self._stop_event.clear()
-        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
         self._thread.start()
 
     def stop(self):
         if self._thread:
             self._stop_event.set()
+            self._wake()
             self._thread.join()
+            self._thread = None
+
+    def _wake(self):
+        """Wake the monitor loop from any thread"""
+        loop = self._loop
+        if loop and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                pass  # Loop closed between the check and the call
 
-    def _loop(self):
+    def _on_monitor_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def shared_resources(self) -> dict:
+        """Pooled resources for perform_check, only valid on the monitor loop"""
+        if self.http_engine is None or not self._on_monitor_loop():
+            return {}
+        return {"http_engine": self.http_engine, "addresses": self.addresses}
+
+    def track(self, service: Service, delay: Optional[float] = None):
+        """
+        Add or refresh a service in the check schedule.
+        Safe to call from API handlers; wakes the monitor if the service is now due first.
+        """
+        self._check_types[service.id] = service.check_type
+        if self.scheduler.schedule(service.id, service.check_interval, delay):
+            self._wake()
+
+    def untrack(self, service_id: int):
+        """Remove a deleted service from the check schedule"""
+        self._check_types.pop(service_id, None)
+        self.scheduler.remove(service_id)
+
+    async def run_check(self, service_id: int):
+        """
+        Check a service now, from any event loop.
+        Runs on the monitor loop (sharing its pools and limits) when it is up.
+        """
+        loop = self._loop
+        if loop is None or not loop.is_running() or self._on_monitor_loop():
+            await check_and_update_service(service_id)
+        else:
+            future = asyncio.run_coroutine_threadsafe(self._limited_check(service_id), loop)
+            await asyncio.wrap_future(future)
+        # Callers read the service back right after, so don't wait for the batch
+        await asyncio.to_thread(result_sink.flush)
+
+    def _sync_schedule(self):
+        """
+        Reconcile the schedule with the service table.
+        Runs at startup and every MONITOR_RESYNC_SECONDS to pick up writes that
+        bypass the API (backup restores, direct DB edits).
+        """
+        known = set(self.scheduler.service_ids())
+        with Session(engine) as session:
+            rows = session.exec(
+                select(Service.id, Service.check_interval, Service.last_checked, Service.check_type)
+            ).all()
+
+        now = datetime.utcnow()
+        seen = set()
+        for service_id, interval, last_checked, check_type in rows:
+            seen.add(service_id)
+            self._check_types[service_id] = check_type
+            if service_id in self.scheduler:
+                continue
+            delay = 0
+            if last_checked:
+                delay = (interval or 0) - (now - last_checked).total_seconds()
+            self.scheduler.schedule(service_id, interval, delay)
+
+        # Only drop ids that were scheduled before the query ran, so services
+        # created concurrently through the API are not removed by mistake.
+        for service_id in known - seen:
+            self.untrack(service_id)
+
+    def _run_loop(self):
+        try:
+            asyncio.run(self._main())
+        except Exception as e:
+            logger.error(f'Monitor Loop Error: {e}')
+
+    async def _main(self):
+        self._wakeup = asyncio.Event()
+        self.addresses = AddressCache()
+        self.http_engine = HttpCheckEngine(
+            max_connections=settings.MONITOR_HTTP_CONCURRENCY,
+            http2=settings.MONITOR_HTTP2,
+            max_body_bytes=settings.MONITOR_HTTP_MAX_BODY_BYTES,
+            addresses=self.addresses
+        )
+        self._global_limit = asyncio.Semaphore(settings.MONITOR_MAX_CONCURRENT_CHECKS)
+        self._type_limits = self._build_limits()
+        self._loop = asyncio.get_running_loop()
+        flusher = asyncio.create_task(result_sink.run())
+
+        try:
+            await self._schedule_loop()
+        finally:
+            self._loop = None
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            flusher.cancel()
+            await asyncio.gather(flusher, return_exceptions=True)
+            result_sink.flush()
+            await self.http_engine.aclose()
+            self.http_engine = None
+            ssh_pool.close_all()
+
+    async def _schedule_loop(self):
+        next_sync = 0.0
         while not self._stop_event.is_set():
             try:
-                # We need a fresh event loop for the thread to run async tasks
-                asyncio.run(self._check_all())
+                if time.monotonic() >= next_sync:
+                    await asyncio.to_thread(self._sync_schedule)
+                    next_sync = time.monotonic() + settings.MONITOR_RESYNC_SECONDS
+
+                for service_id in self.scheduler.pop_due():
+                    task = asyncio.create_task(self._scheduled_check(service_id))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
             except Exception as e:
                 logger.error(f'Monitor Loop Error: {e}')
-            
-            # Simple sleep
-            time.sleep(10)
 
-    async def _check_all(self):
-        with Session(engine) as session:
-            statement = select(Service)
-            services = session.exec(statement).all()
-            
-            for service in services:
-                 # Check interval logic
-                 if service.last_checked and service.check_interval:
-                     elapsed = (datetime.utcnow() - service.last_checked).total_seconds()
-                     if elapsed < service.check_interval:
-                         continue
-
-                 await check_and_update_service(service.id)
+            # Sleep until the next deadline; track() wakes us early if a
+            # newly scheduled service is due sooner.
+            timeout = next_sync - time.monotonic()
+            delay = self.scheduler.next_delay()
+            if delay is not None:
+                timeout = min(timeout, delay)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _build_limits(self) -> dict:
+        """Per-CheckType semaphores so one slow check type cannot starve the others"""
+        return {
+            CheckType.TCP: asyncio.Semaphore(settings.MONITOR_TCP_CONCURRENCY),
+            CheckType.HTTP: asyncio.Semaphore(settings.MONITOR_HTTP_CONCURRENCY),
+            CheckType.ICMP: asyncio.Semaphore(settings.MONITOR_ICMP_CONCURRENCY),
+            CheckType.SCRIPT: asyncio.Semaphore(settings.MONITOR_SCRIPT_CONCURRENCY),
+            CheckType.SNMP: asyncio.Semaphore(settings.MONITOR_SNMP_CONCURRENCY),
+        }
+
+    async def _limited_check(self, service_id: int):
+        # Take the per-type slot first so queued checks of a saturated type
+        # do not hold global slots that other types could use.
+        type_limit = self._type_limits[self._check_types.get(service_id, CheckType.TCP)]
+        async with type_limit:
+            async with self._global_limit:
+                await check_and_update_service(service_id)
+
+    async def _scheduled_check(self, service_id: int):
+        try:
+            await self._limited_check(service_id)
+        except Exception as e:
+            logger.error(f"Check failed for service {service_id}: {e}")
+        finally:
+            self.scheduler.reschedule(service_id)
 
 service_monitor = ServiceMonitor()
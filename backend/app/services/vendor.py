@@ -1,22 +1,215 @@
-from mac_vendor_lookup import MacLookup, BaseMacLookup
+"""
+MAC vendor lookup against the IEEE registries (MA-L/OUI, MA-M, MA-S).
 
-# Initialize global instance
-# Note: In production we might want to update this periodically
-BaseMacLookup.cache_path = "mac-vendors.txt" 
-mac = MacLookup()
+The registry is loaded on first use, not at import, into one dict per
+assignment size keyed by the integer prefix (24, 28 or 36 bits); lookups
+try the longest prefix first, so each one is a few dict probes.
 
-async def lookup_vendor(mac_address: str) -> str:
-    try:
-        # Sanitize MAC
-        clean_mac = mac_address.replace("-", ":").replace(".", ":")
-        return mac.lookup_vendor(clean_mac)
-    except:
+Sources, in order: the files in OUI_DB_PATH (IEEE CSV exports, oui.txt,
+Wireshark manuf or "PREFIX:Vendor" lines), then the list downloaded by
+mac-vendor-lookup (or the mac-vendors.txt older releases kept in the working
+directory). reload() re-reads them without touching the network; when there
+is no source at all, the first async lookup downloads the list once.
+"""
+import asyncio
+import logging
+import os
+import re
+import sys
+import threading
+from typing import Dict, Iterable, List, Optional
+from weakref import WeakKeyDictionary
+
+from app.core.config import settings
+
+try:
+    from mac_vendor_lookup import AsyncMacLookup, BaseMacLookup
+    MAC_VENDOR_LOOKUP_AVAILABLE = True
+except ImportError:
+    MAC_VENDOR_LOOKUP_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+PREFIX_BITS = (36, 28, 24)  # MA-S, MA-M, MA-L: longest first
+_HEX = re.compile(r"[^0-9A-Fa-f]")
+_OUI_TXT = re.compile(r"^([0-9A-Fa-f]{6})\s+\(base 16\)\s+(.+)$")
+_PREFIX_LINE = re.compile(r"^([0-9A-Fa-f]{6}):(.+)$")
+LEGACY_CACHE_PATH = "mac-vendors.txt"  # Where releases before the index kept the list
+
+
+def mac_to_int(mac: str) -> Optional[int]:
+    digits = _HEX.sub("", mac or "")
+    if len(digits) != 12:
+        return None
+    return int(digits, 16)
+
+
+def parse_registry(text: str) -> List[tuple]:
+    """[(hex prefix, bits, vendor)] from any of the supported registry formats"""
+    entries = []
+    lines = text.splitlines()
+    if lines and lines[0].startswith("Registry,Assignment"):
+        import csv
+        for row in csv.reader(lines[1:]):
+            if len(row) >= 3 and row[1]:
+                entries.append((row[1], len(row[1]) * 4, row[2].strip()))
+        return entries
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        match = _OUI_TXT.match(line)
+        if match:
+            entries.append((match.group(1), 24, match.group(2).strip()))
+        elif "\t" in line:
+            # Wireshark manuf: "00:1B:C5:00:00:00/36<TAB>Short<TAB>Long name"
+            fields = line.split("\t")
+            prefix, _, bits = fields[0].partition("/")
+            digits = _HEX.sub("", prefix)
+            entries.append((digits, int(bits) if bits else len(digits) * 4, fields[-1].strip()))
+        else:
+            # mac-vendor-lookup cache: "286FB9:Vendor"
+            match = _PREFIX_LINE.match(line)
+            if match:
+                entries.append((match.group(1), 24, match.group(2).strip()))
+    return entries
+
+
+class VendorDatabase:
+    def __init__(self, paths: Optional[List[str]] = None):
+        self.paths = paths
+        self._tables: Optional[Dict[int, Dict[int, str]]] = None
+        self._lock = threading.Lock()
+        self.source: List[str] = []
+
+    @property
+    def loaded(self) -> bool:
+        return self._tables is not None
+
+    def _sources(self) -> List[str]:
+        if self.paths is not None:
+            return list(self.paths)
+        sources = [p.strip() for p in settings.OUI_DB_PATH.split(",") if p.strip()]
+        locations = [LEGACY_CACHE_PATH]
+        if MAC_VENDOR_LOOKUP_AVAILABLE:
+            locations[:0] = [BaseMacLookup.cache_path, sys.prefix + "/cache/mac-vendors.txt"]
+        for location in locations:
+            if os.path.exists(location) and os.path.getsize(location):
+                sources.append(location)
+                break
+        return sources
+
+    def has_sources(self) -> bool:
+        return any(os.path.exists(path) for path in self._sources())
+
+    def load(self) -> int:
+        """(Re)build the index from local files; returns the number of prefixes"""
+        tables: Dict[int, Dict[int, str]] = {bits: {} for bits in PREFIX_BITS}
+        names: Dict[str, str] = {}  # Share one string per vendor
+        loaded_from = []
+        for path in self._sources():
+            try:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    entries = parse_registry(f.read())
+            except OSError as e:
+                logger.warning(f"Cannot read vendor registry {path}: {e}")
+                continue
+            for prefix, bits, vendor in entries:
+                if bits not in tables or len(prefix) * 4 < bits or not vendor:
+                    continue
+                try:
+                    key = int(prefix[:bits // 4], 16)
+                except ValueError:
+                    continue
+                # Earlier sources win (OUI_DB_PATH before the downloaded list)
+                tables[bits].setdefault(key, names.setdefault(vendor, vendor))
+            loaded_from.append(path)
+        self._tables, self.source = tables, loaded_from
+        count = sum(len(table) for table in tables.values())
+        logger.info(f"Vendor database: {count} prefixes from {loaded_from or 'no sources'}")
+        return count
+
+    def reload(self) -> int:
+        return self.load()
+
+    def ensure_loaded(self):
+        if self._tables is None:
+            with self._lock:  # One load even if several threads get here first
+                if self._tables is None:
+                    self.load()
+
+    def lookup(self, mac: str) -> Optional[str]:
+        """Vendor for a MAC in any common notation, longest registered prefix first"""
+        value = mac_to_int(mac)
+        if value is None:
+            return None
+        self.ensure_loaded()
+        tables = self._tables
+        for bits in PREFIX_BITS:
+            vendor = tables[bits].get(value >> (48 - bits))
+            if vendor:
+                return vendor
         return None
 
+    def lookup_many(self, macs: Iterable[str]) -> Dict[str, Optional[str]]:
+        self.ensure_loaded()
+        return {mac: self.lookup(mac) for mac in macs}
+
+    def stats(self) -> Dict:
+        self.ensure_loaded()
+        return {
+            "sources": self.source,
+            "prefixes": {f"{bits}-bit": len(self._tables[bits]) for bits in PREFIX_BITS},
+        }
+
+
+vendor_db = VendorDatabase()
+
+# One first-use download per event loop; concurrent lookups wait for it
+_downloads: "WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Future]" = WeakKeyDictionary()
+
+
+async def _download_if_missing():
+    if not await asyncio.to_thread(vendor_db.has_sources):
+        await update_vendor_db()
+
+
+async def _ensure_loaded():
+    """First use: parse the registry off the event loop, downloading it if there is none"""
+    if MAC_VENDOR_LOOKUP_AVAILABLE and vendor_db.paths is None:
+        loop = asyncio.get_running_loop()
+        download = _downloads.get(loop)
+        if download is None:
+            download = _downloads[loop] = asyncio.ensure_future(_download_if_missing())
+        await asyncio.shield(download)
+    await asyncio.to_thread(vendor_db.ensure_loaded)
+
+
+async def lookup_vendor(mac_address: str) -> Optional[str]:
+    if not vendor_db.loaded:
+        await _ensure_loaded()
+    return vendor_db.lookup(mac_address)
+
+
+async def lookup_vendors(mac_addresses: Iterable[str]) -> Dict[str, Optional[str]]:
+    if not vendor_db.loaded:
+        await _ensure_loaded()
+    return vendor_db.lookup_many(mac_addresses)
+
+
 async def update_vendor_db():
+    """Download the current IEEE list (mac-vendor-lookup) and rebuild the index"""
+    if not MAC_VENDOR_LOOKUP_AVAILABLE:
+        logger.warning("mac-vendor-lookup is not installed; use OUI_DB_PATH and reload instead")
+        return
     try:
-        print("Updating MAC Vendor DB...")
-        mac.update_vendors()
-        print("MAC Vendor DB updated.")
+        logger.info("Updating MAC Vendor DB...")
+        directory = os.path.dirname(BaseMacLookup.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        await AsyncMacLookup().update_vendors()
+        await asyncio.to_thread(vendor_db.reload)
+        logger.info("MAC Vendor DB updated.")
     except Exception as e:
-        print(f"Failed to update MAC Vendor DB: {e}")
+        logger.error(f"Failed to update MAC Vendor DB: {e}")
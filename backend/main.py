@@ -71,6 +71,12 @@ async def lifespan(app: FastAPI):
     # Runs every Monday at 9:00 AM
     scheduler.add_job(email_service.process_digest, 'cron', day_of_week='mon', hour=9, minute=0, args=['weekly'])
     
+    # History rollups every minute; retention pruning and vacuum once an hour
+    from app.services.history_rollup import history_rollup
+    from app.services.db_maintenance import db_maintenance
+    scheduler.add_job(history_rollup.run, 'interval', minutes=1, max_instances=1, coalesce=True)
+    scheduler.add_job(db_maintenance.run, 'cron', minute=30, max_instances=1, coalesce=True)
+    
     scheduler.start()
     logger.info("Email Digest Scheduler started")
     
@@ -79,7 +85,7 @@ async def lifespan(app: FastAPI):
     # Shutdown
     scheduler.shutdown()
     service_monitor.stop()
-    discovery_engine.stop()
+    await discovery_engine.stop()
     trap_receiver.stop()
     guacd_manager.stop()
     logger.info("Application shutdown")
@@ -0,0 +1,383 @@
+"""
+Unit tests for the two-tier cache
+"""
+import asyncio
+import fnmatch
+import threading
+import time
+
+import app.core.cache as cache_module
+from app.core.cache import CacheManager, MemoryCache, _is_fresh, _wrap, cached
+
+
+class FakeRedis:
+    """Just the commands the cache uses, over a dict, counting round trips"""
+
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        if key.startswith("cache-generation:"):
+            self.round_trips += 1
+        entry = self._live(key)
+        return entry[0] if entry else None
+
+    def incr(self, key):
+        self.round_trips += 1
+        value = int(self.data.get(key, ("0",))[0]) + 1
+        self.data[key] = (str(value), float("inf"))
+        return value
+
+    def scan_iter(self, match, count):
+        self.round_trips += 1
+        return iter([key for key in self.data if fnmatch.fnmatchcase(key, match)])
+
+    def unlink(self, *keys):
+        return self.delete(*keys)
+
+    def pttl(self, key):
+        entry = self._live(key)
+        return int((entry[1] - time.monotonic()) * 1000) if entry else -2
+
+    def setex(self, key, ttl, value):
+        self.round_trips += 1
+        self.data[key] = (value, time.monotonic() + ttl)
+
+    def delete(self, *keys):
+        self.round_trips += 1
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def get(self, key):
+        self.calls.append(("get", key))
+
+    def pttl(self, key):
+        self.calls.append(("pttl", key))
+
+    def execute(self):
+        self.client.round_trips += 1
+        return [getattr(self.client, name)(key) for name, key in self.calls]
+
+
+class FakeAsyncRedis:
+    """asyncio flavour: pipelines are awaited, and each await is one round trip"""
+
+    def __init__(self, sync):
+        self.sync = sync
+
+    def pipeline(self, transaction=True):
+        return FakeAsyncPipeline(self.sync)
+
+    async def delete(self, *keys):
+        return self.sync.delete(*keys)
+
+    async def get(self, key):
+        return self.sync.get(key)
+
+    async def incr(self, key):
+        return self.sync.incr(key)
+
+
+class FakeAsyncPipeline(FakePipeline):
+    def setex(self, key, ttl, value):
+        self.calls.append(("setex", key, ttl, value))
+
+    async def execute(self):
+        await asyncio.sleep(0)
+        self.client.round_trips += 1
+        replies = []
+        for name, *args in self.calls:
+            if name == "setex":
+                self.client.data[args[0]] = (args[2], time.monotonic() + args[1])
+                replies.append(True)
+            else:
+                replies.append(getattr(self.client, name)(*args))
+        return replies
+
+
+class TestMemoryCache:
+    def test_lru_eviction_by_count_and_bytes(self):
+        cache = MemoryCache(max_entries=3, max_bytes=100)
+        for key in "abc":
+            cache.set(key, key, ttl=60, size=10)
+        cache.get("a")  # Now most recently used
+        cache.set("d", "d", ttl=60, size=10)
+        assert cache.get("b") is None and cache.get("a") == "a"
+
+        cache.set("big", "x", ttl=60, size=95)
+        assert len(cache) == 1 and cache.bytes == 95
+        assert not cache.set("huge", "x", ttl=60, size=101)
+        assert cache.info()["evictions"] == 4
+
+    def test_ttl_expiry(self):
+        cache = MemoryCache()
+        cache.set("k", 0, ttl=0.05, size=1)
+        assert cache.get("k", "missing") == 0  # Falsy values are hits
+        time.sleep(0.06)
+        assert cache.get("k", "missing") == "missing"
+        assert cache.stats == {"hits": 1, "misses": 1, "evictions": 0, "expirations": 1}
+        assert cache.bytes == 0
+
+
+class TestCacheManager:
+    def test_memory_only_honours_ttl(self):
+        cache = CacheManager(redis_client=None)
+        cache.set("k", {"v": 1}, ttl=1, prefix="t")
+        assert cache.get("k", prefix="t") == {"v": 1}
+        cache.local._entries["t:v0:k"] = ({"v": 1}, time.monotonic() - 1, 7)
+        assert cache.get("k", prefix="t") is None
+
+    def test_hot_keys_skip_redis(self):
+        redis = FakeRedis()
+        cache = CacheManager(redis_client=redis)
+        cache.set("k", [1, 2], ttl=300)
+        trips = redis.round_trips
+        for _ in range(100):
+            assert cache.get("k") == [1, 2]
+        assert redis.round_trips == trips
+
+    def test_read_through_populates_l1_with_capped_ttl(self):
+        redis = FakeRedis()
+        redis.setex("cache:v0:k", 300, '"from another worker"')
+        cache = CacheManager(redis_client=redis)
+        cache.l1_ttl = 30
+
+        assert cache.get("k") == "from another worker"
+        assert cache.get("k") == "from another worker"
+        assert cache.info()["l2"]["l2_hits"] == 1
+        _, expires, _ = cache.local._entries["cache:v0:k"]
+        assert expires - time.monotonic() <= 30
+
+
+class TestAsyncCache:
+    def make(self):
+        redis = FakeRedis()
+        return CacheManager(async_redis=FakeAsyncRedis(redis)), redis
+
+    def test_bulk_operations_are_one_round_trip(self):
+        cache, redis = self.make()
+
+        async def scenario():
+            await cache.amset({f"k{i}": i for i in range(50)}, ttl=60)
+            cache.local.clear()  # Force the reads to go to Redis
+            return await cache.amget([f"k{i}" for i in range(60)])
+
+        values = asyncio.run(scenario())
+        assert values == {f"k{i}": i for i in range(50)}
+        assert redis.round_trips == 3  # Generation read (once), one write, one read
+        assert cache.info()["l2"]["l2_misses"] == 10
+
+    def test_read_through_then_local(self):
+        cache, redis = self.make()
+        redis.setex("cache:v0:k", 60, '{"a": 1}')
+
+        async def scenario():
+            return [await cache.aget("k") for _ in range(5)]
+
+        assert asyncio.run(scenario()) == [{"a": 1}] * 5
+        assert redis.round_trips == 3  # setex above, generation read, one read
+
+    def test_async_decorator(self, monkeypatch):
+        cache, redis = self.make()
+        monkeypatch.setattr(cache_module, "cache", cache)
+        calls = []
+
+        @cached(ttl=60, prefix="t")
+        async def lookup(x):
+            calls.append(x)
+            return x * 2
+
+        async def scenario():
+            return [await lookup(2), await lookup(2), await lookup(3)]
+
+        assert asyncio.run(scenario()) == [4, 4, 6]
+        assert calls == [2, 3]
+
+
+class TestClose:
+    def test_clients_of_every_loop_are_closed_on_their_loop(self):
+        class Client:
+            def __init__(self):
+                self.closed_on = None
+
+            async def aclose(self):
+                self.closed_on = asyncio.get_running_loop()
+
+        cache = CacheManager(redis_client=None)
+        other = asyncio.new_event_loop()
+        thread = threading.Thread(target=other.run_forever)
+        thread.start()
+        stopped = asyncio.new_event_loop()
+        try:
+            here, there, gone = Client(), Client(), Client()
+            cache._async_clients[other] = there
+            cache._async_clients[stopped] = gone
+
+            async def shutdown():
+                cache._async_clients[asyncio.get_running_loop()] = here
+                await cache.aclose()
+                return asyncio.get_running_loop()
+
+            current = asyncio.run(shutdown())
+        finally:
+            other.call_soon_threadsafe(other.stop)
+            thread.join()
+            other.close()
+            stopped.close()
+        assert here.closed_on is current and there.closed_on is other
+        assert gone.closed_on is None and len(cache._async_clients) == 0
+
+
+class TestStampedeProtection:
+    def test_async_misses_are_coalesced(self, monkeypatch):
+        monkeypatch.setattr(cache_module, "cache", CacheManager(redis_client=None))
+        calls = []
+
+        @cached(ttl=60, prefix="sf")
+        async def slow(x):
+            calls.append(x)
+            await asyncio.sleep(0.05)
+            return x + 1
+
+        async def scenario():
+            return await asyncio.gather(*(slow(1) for _ in range(50)))
+
+        assert asyncio.run(scenario()) == [2] * 50
+        assert calls == [1]
+
+    def test_cancelled_leader_does_not_fail_waiters(self, monkeypatch):
+        monkeypatch.setattr(cache_module, "cache", CacheManager(redis_client=None))
+        calls = []
+
+        @cached(ttl=60, prefix="sf-cancel")
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def scenario():
+            leader = asyncio.ensure_future(slow())
+            await asyncio.sleep(0)  # Leader starts the flight
+            waiters = [asyncio.ensure_future(slow()) for _ in range(5)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            results = await asyncio.gather(*waiters)
+            return leader.cancelled(), results, await slow()
+
+        cancelled, results, cached_value = asyncio.run(scenario())
+        assert cancelled and results == ["done"] * 5 and cached_value == "done"
+        assert calls == [1]
+
+    def test_thread_misses_are_coalesced(self, monkeypatch):
+        monkeypatch.setattr(cache_module, "cache", CacheManager(redis_client=None))
+        calls = []
+
+        @cached(ttl=60, prefix="sf-sync")
+        def slow():
+            calls.append(1)
+            time.sleep(0.05)
+            return "done"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(slow())) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == ["done"] * 20 and len(calls) == 1
+
+    def test_stale_while_revalidate(self, monkeypatch):
+        monkeypatch.setattr(cache_module, "cache", CacheManager(redis_client=None))
+        version = {"n": 0}
+
+        @cached(ttl=1, stale_ttl=60, prefix="swr")
+        async def current():
+            version["n"] += 1
+            await asyncio.sleep(0.01)
+            return version["n"]
+
+        async def scenario():
+            first = await current()
+            value, _, _ = next(iter(cache_module.cache.local._entries.values()))
+            value["x"] = time.time() - 1  # Soft-expire it
+            stale = await asyncio.gather(*(current() for _ in range(10)))
+            await asyncio.sleep(0.05)
+            return first, stale, await current()
+
+        first, stale, refreshed = asyncio.run(scenario())
+        assert first == 1 and stale == [1] * 10
+        assert refreshed == 2 and version["n"] == 2  # One background refresh
+
+    def test_early_expiration_is_probabilistic(self, monkeypatch):
+        entry = _wrap("v", ttl=5, delta=1.0)
+        assert _is_fresh(entry, beta=0)
+        monkeypatch.setattr(cache_module.random, "random", lambda: 0.999999)  # log -> -13.8
+        assert not _is_fresh(entry, beta=1.0)
+        monkeypatch.setattr(cache_module.random, "random", lambda: 0.5)
+        assert _is_fresh(entry, beta=1.0)
+
+
+class TestInvalidation:
+    def test_clear_prefix_is_one_command(self):
+        redis = FakeRedis()
+        cache = CacheManager(redis_client=redis)
+        for i in range(1000):
+            cache.set(f"k{i}", i, prefix="services")
+        cache.set("k", "other", prefix="metrics")
+        trips = redis.round_trips
+
+        assert cache.clear_prefix("services") == 1
+        assert redis.round_trips == trips + 1
+        assert cache.get("k1", prefix="services") is None
+        assert cache.get("k", prefix="metrics") == "other"
+
+    def test_other_workers_see_the_new_generation(self):
+        redis = FakeRedis()
+        worker_a, worker_b = CacheManager(redis_client=redis), CacheManager(redis_client=redis)
+        worker_a.set("k", "old", prefix="services")
+        assert worker_b.get("k", prefix="services") == "old"
+
+        worker_a.clear_prefix("services")
+        worker_b.local.clear()
+        worker_b._generations["services"] = (0, 0.0)  # Due a check
+        assert worker_b.get("k", prefix="services") is None
+
+    def test_purge_unlinks_old_generations(self):
+        redis = FakeRedis()
+        cache = CacheManager(redis_client=redis)
+        for i in range(5):
+            cache.set(f"k{i}", i, prefix="services")
+        cache.clear_prefix("services")
+        cache.set("k0", "new", prefix="services")
+
+        assert cache.purge_prefix("services", batch_size=2) == 5
+        assert [key for key in redis.data if key.startswith("services:")] == ["services:v1:k0"]
+        assert len(cache.local) == 1
+
+    def test_async_clear(self):
+        redis = FakeRedis()
+        cache = CacheManager(async_redis=FakeAsyncRedis(redis))
+
+        async def scenario():
+            await cache.aset("k", 1, prefix="services")
+            await cache.aclear_prefix("services")
+            return await cache.aget("k", prefix="services")
+
+        assert asyncio.run(scenario()) is None
+        assert redis.get("cache-generation:services") == "1"
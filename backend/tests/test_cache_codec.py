@@ -0,0 +1,58 @@
+"""
+Unit tests for cached value encoding
+"""
+import json
+from datetime import date, datetime, timezone
+
+import pytest
+
+from app.core import cache_codec
+from app.core.cache_codec import CacheCodec, CodecError, _serializers, register_serializer
+
+VALUE = {
+    "services": [{"id": i, "name": f"service-{i}", "is_active": i % 2 == 0} for i in range(200)],
+    "checked_at": datetime(2026, 10, 17, 12, 30, tzinfo=timezone.utc),
+    "day": date(2026, 10, 17),
+    "nested": [[datetime(2026, 1, 1, 8, 0)]],
+}
+
+
+class TestCodec:
+    @pytest.mark.parametrize("serializer", [name for name in ("json", "orjson", "msgpack") if name in _serializers])
+    def test_round_trip_keeps_dates(self, serializer):
+        codec = CacheCodec(serializer=serializer, compression="none")
+        data = codec.dumps(VALUE)
+        assert data[:3] == b"\x01" + _serializers[serializer][0] + b"-"
+        restored = codec.loads(data)
+        assert restored == VALUE
+        assert isinstance(restored["checked_at"], datetime) and type(restored["day"]) is date
+
+    def test_compression_above_threshold_only(self):
+        codec = CacheCodec(serializer="json", compression="zlib", compress_min_bytes=1024)
+        large = codec.dumps(VALUE)
+        small = codec.dumps({"a": 1})
+        assert large[2:3] == b"z" and small[2:3] == b"-"
+        assert len(large) < len(CacheCodec(serializer="json", compression="none").dumps(VALUE)) / 3
+        assert codec.loads(large) == VALUE
+
+    def test_format_is_read_per_value(self):
+        writer = CacheCodec(serializer="json", compression="zlib", compress_min_bytes=0)
+        reader = CacheCodec(serializer="auto", compression="none")
+        assert reader.loads(writer.dumps(VALUE)) == VALUE
+        # Values stored before the header existed are plain JSON text
+        assert reader.loads('{"a": [1, 2]}') == {"a": [1, 2]}
+        with pytest.raises(CodecError):
+            reader.loads(b"\x01?-payload")
+
+    def test_custom_serializer_and_missing_library(self, monkeypatch):
+        monkeypatch.setattr(cache_codec, "_serializers", dict(cache_codec._serializers))
+        monkeypatch.setattr(cache_codec, "_serializer_tags", dict(cache_codec._serializer_tags))
+        register_serializer(
+            "reversed", b"r",
+            lambda value: json.dumps(value).encode()[::-1],
+            lambda data: json.loads(data[::-1]),
+        )
+        codec = CacheCodec(serializer="reversed", compression="none")
+        assert codec.dumps([1, 2])[:2] == b"\x01r"
+        assert codec.loads(codec.dumps({"a": [1, 2]})) == {"a": [1, 2]}
+        assert CacheCodec(serializer="not-installed").serializer in _serializers
@@ -0,0 +1,103 @@
+"""
+Unit tests for the deadline-ordered check scheduler
+"""
+import pytest
+from app.services.check_scheduler import CheckScheduler, MIN_CHECK_INTERVAL
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def scheduler(clock):
+    return CheckScheduler(clock=clock)
+
+
+class TestScheduling:
+    """Test ordering and due-time handling"""
+
+    def test_pops_in_deadline_order(self, scheduler, clock):
+        scheduler.schedule(1, 60, delay=30)
+        scheduler.schedule(2, 60, delay=10)
+        scheduler.schedule(3, 60, delay=20)
+
+        clock.now += 25
+        assert scheduler.pop_due() == [2, 3]
+        assert scheduler.next_delay() == pytest.approx(5)
+
+    def test_default_delay_is_one_interval(self, scheduler, clock):
+        scheduler.schedule(1, 120)
+        assert scheduler.next_delay() == pytest.approx(120)
+
+    def test_interval_is_clamped(self, scheduler, clock):
+        scheduler.schedule(1, 0, delay=0)
+        scheduler.pop_due()
+        scheduler.reschedule(1)
+        assert scheduler.next_delay() == pytest.approx(MIN_CHECK_INTERVAL)
+
+    def test_reports_new_earliest_deadline(self, scheduler):
+        assert scheduler.schedule(1, 60, delay=30) is True
+        assert scheduler.schedule(2, 60, delay=40) is False
+        assert scheduler.schedule(3, 60, delay=5) is True
+
+    def test_empty_scheduler(self, scheduler):
+        assert scheduler.next_delay() is None
+        assert scheduler.pop_due() == []
+
+
+class TestIncrementalUpdates:
+    """Test update/remove while services are queued or in flight"""
+
+    def test_update_replaces_old_deadline(self, scheduler, clock):
+        scheduler.schedule(1, 60, delay=5)
+        scheduler.schedule(1, 60, delay=50)
+
+        clock.now += 10
+        assert scheduler.pop_due() == []
+        clock.now += 40
+        assert scheduler.pop_due() == [1]
+
+    def test_removed_service_is_never_popped(self, scheduler, clock):
+        scheduler.schedule(1, 60, delay=0)
+        scheduler.remove(1)
+        assert scheduler.pop_due() == []
+        assert 1 not in scheduler
+
+    def test_in_flight_service_is_not_popped_twice(self, scheduler, clock):
+        scheduler.schedule(1, 60, delay=0)
+        assert scheduler.pop_due() == [1]
+        clock.now += 3600
+        assert scheduler.pop_due() == []
+
+        scheduler.reschedule(1)
+        clock.now += 60
+        assert scheduler.pop_due() == [1]
+
+    def test_interval_change_applies_after_in_flight_check(self, scheduler, clock):
+        scheduler.schedule(1, 60, delay=0)
+        scheduler.pop_due()
+        scheduler.schedule(1, 300)
+        scheduler.reschedule(1)
+        assert scheduler.next_delay() == pytest.approx(300)
+
+    def test_reschedule_after_remove_is_ignored(self, scheduler, clock):
+        scheduler.schedule(1, 60, delay=0)
+        scheduler.pop_due()
+        scheduler.remove(1)
+        assert scheduler.reschedule(1) is False
+        assert len(scheduler) == 0
+
+    def test_heap_is_compacted(self, scheduler):
+        for _ in range(500):
+            scheduler.schedule(1, 60)
+        assert len(scheduler._heap) < 100
@@ -0,0 +1,159 @@
+"""
+Unit tests for continuous discovery against the persistent host table
+"""
+import asyncio
+from datetime import datetime
+
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.core.config import settings
+from app.models.discovered_host import DiscoveredHost
+from app.services import discovery, host_inventory
+from app.services.discovery import DiscoveryEngine, parse_subnet_schedule
+from app.services.host_inventory import HostInventory
+from app.services.port_scan import FILTERED, SERVICE_PORTS, PortScanner
+
+
+class SilentScanner(PortScanner):
+    """No TCP answers: liveness comes from the ARP table only"""
+
+    async def _connect(self, ip, port):
+        self.stats["probes"] += 1
+        return FILTERED
+
+
+def test_parse_subnet_schedule():
+    value = '["10.0.0.0/24", {"cidr": "10.0.1.0/24", "interval": 60}, {"cidr": "10.0.2.0/24", "interval": 5}, 7]'
+    assert parse_subnet_schedule(value, 300) == [("10.0.0.0/24", 300), ("10.0.1.0/24", 60), ("10.0.2.0/24", 30)]
+    assert parse_subnet_schedule("not json", 300) == []
+    assert parse_subnet_schedule(None, 300) == []
+
+
+class TestRefreshSubnet:
+    def make_engine(self, tmp_path, monkeypatch):
+        db = create_engine(f"sqlite:///{tmp_path / 'hosts.db'}")
+        SQLModel.metadata.create_all(db, tables=[DiscoveredHost.__table__])
+        inventory = HostInventory(db)
+        monkeypatch.setattr(discovery, "host_inventory", inventory)
+        monkeypatch.setattr(discovery, "get_pinger", lambda: None)
+        monkeypatch.setattr(discovery, "PortScanner", SilentScanner)
+        monkeypatch.setattr(settings, "DISCOVERY_MISS_THRESHOLD", 2)
+
+        engine = DiscoveryEngine()
+        engine.arp_table = {}
+        engine.enriched = []
+
+        async def prime(ips, settle=0.3):
+            pass
+
+        async def refresh():
+            return dict(engine.arp_table)
+
+        async def enrich(ip, mac, scanner, ports):
+            engine.enriched.append(ip)
+            return {"ip": ip, "mac_address": mac, "hostname": f"host-{ip}", "open_ports": []}
+
+        engine.neighbours.prime = prime
+        engine.neighbours.refresh = refresh
+        engine._enrich_host = enrich
+        return engine, inventory
+
+    def test_only_churn_is_enriched(self, tmp_path, monkeypatch):
+        engine, inventory = self.make_engine(tmp_path, monkeypatch)
+        cidr = "10.9.0.0/29"
+
+        def refresh(arp_table):
+            engine.arp_table = arp_table
+            engine.enriched = []
+            return asyncio.run(engine.refresh_subnet(cidr))
+
+        first = refresh({"10.9.0.1": "AA:00:00:00:00:01", "10.9.0.2": "AA:00:00:00:00:02"})
+        assert first["new"] == 2 and sorted(engine.enriched) == ["10.9.0.1", "10.9.0.2"]
+
+        # Nothing moved: no enrichment at all
+        second = refresh({"10.9.0.1": "AA:00:00:00:00:01", "10.9.0.2": "AA:00:00:00:00:02"})
+        assert engine.enriched == [] and second["alive"] == 2
+
+        # .1 swapped hardware, .2 stopped answering (one miss is not enough to be gone)
+        third = refresh({"10.9.0.1": "AA:00:00:00:00:99"})
+        assert engine.enriched == ["10.9.0.1"]
+        assert third["changed"] == 1 and third["gone"] == 0
+
+        fourth = refresh({"10.9.0.1": "AA:00:00:00:00:99"})
+        assert engine.enriched == [] and fourth["gone"] == 1
+
+        hosts = {host.ip: host for host in inventory.hosts()}
+        assert hosts["10.9.0.1"].mac_address == "AA:00:00:00:00:99"
+        assert hosts["10.9.0.1"].is_alive and not hosts["10.9.0.2"].is_alive
+
+    def test_refresh_publishes_deltas(self, tmp_path, monkeypatch):
+        engine, _ = self.make_engine(tmp_path, monkeypatch)
+        engine.arp_table = {"10.9.0.3": "AA:00:00:00:00:03"}
+
+        async def run():
+            subscription = engine.events.subscribe()
+            await engine.refresh_subnet("10.9.0.0/29")
+            return [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+
+        events = asyncio.run(run())
+        assert [e["type"] for e in events] == ["device", "refresh"]
+        assert events[0]["change"] == "new" and events[0]["subnet"] == "10.9.0.0/29"
+
+    def test_refresh_and_scan_share_the_guard(self, tmp_path, monkeypatch):
+        engine, _ = self.make_engine(tmp_path, monkeypatch)
+        engine.arp_table = {"10.9.0.3": "AA:00:00:00:00:03"}
+        seen = []
+
+        async def enrich(ip, mac, scanner, ports):
+            seen.append(engine.is_scanning)
+            return {"ip": ip, "mac_address": mac, "open_ports": []}
+
+        engine._enrich_host = enrich
+        engine.is_scanning = True  # A manual scan is running
+        assert asyncio.run(engine.refresh_subnet("10.9.0.0/29")) is None and seen == []
+
+        engine.is_scanning = False
+        assert asyncio.run(engine.refresh_subnet("10.9.0.0/29"))["new"] == 1
+        assert seen == [True] and not engine.is_scanning
+
+
+def scanned(ip, **fields):
+    """A device as a manual scan reports it"""
+    return {
+        "ip": ip, "hostname": f"host-{ip}", "mac_address": None, "vendor": None, "is_active": True,
+        **{f"has_{name}": False for name in SERVICE_PORTS}, "open_ports": [],
+        "has_snmp": False, "snmp_descr": "", **fields,
+    }
+
+
+class TestRecordScan:
+    def test_only_changed_hosts_get_last_changed_bumped(self, tmp_path, monkeypatch):
+        engine, inventory = TestRefreshSubnet().make_engine(tmp_path, monkeypatch)
+        cidr = "10.9.0.0/29"
+        asyncio.run(engine._record_scan([cidr], [scanned("10.9.0.1"), scanned("10.9.0.2")]))
+        long_ago = datetime(2020, 1, 1)
+        with Session(inventory.engine) as session:
+            for host in session.exec(select(DiscoveredHost)):
+                host.last_changed = long_ago
+            session.commit()
+
+        # .1 is unchanged (its empty sysDescr matches the stored NULL), .2 got a new hostname
+        asyncio.run(engine._record_scan([cidr], [scanned("10.9.0.1"), scanned("10.9.0.2", hostname="nas")]))
+        hosts = {host.ip: host for host in inventory.hosts()}
+        assert hosts["10.9.0.1"].last_changed == long_ago
+        assert hosts["10.9.0.2"].last_changed > long_ago and hosts["10.9.0.2"].hostname == "nas"
+
+
+class TestHostInventory:
+    def test_touch_and_miss_query_in_batches(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(host_inventory, "BATCH_SIZE", 3)
+        db = create_engine(f"sqlite:///{tmp_path / 'hosts.db'}")
+        SQLModel.metadata.create_all(db, tables=[DiscoveredHost.__table__])
+        inventory = HostInventory(db)
+        ips = [f"10.9.0.{i}" for i in range(1, 9)]
+        now = datetime(2024, 1, 1)
+        inventory.record("10.9.0.0/28", [{"ip": ip} for ip in ips], now)
+
+        assert len(inventory.miss(ips, now, threshold=1)) == 8
+        inventory.touch(ips, now)
+        assert all(host.is_alive and host.misses == 0 for host in inventory.hosts())
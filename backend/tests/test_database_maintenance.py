@@ -0,0 +1,89 @@
+"""
+Unit tests for the schema upgrade path and batched pruning
+"""
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlmodel import SQLModel, create_engine
+
+import app.models.discovered_host  # noqa: F401 - registers the host table
+import app.models.service  # noqa: F401 - registers the service table
+from app.core.database import delete_in_batches, enable_incremental_vacuum, incremental_vacuum, upgrade_schema
+from app.models.audit import AuditLog
+from app.models.history import ServiceHistory
+
+
+class TestUpgradeSchema:
+    def test_adds_composite_and_drops_obsolete_indexes(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+        # A database created before the composite index existed
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE servicehistory (id INTEGER PRIMARY KEY, service_id INTEGER, "
+                "is_active BOOLEAN, latency_ms INTEGER, cpu_usage FLOAT, ram_usage FLOAT, "
+                "disk_usage FLOAT, timestamp DATETIME)"
+            ))
+            conn.execute(text("CREATE INDEX ix_servicehistory_service_id ON servicehistory (service_id)"))
+
+        SQLModel.metadata.create_all(engine, tables=[ServiceHistory.__table__])
+        upgrade_schema(engine)
+        upgrade_schema(engine)  # Idempotent
+
+        names = {index["name"] for index in inspect(engine).get_indexes("servicehistory")}
+        assert names == {"ix_servicehistory_service_id_timestamp", "ix_servicehistory_timestamp"}
+
+    def test_adds_new_nullable_columns(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+        # A host table from before SNMP enrichment kept more than sysDescr
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE discoveredhost (ip VARCHAR PRIMARY KEY, subnet VARCHAR, hostname VARCHAR, "
+                "mac_address VARCHAR, vendor VARCHAR, open_ports VARCHAR, has_snmp BOOLEAN, "
+                "snmp_descr VARCHAR, is_alive BOOLEAN, misses INTEGER, first_seen DATETIME, "
+                "last_seen DATETIME, last_changed DATETIME, enriched_at DATETIME)"
+            ))
+            conn.execute(text("INSERT INTO discoveredhost (ip, subnet) VALUES ('10.0.0.1', '10.0.0.0/24')"))
+
+        upgrade_schema(engine)
+        upgrade_schema(engine)
+
+        columns = {column["name"] for column in inspect(engine).get_columns("discoveredhost")}
+        assert {"snmp_name", "snmp_object_id", "snmp_uptime", "snmp_interfaces"} <= columns
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT snmp_name FROM discoveredhost")).scalar() is None
+
+
+class TestIncrementalVacuum:
+    def test_existing_database_is_only_rebuilt_on_opt_in(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+        SQLModel.metadata.create_all(engine, tables=[AuditLog.__table__])
+
+        def mode():
+            with engine.connect() as conn:
+                return conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+
+        enable_incremental_vacuum(engine, rebuild=False)
+        assert mode() == 0
+        enable_incremental_vacuum(engine, rebuild=True)
+        assert mode() == 2
+
+
+class TestPruning:
+    def test_delete_in_batches_and_vacuum(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'prune.db'}")
+        enable_incremental_vacuum(engine)
+        SQLModel.metadata.create_all(engine, tables=[AuditLog.__table__])
+        with engine.begin() as conn:
+            conn.execute(AuditLog.__table__.insert(), [
+                {"timestamp": datetime(2020, 1, 1), "username": "u", "action": "a", "details": "x" * 200}
+                for _ in range(2500)
+            ] + [{"timestamp": datetime(2030, 1, 1), "username": "u", "action": "a", "details": None}])
+
+        table = AuditLog.__table__
+        assert delete_in_batches(engine, table, table.c.timestamp < datetime(2025, 1, 1), batch_size=1000, pause=0) == 2500
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT count(*) FROM auditlog")).scalar() == 1
+            assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+            assert conn.exec_driver_sql("PRAGMA freelist_count").scalar() > 0
+
+        assert incremental_vacuum(engine, pages=100000) == 0
@@ -0,0 +1,92 @@
+"""
+Unit tests for history analytics (buckets, MTTR/MTBF, percentiles)
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+import app.models.service  # noqa: F401 - registers the service table
+from app.models.history import ServiceHistory
+from app.services.history_analytics import (
+    _Point,
+    auto_bucket,
+    availability,
+    compute_analytics,
+    format_bucket,
+    parse_bucket,
+)
+
+START = datetime(2024, 1, 1)
+
+
+def point(minute, up=True, latency=10):
+    return _Point(1, START + timedelta(minutes=minute), 1, 1 if up else 0,
+                  latency, latency, latency, latency, None, None, None)
+
+
+class TestBuckets:
+    def test_parse_and_format(self):
+        assert parse_bucket("5m") == timedelta(minutes=5)
+        assert parse_bucket("2d") == timedelta(days=2)
+        assert format_bucket(timedelta(hours=6)) == "6h"
+        for bad in ("", "0h", "1w", "h"):
+            with pytest.raises(ValueError):
+                parse_bucket(bad)
+
+    def test_auto_bucket(self):
+        assert auto_bucket(START, START + timedelta(hours=1), 1000) == timedelta(minutes=1)
+        assert auto_bucket(START, START + timedelta(days=30), 1000) == timedelta(hours=1)
+
+
+class TestAvailability:
+    def test_incidents_mttr_mtbf(self):
+        # Up 0-9, down 10-14, up 15-39, down 40-44, up 45-59
+        points = [point(m, up=not (10 <= m < 15 or 40 <= m < 45)) for m in range(60)]
+        result = availability(points, step=None)
+        assert result["incidents"] == 2
+        assert result["downtime_seconds"] == 600
+        assert result["mttr_seconds"] == 300
+        assert result["mtbf_seconds"] == 50 * 60 / 2
+
+    def test_gaps_are_capped(self):
+        # A two hour monitoring gap while down must not count as two hours of downtime
+        points = [point(0), point(1), point(2, up=False), point(122, up=False), point(123)]
+        result = availability(points, step=timedelta(minutes=1))
+        assert result["downtime_seconds"] == 120
+
+    def test_no_incidents(self):
+        result = availability([point(m) for m in range(5)], step=None)
+        assert result["incidents"] == 0
+        assert result["mttr_seconds"] is None
+
+
+class TestComputeAnalytics:
+    def test_multiple_services_in_one_call(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        SQLModel.metadata.create_all(engine)
+        now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        start = now - timedelta(hours=2)
+        with Session(engine) as session:
+            for minute in range(120):
+                session.add(ServiceHistory(
+                    service_id=1, is_active=minute >= 60, latency_ms=minute,
+                    timestamp=start + timedelta(minutes=minute)
+                ))
+                session.add(ServiceHistory(
+                    service_id=2, is_active=True, latency_ms=5,
+                    timestamp=start + timedelta(minutes=minute)
+                ))
+            session.commit()
+
+            result = compute_analytics(session, [1, 2], start, now, timedelta(hours=1))
+
+        assert result["source"] == "raw"
+        first, second = result["services"]
+        assert first["summary"]["uptime_pct"] == 50.0
+        assert first["summary"]["incidents"] == 1
+        assert first["summary"]["latency"]["p95"] == 113.0
+        assert [b["uptime_pct"] for b in first["series"]] == [0.0, 100.0]
+        assert second["summary"]["uptime_pct"] == 100.0
+        assert second["summary"]["latency"]["p50"] == 5.0
@@ -0,0 +1,177 @@
+"""
+Unit tests for ServiceHistory rollups, retention and resolution selection
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+import app.models.service  # noqa: F401 - registers the service table
+from app.models.history import ServiceHistory, ServiceHistory1d, ServiceHistory1h, ServiceHistory1m
+from app.services.history_rollup import (
+    HistoryRollupService,
+    floor_time,
+    percentile,
+    weighted_percentile,
+)
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def add_checks(engine, service_id, start, count, step=timedelta(seconds=10), latency=lambda i: 10 + i, up=lambda i: True):
+    with Session(engine) as session:
+        for i in range(count):
+            session.add(ServiceHistory(
+                service_id=service_id,
+                is_active=up(i),
+                latency_ms=latency(i),
+                cpu_usage=50.0,
+                timestamp=start + i * step,
+            ))
+        session.commit()
+
+
+class TestHelpers:
+    def test_floor_time(self):
+        ts = datetime(2024, 1, 1, 13, 47, 12)
+        assert floor_time(ts, timedelta(minutes=1)) == datetime(2024, 1, 1, 13, 47)
+        assert floor_time(ts, timedelta(hours=1)) == datetime(2024, 1, 1, 13)
+        assert floor_time(ts, timedelta(days=1)) == datetime(2024, 1, 1)
+
+    def test_percentile(self):
+        assert percentile(list(range(1, 101)), 95) == 95.0
+        assert percentile([7], 95) == 7.0
+        assert percentile([], 95) is None
+
+    def test_weighted_percentile(self):
+        assert weighted_percentile([(10, 90), (100, 10)], 95) == 100.0
+        assert weighted_percentile([(10, 96), (100, 4)], 95) == 10.0
+
+
+class TestRollup:
+    """Test rolling raw checks up through every level"""
+
+    def test_minute_buckets(self, engine):
+        # Six checks per minute for two minutes, the second minute all down
+        add_checks(engine, 1, START, 12, up=lambda i: i < 6)
+        HistoryRollupService(engine).run(now=START + timedelta(minutes=5))
+
+        with Session(engine) as session:
+            rows = session.exec(select(ServiceHistory1m).order_by(ServiceHistory1m.bucket)).all()
+        assert [r.bucket for r in rows] == [START, START + timedelta(minutes=1)]
+        assert [r.uptime for r in rows] == [1.0, 0.0]
+        assert rows[0].samples == 6
+        assert rows[0].latency_min == 10
+        assert rows[0].latency_max == 15
+        assert rows[0].latency_avg == 12.5
+        assert rows[0].cpu_usage == 50.0
+
+    def test_incomplete_minute_is_not_rolled_up(self, engine):
+        add_checks(engine, 1, START, 3)
+        HistoryRollupService(engine).run(now=START + timedelta(seconds=40))
+
+        with Session(engine) as session:
+            assert session.exec(select(ServiceHistory1m)).all() == []
+
+    def test_hour_and_day_levels(self, engine):
+        # One check per minute for a full day
+        add_checks(engine, 1, START, 24 * 60, step=timedelta(minutes=1), up=lambda i: i % 10 != 0)
+        service = HistoryRollupService(engine)
+        now = START + timedelta(days=1, minutes=5)
+        while any(service.run(now=now).values()):
+            pass
+
+        with Session(engine) as session:
+            hours = session.exec(select(ServiceHistory1h)).all()
+            days = session.exec(select(ServiceHistory1d)).all()
+        assert len(hours) == 24
+        assert all(h.samples == 60 for h in hours)
+        assert len(days) == 1
+        assert days[0].samples == 24 * 60
+        assert days[0].uptime == pytest.approx(0.9)
+
+    def test_rerun_is_idempotent(self, engine):
+        add_checks(engine, 1, START, 12)
+        service = HistoryRollupService(engine)
+        service.run(now=START + timedelta(minutes=5))
+        service.run(now=START + timedelta(minutes=5))
+
+        with Session(engine) as session:
+            assert len(session.exec(select(ServiceHistory1m)).all()) == 2
+
+    def test_late_rows_are_rerolled_at_every_level(self, engine):
+        add_checks(engine, 1, START, 24 * 60, step=timedelta(minutes=1))
+        service = HistoryRollupService(engine)
+        now = START + timedelta(days=1, minutes=5)
+        while any(service.run(now=now).values()):
+            pass
+
+        # A requeued batch lands long after its minute was rolled up
+        add_checks(engine, 1, START + timedelta(minutes=10, seconds=30), 1, up=lambda i: False)
+        service.run(now=now + timedelta(minutes=1))
+
+        with Session(engine) as session:
+            minute = session.exec(select(ServiceHistory1m).where(ServiceHistory1m.bucket == START + timedelta(minutes=10))).one()
+            hour = session.exec(select(ServiceHistory1h).where(ServiceHistory1h.bucket == START)).one()
+            day = session.exec(select(ServiceHistory1d)).one()
+        assert minute.samples == 2 and minute.up_samples == 1
+        assert hour.samples == 61 and day.samples == 24 * 60 + 1
+        assert len(session.exec(select(ServiceHistory1m)).all()) == 24 * 60
+
+    def test_gap_in_data_is_skipped(self, engine):
+        add_checks(engine, 1, START, 6)
+        add_checks(engine, 1, START + timedelta(days=30), 6)
+        HistoryRollupService(engine).run(now=START + timedelta(days=30, minutes=5), max_windows=2)
+
+        with Session(engine) as session:
+            assert len(session.exec(select(ServiceHistory1m)).all()) == 2
+
+
+class TestRetention:
+    def test_raw_rows_kept_until_rolled_up(self, engine):
+        add_checks(engine, 1, START, 12)
+        service = HistoryRollupService(engine)
+        later = START + timedelta(days=60)
+
+        service.apply_retention(now=later)
+        with Session(engine) as session:
+            assert len(session.exec(select(ServiceHistory)).all()) == 12
+
+        service.run(now=later)
+        service.apply_retention(now=later)
+        with Session(engine) as session:
+            assert session.exec(select(ServiceHistory)).all() == []
+            assert len(session.exec(select(ServiceHistory1m)).all()) == 0  # past 1m retention too
+            assert len(session.exec(select(ServiceHistory1h)).all()) == 1
+
+
+class TestResolution:
+    def test_pick_resolution(self, engine):
+        service = HistoryRollupService(engine)
+        now = datetime(2024, 6, 1)
+        assert service.pick_resolution(now - timedelta(hours=1), now, 60, 1000, now=now) == "raw"
+        assert service.pick_resolution(now - timedelta(hours=12), now, 10, 1000, now=now) == "1m"
+        assert service.pick_resolution(now - timedelta(days=30), now, 60, 1000, now=now) == "1h"
+        assert service.pick_resolution(now - timedelta(days=365), now, 60, 1000, now=now) == "1d"
+
+    def test_series_from_rollup(self, engine):
+        add_checks(engine, 1, START, 12)
+        add_checks(engine, 2, START, 12)
+        service = HistoryRollupService(engine)
+        service.run(now=START + timedelta(minutes=5))
+
+        with Session(engine) as session:
+            points = service.query_series(session, 1, START, START + timedelta(hours=1), "1m")
+        assert len(points) == 2
+        assert points[0]["timestamp"] == START
+        assert points[0]["samples"] == 6
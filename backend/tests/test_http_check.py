@@ -0,0 +1,101 @@
+"""
+Unit tests for the pooled HTTP check engine
+"""
+import asyncio
+
+import httpx
+
+from app.services.http_check import HttpCheckEngine
+
+
+def make_response(chunks, content_length=None):
+    consumed = []
+
+    async def stream():
+        for chunk in chunks:
+            consumed.append(chunk)
+            yield chunk
+
+    headers = {"content-length": str(content_length)} if content_length is not None else {}
+    return httpx.Response(200, headers=headers, content=stream()), consumed
+
+
+def read_body(engine, chunks, expected, content_length=None):
+    async def run():
+        response, consumed = make_response(chunks, content_length)
+        return await engine._read_body(response, expected), consumed
+
+    return asyncio.run(run())
+
+
+class TestReadBody:
+    def test_needle_split_across_chunks(self):
+        engine = HttpCheckEngine(max_body_bytes=1024)
+        chunks = [b"<html>all systems ", b"oper", b"ational</html>", b"never read"]
+        (body, matched, truncated), consumed = read_body(engine, chunks, "operational")
+        assert matched and not truncated
+        assert body == b"<html>all systems operational</html>"
+        assert consumed == chunks[:3]
+
+    def test_byte_cap(self):
+        engine = HttpCheckEngine(max_body_bytes=10)
+        (body, matched, truncated), consumed = read_body(engine, [b"abcdefgh", b"ijklmnop", b"q"], "zzz")
+        assert body == b"abcdefghij" and truncated and matched is False
+        assert len(consumed) == 2
+
+    def test_small_known_length_is_drained(self):
+        engine = HttpCheckEngine(max_body_bytes=1024)
+        chunks = [b"ok ", b"and ", b"the rest"]
+        (body, matched, _), consumed = read_body(engine, chunks, "ok", content_length=15)
+        assert matched and body == b"ok "
+        assert consumed == chunks  # Read to the end so the connection can be reused
+
+        (_, matched, _), consumed = read_body(engine, chunks, None)
+        assert matched is None and consumed == chunks
+
+
+class TestCheck:
+    def test_hostname_kept_for_pool_and_host_header(self):
+        requests = []
+
+        async def handle(reader, writer):
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                requests.append(head)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nup")
+                await writer.drain()
+
+        async def scenario():
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            engine = HttpCheckEngine()
+            try:
+                url = f"http://localhost:{port}/health"
+                first = await engine.check(url, expected="up")
+                second = await engine.check(url, expected="up")
+                return port, first, second, engine.addresses._entries
+            finally:
+                await engine.aclose()
+                server.close()
+
+        port, first, second, resolved = asyncio.run(scenario())
+        assert first.is_ok and first.matched and second.matched
+        assert "dns" in first.timings and "connect" in first.timings
+        assert "connect" not in second.timings  # Pooled connection reused
+        assert all(f"Host: localhost:{port}".encode() in head for head in requests)
+        assert "localhost" in resolved
+
+    def test_connection_errors_are_reported_as_httpx_ones(self):
+        async def scenario():
+            server = await asyncio.start_server(lambda reader, writer: None, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            server.close()
+            await server.wait_closed()
+            engine = HttpCheckEngine()
+            try:
+                return await engine.check(f"http://localhost:{port}/", timeout=2)
+            finally:
+                await engine.aclose()
+
+        result = asyncio.run(scenario())
+        assert not result.is_ok and result.error == "Connection Refused"
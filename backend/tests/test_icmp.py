@@ -0,0 +1,118 @@
+"""
+Unit tests for the in-process ICMP pinger
+"""
+import asyncio
+import socket
+import struct
+
+import pytest
+from app.services.icmp import (
+    ICMP_ECHO_REPLY,
+    PingUnavailable,
+    AsyncPinger,
+    build_echo_request,
+    checksum,
+    parse_echo_reply,
+    sock_sendto,
+)
+
+
+def as_reply(packet: bytes) -> bytes:
+    return bytes([ICMP_ECHO_REPLY]) + packet[1:]
+
+
+class TestPackets:
+    def test_request_checksum_verifies(self):
+        packet = build_echo_request(0x1234, 7)
+        assert checksum(packet) == 0
+
+    def test_odd_length_checksum(self):
+        packet = build_echo_request(1, 1, payload=b"abc")
+        assert checksum(packet) == 0
+
+    def test_parse_reply_without_ip_header(self):
+        assert parse_echo_reply(as_reply(build_echo_request(42, 9))) == (42, 9)
+
+    def test_parse_reply_with_ip_header(self):
+        ip_header = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 0, 0, 0, 64, 1, 0, b"\x7f\0\0\1", b"\x7f\0\0\1")
+        assert parse_echo_reply(ip_header + as_reply(build_echo_request(42, 9))) == (42, 9)
+
+    def test_requests_are_not_replies(self):
+        assert parse_echo_reply(build_echo_request(42, 9)) is None
+        assert parse_echo_reply(b"\x00\x00") is None
+
+
+class TestLoopback:
+    """Needs an ICMP socket (root or ping_group_range); skipped otherwise"""
+
+    def test_sweep_loopback(self):
+        async def run():
+            try:
+                pinger = AsyncPinger.open()
+            except PingUnavailable:
+                pytest.skip("No ICMP socket available")
+            try:
+                rtt = await pinger.ping("127.0.0.1", timeout=1.0)
+                alive = await pinger.ping_many([f"127.0.0.{i}" for i in range(1, 255)], timeout=1.0)
+                return rtt, alive, len(pinger._pending)
+            finally:
+                pinger.close()
+
+        rtt, alive, pending = asyncio.run(run())
+        assert rtt is not None
+        assert len(alive) == 254
+        assert pending == 0
+
+
+class OldLoop:
+    """An event loop as seen from Python < 3.11: no sock_sendto"""
+
+    def __init__(self, loop):
+        self._loop = loop
+        self.writers = 0
+
+    def create_future(self):
+        return self._loop.create_future()
+
+    def add_writer(self, fd, callback):
+        self.writers += 1
+        self._loop.add_writer(fd, callback)
+
+    def remove_writer(self, fd):
+        self._loop.remove_writer(fd)
+
+
+class FullOnceSocket:
+    """Send buffer full on the first attempt"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.attempts = 0
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def sendto(self, data, address):
+        self.attempts += 1
+        if self.attempts == 1:
+            raise BlockingIOError
+        return self.sock.sendto(data, address)
+
+
+class TestSendFallback:
+    def test_sendto_without_loop_support(self):
+        async def scenario():
+            receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            receiver.bind(("127.0.0.1", 0))
+            sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sender.setblocking(False)
+            loop = OldLoop(asyncio.get_running_loop())
+            wrapped = FullOnceSocket(sender)
+            try:
+                sent = await sock_sendto(loop, wrapped, b"ping", receiver.getsockname())
+                return sent, receiver.recv(16), wrapped.attempts, loop.writers
+            finally:
+                sender.close()
+                receiver.close()
+
+        assert asyncio.run(scenario()) == (4, b"ping", 2, 1)
@@ -0,0 +1,119 @@
+"""
+Unit tests for integer-range scan targets
+"""
+import asyncio
+import os
+
+from app.services import discovery
+from app.services.discovery import DiscoveryEngine
+from app.services.ip_ranges import (
+    count_addresses,
+    iter_addresses,
+    iter_chunks,
+    merge_ranges,
+    parse_target,
+    parse_targets,
+    split_ranges,
+)
+from app.services.resolver import MDNSHostIndex
+
+
+def ip(text):
+    a, b, c, d = (int(part) for part in text.split("."))
+    return (a << 24) | (b << 16) | (c << 8) | d
+
+
+class TestParsing:
+    def test_cidr_excludes_network_and_broadcast(self):
+        assert parse_target("10.0.0.0/24") == [(ip("10.0.0.1"), ip("10.0.0.254"))]
+        assert parse_target("10.0.0.7/32") == [(ip("10.0.0.7"), ip("10.0.0.7"))]
+        # A bare address means its /24
+        assert parse_target("192.168.5.20") == parse_target("192.168.5.0/24")
+
+    def test_overlaps_are_merged_and_deduplicated(self):
+        v4, v6 = parse_targets(["10.0.0.0/24", "10.0.0.0/25", "10.0.1.0/24", "bogus", "fd00::/120"])
+        assert v4 == [(ip("10.0.0.1"), ip("10.0.0.254")), (ip("10.0.1.1"), ip("10.0.1.254"))]
+        assert count_addresses(v6) == 255
+        assert merge_ranges([(5, 9), (1, 3), (4, 4)]) == [(1, 9)]
+
+    def test_huge_targets_are_refused(self):
+        v4, v6 = parse_targets(["fd00::/64"])
+        assert v4 == [] and v6 == []
+
+
+class TestIteration:
+    def test_chunks_are_lazy_and_bounded(self):
+        ranges, _ = parse_targets(["10.0.0.0/8"])
+        chunks = iter_chunks(ranges, 1000)
+        first = next(chunks)
+        assert len(first) == 1000
+        assert first[0] == "10.0.0.1" and first[-1] == "10.0.3.232"
+
+    def test_split_is_even_and_complete(self):
+        ranges, _ = parse_targets(["10.0.0.0/24", "10.0.2.0/24"])
+        pieces = split_ranges(ranges, 3)
+        assert len(pieces) == 3
+        assert [count_addresses(piece) for piece in pieces] == [170, 170, 168]
+        assert merge_ranges(r for piece in pieces for r in piece) == ranges
+        assert split_ranges([], 4) == []
+
+
+def fake_shard(ranges, options):
+    """Stands in for _run_shard in the worker processes: every 100th address is alive"""
+    results = discovery._shard_results
+    addresses = list(iter_addresses(ranges))
+    if addresses[0] == "10.0.1.1":
+        results.put(("done", "RuntimeError('no ICMP socket')"))
+        return 0
+    for address in addresses[::100]:
+        open_ports = None if address in options["announced"] else [options["max_port_probes"]]
+        results.put(("host", {"ip": address, "mac_address": None, "open_ports": open_ports}))
+    results.put(("progress", len(addresses)))
+    results.put(("done", None))
+    return len(addresses)
+
+
+def enriched_in_parent():
+    """DiscoveryEngine whose enrichment is recorded instead of run"""
+    engine = DiscoveryEngine()
+    engine.scan_ports = [80]
+    parent = os.getpid()
+
+    async def enrich(ip, mac, scanner, ports, open_ports=None):
+        return {"ip": ip, "open_ports": open_ports, "pid": os.getpid(), "parent": parent}
+
+    engine._enrich_host = enrich
+    return engine
+
+
+class TestShardedSweep:
+    def test_shards_are_merged_into_one_stream(self, monkeypatch):
+        monkeypatch.setattr(discovery, "_run_shard", fake_shard)
+        index = MDNSHostIndex()
+        index.add("nas._smb._tcp.local.", "nas.local.", ["10.0.2.101"], "_smb._tcp.local.", 445)
+        monkeypatch.setattr(discovery, "mdns_index", index)
+        engine = enriched_in_parent()
+        ranges, _ = parse_targets(["10.0.0.0/24", "10.0.2.0/24"])
+
+        async def scan():
+            return [device async for device in engine._scan_sharded(ranges, 2)]
+
+        devices = {device["ip"]: device for device in asyncio.run(scan())}
+        assert sorted(devices) == [
+            "10.0.0.1", "10.0.0.101", "10.0.0.201", "10.0.2.1", "10.0.2.101", "10.0.2.201"
+        ]
+        assert engine.scan_progress == 508  # Enrichment in the parent is not counted twice
+        assert all(device["pid"] == device["parent"] for device in devices.values())
+        assert devices["10.0.2.101"]["open_ports"] is None  # Announced: its ports come from mDNS
+        assert all(device["open_ports"][0] >= 64 for ip, device in devices.items() if ip != "10.0.2.101")
+
+    def test_failed_shard_ends_the_sweep(self, monkeypatch):
+        monkeypatch.setattr(discovery, "_run_shard", fake_shard)
+        engine = enriched_in_parent()
+        ranges, _ = parse_targets(["10.0.0.0/24", "10.0.1.0/24"])
+
+        async def scan():
+            return [device async for device in engine._scan_sharded(ranges, 2)]
+
+        devices = asyncio.run(asyncio.wait_for(scan(), 30))
+        assert [device["ip"] for device in devices] == ["10.0.0.1", "10.0.0.101", "10.0.0.201"]
@@ -0,0 +1,115 @@
+"""
+Unit tests for the passive mDNS host index
+"""
+import asyncio
+
+from zeroconf import ServiceStateChange
+
+from app.services import resolver
+from app.services.discovery import DiscoveryEngine
+from app.services.port_scan import PortScanner
+from app.services.resolver import MDNSBrowser, MDNSHostIndex
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHostIndex:
+    def test_merges_services_and_addresses(self):
+        index = MDNSHostIndex()
+        index.add("nas._smb._tcp.local.", "nas.local.", ["192.168.1.5", "fe80::1%eth0"], "_smb._tcp.local.", 445)
+        index.add("nas._http._tcp.local.", "nas.local.", ["192.168.1.5"], "_http._tcp.local.", 5000)
+
+        host = index.get("192.168.1.5")
+        assert host["hostname"] == "nas.local"
+        assert host["services"] == {"_smb._tcp.local.": 445, "_http._tcp.local.": 5000}
+        assert host["addresses"] == ["192.168.1.5", "fe80::1"]
+        assert index.get("fe80::1")["services"] == {"_smb._tcp.local.": 445}
+
+    def test_entries_expire_after_ttl(self, monkeypatch):
+        clock = Clock()
+        monkeypatch.setattr(resolver.time, "monotonic", clock)
+        index = MDNSHostIndex()
+        index.add("tv._googlecast._tcp.local.", "tv.local.", ["192.168.1.9"], "_googlecast._tcp.local.", 8009, ttl=120)
+
+        clock.now += 100
+        assert index.get("192.168.1.9") is not None
+        clock.now += 30
+        assert index.get("192.168.1.9") is None
+        assert len(index) == 0
+
+    def test_announcing_host_stays_past_record_ttl(self, monkeypatch):
+        clock = Clock()
+        monkeypatch.setattr(resolver.time, "monotonic", clock)
+
+        class FakeInfo:
+            server, port, other_ttl = "tv.local.", 8009, 4500
+
+            def __init__(self, service_type, name):
+                pass
+
+            async def async_request(self, zeroconf, timeout):
+                return True
+
+            def parsed_scoped_addresses(self, version):
+                return ["192.168.1.9"]
+
+        monkeypatch.setattr(resolver, "AsyncServiceInfo", FakeInfo)
+        index = MDNSHostIndex()
+        browser = MDNSBrowser(index)
+        browser._zeroconf = type("FakeZeroconf", (), {"zeroconf": None})()
+        asyncio.run(browser._resolve("_googlecast._tcp.local.", "tv._googlecast._tcp.local."))
+
+        # Refreshes with unchanged records fire no callback; the host must not age out
+        clock.now += 2 * FakeInfo.other_ttl
+        assert index.get("192.168.1.9")["expires_in"] is None and len(index) == 1
+        browser._on_state_change(None, "_googlecast._tcp.local.", "tv._googlecast._tcp.local.",
+                                 ServiceStateChange.Removed)
+        assert index.get("192.168.1.9") is None
+
+    def test_goodbye_removes_service(self):
+        index = MDNSHostIndex()
+        browser = MDNSBrowser(index)
+        index.add("pi._ssh._tcp.local.", "pi.local.", ["192.168.1.7"], "_ssh._tcp.local.", 22)
+        browser._on_state_change(None, "_ssh._tcp.local.", "pi._ssh._tcp.local.", ServiceStateChange.Removed)
+        assert index.get("192.168.1.7") is None
+
+
+class NoProbeScanner(PortScanner):
+    async def _connect(self, ip, port):
+        raise AssertionError(f"probed {ip}:{port}")
+
+
+class TestActiveScanUsesIndex:
+    def test_announced_host_skips_rdns_and_port_probes(self, monkeypatch):
+        index = MDNSHostIndex()
+        index.add("pi._ssh._tcp.local.", "pi.local.", ["192.168.1.7"], "_ssh._tcp.local.", 22)
+        index.add("pi._http._tcp.local.", "pi.local.", ["192.168.1.7"], "_http._tcp.local.", 80)
+        monkeypatch.setattr("app.services.discovery.mdns_index", index)
+
+        engine = DiscoveryEngine()
+        engine.port_scanner = NoProbeScanner()
+        engine._icmp_alive = set()
+
+        async def no_arp(ip):
+            return None
+
+        async def no_rdns(ip):
+            raise AssertionError("reverse DNS")
+
+        async def no_snmp(ip):
+            return None
+
+        engine._get_mac_from_arp = no_arp
+        engine._resolve_hostname = no_rdns
+        engine._check_snmp = no_snmp
+
+        device = asyncio.run(engine._scan_host_comprehensive("192.168.1.7"))
+        assert device["hostname"] == "pi.local"
+        assert device["open_ports"] == [22, 80]
+        assert device["has_ssh"] and device["has_http"] and not device["has_rdp"]
@@ -0,0 +1,57 @@
+"""
+Unit tests for the ARP/neighbour table reader
+"""
+import asyncio
+
+from app.services import neighbours
+from app.services.neighbours import NeighbourTable, normalize_mac, parse_arp_output, parse_proc_arp
+
+PROC_ARP = """IP address       HW type     Flags       HW address            Mask     Device
+192.168.1.1      0x1         0x2         aa:bb:cc:00:11:22     *        eth0
+192.168.1.50     0x1         0x0         00:00:00:00:00:00     *        eth0
+192.168.1.77     0x1         0x6         de:ad:be:ef:00:01     *        eth0
+"""
+
+
+class TestParsing:
+    def test_proc_arp_skips_incomplete_entries(self):
+        assert parse_proc_arp(PROC_ARP) == {
+            "192.168.1.1": "AA:BB:CC:00:11:22",
+            "192.168.1.77": "DE:AD:BE:EF:00:01",
+        }
+
+    def test_windows_output(self):
+        output = """
+Interface: 192.168.1.10 --- 0x4
+  Internet Address      Physical Address      Type
+  192.168.1.1           aa-bb-cc-00-11-22     dynamic
+  192.168.1.255         ff-ff-ff-ff-ff-ff     static
+"""
+        assert parse_arp_output(output) == {"192.168.1.1": "AA:BB:CC:00:11:22"}
+
+    def test_macos_output_pads_octets(self):
+        output = "? (10.0.0.2) at 0:1b:3:4a:5:6 on en0 ifscope [ethernet]\n? (10.0.0.3) (incomplete) on en0"
+        assert parse_arp_output(output) == {"10.0.0.2": "00:1B:03:4A:05:06"}
+
+    def test_normalize_mac(self):
+        assert normalize_mac("a:b:c:d:e:f") == "0A:0B:0C:0D:0E:0F"
+        assert normalize_mac("00:00:00:00:00:00") is None
+        assert normalize_mac("not-a-mac") is None
+
+
+class TestLookup:
+    def test_lookup_reads_table_once_within_max_age(self, tmp_path, monkeypatch):
+        path = tmp_path / "arp"
+        path.write_text(PROC_ARP)
+        monkeypatch.setattr(neighbours, "PROC_ARP", str(path))
+        table = NeighbourTable(max_age=60)
+
+        async def run():
+            first = await table.lookup("192.168.1.1")
+            path.write_text(PROC_ARP.splitlines()[0] + "\n")
+            second = await table.lookup("192.168.1.77")
+            await table.refresh()
+            third = await table.lookup("192.168.1.1")
+            return first, second, third
+
+        assert asyncio.run(run()) == ("AA:BB:CC:00:11:22", "DE:AD:BE:EF:00:01", None)
@@ -0,0 +1,174 @@
+"""
+Unit tests for the async TCP port scanner
+"""
+import asyncio
+import socket
+import time
+
+from app.services import port_scan
+from app.services.port_scan import (
+    BUILTIN_PROFILES,
+    CLOSED,
+    FILTERED,
+    OPEN,
+    PortScanner,
+    load_profiles,
+    parse_app_port_list,
+    parse_ports,
+)
+
+
+def listening_socket():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(16)
+    return sock
+
+
+def closed_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class TestProfiles:
+    def test_parse_ports_expands_ranges(self):
+        assert parse_ports([443, "22", "8000-8002", "bogus", 70000]) == [22, 443, 8000, 8001, 8002]
+
+    def test_app_list_grouped_by_category(self):
+        text = """
+Proxmox VE = webui ports-8006, extra ports-22,5900,3128 = Virtualization & Containers
+Portainer = webui ports-9443, extra ports-9000,8000 = Virtualization & Containers
+Jellyfin = webui ports-8096, extra ports-none = Media Servers
+"""
+        assert parse_app_port_list(text) == {
+            "Virtualization & Containers": [22, 3128, 5900, 8000, 8006, 9000, 9443],
+            "Media Servers": [8096],
+        }
+
+    def test_custom_profiles_extend_builtins(self):
+        profiles = load_profiles('{"printers": [515, 631, "9100-9101"]}')
+        assert profiles["printers"] == [515, 631, 9100, 9101]
+        assert profiles["default"] == BUILTIN_PROFILES["default"]
+
+    def test_invalid_setting_keeps_builtins(self):
+        assert load_profiles('["not", "a", "mapping"]') == BUILTIN_PROFILES
+
+
+class TestScanner:
+    def test_open_closed_and_cached(self):
+        server = listening_socket()
+        open_port = server.getsockname()[1]
+        refused_port = closed_port()
+
+        async def run():
+            scanner = PortScanner(timeout=1.0)
+            states = await scanner.scan_host("127.0.0.1", [open_port, refused_port, open_port])
+            again = await scanner.probe("127.0.0.1", open_port)
+            return scanner, states, again
+
+        try:
+            scanner, states, again = asyncio.run(run())
+        finally:
+            server.close()
+        assert states == {open_port: OPEN, refused_port: CLOSED}
+        assert again == OPEN
+        assert scanner.open_ports("127.0.0.1") == [open_port]
+        assert scanner.stats["probes"] == 2
+
+    def test_concurrent_requests_share_one_probe(self):
+        server = listening_socket()
+        port = server.getsockname()[1]
+
+        async def run():
+            scanner = PortScanner(timeout=1.0)
+            states = await asyncio.gather(*(scanner.probe("127.0.0.1", port) for _ in range(20)))
+            return scanner, states
+
+        try:
+            scanner, states = asyncio.run(run())
+        finally:
+            server.close()
+        assert set(states) == {OPEN}
+        assert scanner.stats["probes"] == 1
+        assert scanner.stats["cached"] == 19
+
+    def test_results_are_bounded_and_expire(self, monkeypatch):
+        async def run(scanner):
+            for host in range(1, 6):
+                await scanner.scan_host(f"10.0.0.{host}", [22, 80])
+
+        async def answer(ip, port):
+            return OPEN if port == 22 else CLOSED
+
+        scanner = PortScanner(max_hosts=3, result_ttl=60)
+        monkeypatch.setattr(scanner, "_connect", answer)
+        asyncio.run(run(scanner))
+        assert list(scanner.results) == ["10.0.0.3", "10.0.0.4", "10.0.0.5"]
+        assert scanner.open_ports("10.0.0.5") == [22] and scanner.open_ports("10.0.0.1") == []
+
+        clock = time.monotonic() + 61
+        monkeypatch.setattr(port_scan.time, "monotonic", lambda: clock)
+        assert scanner.open_ports("10.0.0.5") == [] and not scanner.results
+
+    def test_any_open_does_not_wait_for_slow_ports(self, monkeypatch):
+        async def answer(ip, port):
+            if port == 22:
+                return CLOSED
+            await asyncio.sleep(0.3)
+            return FILTERED
+
+        async def run():
+            scanner = PortScanner()
+            monkeypatch.setattr(scanner, "_connect", answer)
+            started = time.monotonic()
+            alive = await scanner.any_open("10.0.0.1", [80, 22, 443])
+            elapsed = time.monotonic() - started
+            await asyncio.sleep(0.4)
+            return alive, elapsed, await scanner.scan_host("10.0.0.1", [80, 443]), scanner
+
+        alive, elapsed, states, scanner = asyncio.run(run())
+        assert alive and elapsed < 0.2
+        assert states == {80: FILTERED, 443: FILTERED} and scanner.stats["cached"] == 2
+
+    def test_rst_proves_host_alive(self):
+        async def run():
+            scanner = PortScanner(timeout=1.0)
+            return await scanner.any_open("127.0.0.1", [closed_port()])
+
+        assert asyncio.run(run()) is True
+
+
+class TestAdaptiveConcurrency:
+    def feed(self, scanner, outcomes):
+        async def run():
+            for state in outcomes:
+                await scanner._record(state)
+        asyncio.run(run())
+
+    def test_grows_while_timeouts_are_steady(self):
+        scanner = PortScanner(initial_concurrency=64, max_concurrency=4096, window=10)
+        self.feed(scanner, [FILTERED, CLOSED] * 20)
+        assert scanner.limit.limit > 64
+
+    def test_halves_when_timeouts_spike(self):
+        scanner = PortScanner(initial_concurrency=256, min_concurrency=16, max_concurrency=4096, window=10)
+        self.feed(scanner, [CLOSED] * 10)
+        grown = scanner.limit.limit
+        self.feed(scanner, [FILTERED] * 10)
+        assert scanner.limit.limit == grown // 2
+
+    def test_halves_when_resets_spike(self):
+        scanner = PortScanner(initial_concurrency=256, min_concurrency=16, max_concurrency=4096, window=10)
+        self.feed(scanner, [OPEN] * 10)
+        grown = scanner.limit.limit
+        self.feed(scanner, [CLOSED] * 10)
+        assert scanner.limit.limit == grown // 2
+
+    def test_resource_errors_back_off(self):
+        scanner = PortScanner(initial_concurrency=256, min_concurrency=16, max_concurrency=4096, window=10)
+        scanner._counts["resource"] = 1
+        self.feed(scanner, [CLOSED] * 10)
+        assert scanner.limit.limit == 128
@@ -0,0 +1,93 @@
+"""
+Unit tests for the write-behind check result sink
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.models.history import ServiceHistory
+from app.models.service import Service
+from app.services.result_sink import ResultSink
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine, tables=[Service.__table__, ServiceHistory.__table__])
+    with Session(engine) as session:
+        session.add(Service(id=1, name="web", ip="10.0.0.1"))
+        session.add(Service(id=2, name="db", ip="10.0.0.2"))
+        session.commit()
+    return engine
+
+
+def history(service_id, latency):
+    return {
+        "service_id": service_id,
+        "is_active": True,
+        "latency_ms": latency,
+        "timestamp": datetime(2024, 1, 1),
+    }
+
+
+class TestResultSink:
+    """Test batching and flushing of check results"""
+
+    def test_flush_writes_updates_and_history(self, engine):
+        sink = ResultSink(engine)
+        sink.add(1, {"is_active": True, "response_time_ms": 12}, history(1, 12))
+        sink.add(2, {"is_active": False}, history(2, 30))
+
+        assert sink.flush() == 2
+        assert sink.pending() == 0
+        with Session(engine) as session:
+            assert session.get(Service, 1).response_time_ms == 12
+            assert session.get(Service, 1).is_active is True
+            assert session.get(Service, 2).is_active is False
+            assert len(session.exec(select(ServiceHistory)).all()) == 2
+
+    def test_updates_to_same_service_are_merged(self, engine):
+        sink = ResultSink(engine)
+        sink.add(1, {"is_active": True, "cpu_usage": 10.0}, history(1, 5))
+        sink.add(1, {"is_active": False}, history(1, 7))
+        sink.flush()
+
+        with Session(engine) as session:
+            service = session.get(Service, 1)
+            assert service.is_active is False
+            assert service.cpu_usage == 10.0
+            latencies = [h.latency_ms for h in session.exec(select(ServiceHistory)).all()]
+            assert latencies == [5, 7]
+
+    def test_deleted_service_does_not_fail_batch(self, engine):
+        sink = ResultSink(engine)
+        sink.add(99, {"is_active": True})
+        sink.add(1, {"is_active": True})
+        sink.flush()
+
+        with Session(engine) as session:
+            assert session.get(Service, 1).is_active is True
+
+    def test_failed_flush_is_requeued(self, engine):
+        sink = ResultSink(engine)
+        sink.add(1, {"is_active": True}, history(1, 5))
+        ServiceHistory.__table__.drop(engine)
+
+        assert sink.flush() == 0
+        assert sink.pending() == 1
+
+        ServiceHistory.__table__.create(engine)
+        assert sink.flush() == 1
+
+    def test_requeue_is_bounded(self, engine):
+        sink = ResultSink(engine, max_pending=3)
+        for latency in range(5):
+            sink.add(1, {"is_active": True}, history(1, latency))
+        ServiceHistory.__table__.drop(engine)
+
+        sink.flush()
+        assert sink.pending() == 3
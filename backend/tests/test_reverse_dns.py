@@ -0,0 +1,177 @@
+"""
+Unit tests for the async PTR resolver
+"""
+import asyncio
+import socket
+import struct
+
+import pytest
+
+from app.services.reverse_dns import (
+    CLASS_IN,
+    RCODE_NXDOMAIN,
+    TYPE_PTR,
+    TYPE_SOA,
+    PTRResolver,
+    build_query,
+    parse_response,
+    read_nameservers,
+    reverse_name,
+)
+
+
+def encode_name(name):
+    return b"".join(bytes([len(label)]) + label.encode() for label in name.split(".") if label) + b"\x00"
+
+
+def make_response(query: bytes, hostname=None, ttl=600, rcode=0, soa_minimum=None):
+    """Answer to a query; the PTR answer uses a compression pointer to the question"""
+    query_id = struct.unpack("!H", query[:2])[0]
+    question = query[12:]
+    answers = b""
+    authority = b""
+    if hostname:
+        rdata = encode_name(hostname)
+        answers = b"\xc0\x0c" + struct.pack("!HHIH", TYPE_PTR, CLASS_IN, ttl, len(rdata)) + rdata
+    if soa_minimum is not None:
+        rdata = encode_name("ns.example") + encode_name("admin.example") + struct.pack("!IIIII", 1, 2, 3, 4, soa_minimum)
+        authority = encode_name("in-addr.arpa") + struct.pack("!HHIH", TYPE_SOA, CLASS_IN, 3600, len(rdata)) + rdata
+    header = struct.pack("!HHHHHH", query_id, 0x8180 | rcode, 1, 1 if hostname else 0, 1 if authority else 0, 0)
+    return header + question + answers + authority
+
+
+class TestPackets:
+    def test_reverse_names(self):
+        assert reverse_name("192.168.1.10") == "10.1.168.192.in-addr.arpa"
+        assert reverse_name("2001:db8::1").endswith(".8.b.d.0.1.0.0.2.ip6.arpa")
+
+    def test_parse_positive_answer(self):
+        query = build_query(0x1234, reverse_name("10.0.0.5"))
+        assert parse_response(make_response(query, "printer.lan", ttl=120)) == (0x1234, 0, "printer.lan", 120)
+
+    def test_parse_nxdomain_uses_soa_minimum(self):
+        query = build_query(7, reverse_name("10.0.0.6"))
+        response = make_response(query, rcode=RCODE_NXDOMAIN, soa_minimum=90)
+        assert parse_response(response) == (7, RCODE_NXDOMAIN, None, 90)
+
+    def test_read_nameservers(self, tmp_path):
+        path = tmp_path / "resolv.conf"
+        path.write_text("# comment\nnameserver 127.0.0.53\nnameserver fe80::1%eth0\nnameserver bogus\nsearch lan\n")
+        assert read_nameservers(str(path)) == ["127.0.0.53", "fe80::1"]
+
+
+class FakeDNS(asyncio.DatagramProtocol):
+    def __init__(self, names, silent=()):
+        self.names = names
+        self.silent = set(silent)
+        self.queries = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.queries += 1
+        name = ".".join(
+            label.decode() for label in self._labels(data[12:])
+        )
+        if name in self.silent:
+            return
+        hostname = self.names.get(name)
+        rcode = 0 if hostname else RCODE_NXDOMAIN
+        # Answer late enough for duplicate lookups to pile up
+        asyncio.get_running_loop().call_later(
+            0.05, self.transport.sendto, make_response(data, hostname, rcode=rcode), addr
+        )
+
+    @staticmethod
+    def _labels(data):
+        offset = 0
+        while data[offset]:
+            yield data[offset + 1:offset + 1 + data[offset]]
+            offset += 1 + data[offset]
+
+
+class SpoofingDNS(FakeDNS):
+    """Sends a forged answer with the right id but another question ahead of the real one"""
+
+    def datagram_received(self, data, addr):
+        forged = build_query(struct.unpack("!H", data[:2])[0], reverse_name("10.6.6.6"))
+        self.transport.sendto(make_response(forged, "evil.lan"), addr)
+        super().datagram_received(data, addr)
+
+
+def run_with_server(names, scenario, silent=(), server_class=FakeDNS):
+    async def run():
+        loop = asyncio.get_running_loop()
+        transport, server = await loop.create_datagram_endpoint(
+            lambda: server_class(names, silent), local_addr=("127.0.0.1", 0)
+        )
+        port = transport.get_extra_info("sockname")[1]
+        resolver = PTRResolver(nameservers=["127.0.0.1"], port=port, timeout=0.3)
+        resolver.hosts = {}
+        try:
+            return await scenario(resolver), server, resolver
+        finally:
+            transport.close()
+
+    return asyncio.run(run())
+
+
+class TestResolver:
+    names = {reverse_name("10.0.0.5"): "printer.lan"}
+
+    def test_coalesces_and_caches(self):
+        async def scenario(resolver):
+            first = await asyncio.gather(*(resolver.lookup("10.0.0.5") for _ in range(20)))
+            again = await resolver.lookup("10.0.0.5")
+            return first, again
+
+        (first, again), server, resolver = run_with_server(self.names, scenario)
+        assert set(first) == {"printer.lan"} and again == "printer.lan"
+        assert server.queries == 1
+        assert resolver.stats["coalesced"] == 19 and resolver.stats["hits"] == 1
+
+    def test_negative_answers_are_cached(self):
+        async def scenario(resolver):
+            return [await resolver.lookup("10.0.0.6") for _ in range(3)]
+
+        results, server, _ = run_with_server(self.names, scenario)
+        assert results == [None, None, None]
+        assert server.queries == 1
+
+    def test_timeouts_are_cached_as_failures(self):
+        async def scenario(resolver):
+            return [await resolver.lookup("10.0.0.7") for _ in range(2)]
+
+        results, server, resolver = run_with_server(
+            self.names, scenario, silent=[reverse_name("10.0.0.7")]
+        )
+        assert results == [None, None]
+        assert server.queries == 1
+        assert resolver._cache["10.0.0.7"][0] is None
+
+    def test_reply_for_another_question_is_ignored(self):
+        async def scenario(resolver):
+            return await resolver.lookup("10.0.0.5")
+
+        hostname, _, _ = run_with_server(self.names, scenario, server_class=SpoofingDNS)
+        assert hostname == "printer.lan"
+
+    @pytest.mark.skipif(not socket.has_ipv6, reason="needs IPv6")
+    def test_mixed_family_nameservers(self):
+        async def run():
+            loop = asyncio.get_running_loop()
+            transport, server = await loop.create_datagram_endpoint(
+                lambda: FakeDNS(self.names), local_addr=("::1", 0)
+            )
+            port = transport.get_extra_info("sockname")[1]
+            # Nothing answers on the IPv4 nameserver; the IPv6 one needs its own socket
+            resolver = PTRResolver(nameservers=["127.0.0.1", "::1"], port=port, timeout=0.2)
+            resolver.hosts = {}
+            try:
+                return await resolver.lookup("10.0.0.5"), server
+            finally:
+                transport.close()
+
+        hostname, server = asyncio.run(run())
+        assert hostname == "printer.lan" and server.queries == 1
@@ -0,0 +1,115 @@
+"""
+Unit tests for streaming scan results and scan diffs
+"""
+import asyncio
+
+from app.services.discovery import DiscoveryEngine
+from app.services.scan_events import ScanEventHub, classify_device, diff_results
+
+
+def device(ip, **fields):
+    return {"ip": ip, "hostname": None, "has_ssh": False, "discovered_at": "t", **fields}
+
+
+class TestDiff:
+    def test_new_gone_and_changed(self):
+        previous = [device("10.0.0.1"), device("10.0.0.2"), device("10.0.0.3", hostname="nas")]
+        current = [
+            device("10.0.0.1", discovered_at="later"),
+            device("10.0.0.3", hostname="nas", has_ssh=True),
+            device("10.0.0.4"),
+        ]
+        diff = diff_results(previous, current)
+        assert [d["ip"] for d in diff["new"]] == ["10.0.0.4"]
+        assert [d["ip"] for d in diff["gone"]] == ["10.0.0.2"]
+        assert diff["changed"] == [{"ip": "10.0.0.3", "changes": {"has_ssh": [False, True]}}]
+
+    def test_classify_device(self):
+        previous = {"10.0.0.1": device("10.0.0.1")}
+        assert classify_device(previous, device("10.0.0.9"))["change"] == "new"
+        assert classify_device(previous, device("10.0.0.1", discovered_at="x"))["change"] == "unchanged"
+        delta = classify_device(previous, device("10.0.0.1", hostname="router"))
+        assert delta["change"] == "changed"
+        assert delta["changes"] == {"hostname": [None, "router"]}
+
+    def test_empty_values_match_stored_nulls(self):
+        previous = {"10.0.0.1": device("10.0.0.1", snmp_descr=None, open_ports=[], snmp_interfaces=None)}
+        scanned = device("10.0.0.1", snmp_descr="", open_ports=[], snmp_interfaces=[])
+        assert classify_device(previous, scanned)["change"] == "unchanged"
+        assert classify_device(previous, device("10.0.0.1", snmp_descr="Linux"))["change"] == "changed"
+
+
+class TestEventHub:
+    def test_slow_subscriber_is_dropped(self):
+        async def run():
+            hub = ScanEventHub(queue_size=2)
+            slow = hub.subscribe()
+            for _ in range(3):
+                hub.publish("progress")
+            return hub, slow
+
+        hub, slow = asyncio.run(run())
+        assert slow.dropped
+        assert hub.subscriber_count == 0
+
+
+class TestPipeline:
+    def test_slow_host_does_not_hold_back_others(self):
+        engine = DiscoveryEngine()
+        engine.max_concurrent = 4
+
+        async def scan_host(ip):
+            await asyncio.sleep(0.3 if ip == "10.0.0.1" else 0.01)
+            return None if ip.endswith(".5") else device(ip)
+
+        engine._scan_host_comprehensive = scan_host
+
+        async def run():
+            return [d["ip"] async for d in engine._scan_hosts(f"10.0.0.{i}" for i in range(1, 9))]
+
+        found = asyncio.run(run())
+        assert sorted(found) == sorted(f"10.0.0.{i}" for i in (1, 2, 3, 4, 6, 7, 8))
+        assert found[-1] == "10.0.0.1"
+        assert engine.scan_progress == 8
+
+    def test_scan_publishes_deltas_and_diff(self, monkeypatch):
+        engine = DiscoveryEngine()
+        monkeypatch.setattr("app.services.discovery.get_pinger", lambda: None)
+
+        async def no_record(cidrs, devices):
+            pass
+
+        engine._record_scan = no_record
+
+        async def no_prime(ips):
+            pass
+
+        async def no_refresh():
+            return {}
+
+        engine.neighbours.prime = no_prime
+        engine.neighbours.refresh = no_refresh
+        engine.previous_results = [device("10.0.0.1"), device("10.0.0.3")]
+
+        async def scan_host(ip):
+            return device(ip, has_ssh=ip == "10.0.0.1") if ip in ("10.0.0.1", "10.0.0.2") else None
+
+        engine._scan_host_comprehensive = scan_host
+
+        async def run():
+            subscription = engine.events.subscribe()
+            await engine.scan_network(["10.0.0.0/29"])
+            events = []
+            while not subscription.queue.empty():
+                events.append(subscription.queue.get_nowait())
+            return events
+
+        events = asyncio.run(run())
+        types = [e["type"] for e in events]
+        assert types[0] == "started" and types[-1] == "complete"
+        changes = {e["device"]["ip"]: e["change"] for e in events if e["type"] == "device"}
+        assert changes == {"10.0.0.1": "changed", "10.0.0.2": "new"}
+        diff = next(e for e in events if e["type"] == "diff")
+        assert [d["ip"] for d in diff["gone"]] == ["10.0.0.3"]
+        assert engine.last_diff["changed"][0]["ip"] == "10.0.0.1"
+        assert engine.previous_results == engine.last_results
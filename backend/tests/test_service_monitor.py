@@ -0,0 +1,135 @@
+"""
+Unit tests for the long-lived service monitor loop
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.core.config import settings
+from app.models.history import ServiceHistory
+from app.models.service import CheckType, Service
+from app.services import status_engine
+from app.services.result_sink import ResultSink
+from app.services.status_engine import ServiceMonitor
+
+HTTP_SERVICES = range(1, 11)
+TCP_SERVICES = range(11, 21)
+
+
+class FakeChecks:
+    """perform_check stand-in that records how many checks of each type overlap"""
+
+    def __init__(self, duration=0.05):
+        self.duration = duration
+        self.lock = threading.Lock()
+        self.in_flight = {"total": 0}
+        self.peak = {"total": 0}
+        self.checked = []
+        self.loops = set()
+        self.shared = []
+
+    def _enter(self, kind, delta):
+        with self.lock:
+            for key in (kind, "total"):
+                self.in_flight[key] = self.in_flight.get(key, 0) + delta
+                self.peak[key] = max(self.peak.get(key, 0), self.in_flight[key])
+
+    async def __call__(self, service, http_engine=None, addresses=None):
+        self.loops.add(asyncio.get_running_loop())
+        self.shared.append(http_engine is not None and addresses is not None)
+        self._enter(service.check_type, 1)
+        try:
+            await asyncio.sleep(self.duration)
+        finally:
+            self._enter(service.check_type, -1)
+        with self.lock:
+            self.checked.append(service.id)
+        return True, 7, "ok"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine, tables=[Service.__table__, ServiceHistory.__table__])
+    with Session(engine) as session:
+        for service_id in HTTP_SERVICES:
+            session.add(Service(id=service_id, name=f"web-{service_id}", ip="10.0.0.1",
+                                check_type=CheckType.HTTP, check_interval=600, is_active=True))
+        for service_id in TCP_SERVICES:
+            session.add(Service(id=service_id, name=f"tcp-{service_id}", ip="10.0.0.2", port=22,
+                                check_type=CheckType.TCP, check_interval=600, is_active=True))
+        session.commit()
+    monkeypatch.setattr(status_engine, "engine", engine)
+    monkeypatch.setattr(status_engine, "result_sink", ResultSink(engine, flush_interval=0.05))
+    return engine
+
+
+@pytest.fixture
+def checks(monkeypatch):
+    fake = FakeChecks()
+    monkeypatch.setattr(status_engine, "perform_check", fake)
+    return fake
+
+
+@pytest.fixture
+def monitor(monkeypatch):
+    monitor = ServiceMonitor()
+    monkeypatch.setattr(status_engine, "service_monitor", monitor)  # Checks ask it for the shared pools
+    yield monitor
+    monitor.stop()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class TestServiceMonitor:
+    def test_scheduled_checks_respect_per_type_limits(self, db, checks, monitor, monkeypatch):
+        monkeypatch.setattr(settings, "MONITOR_MAX_CONCURRENT_CHECKS", 5)
+        monkeypatch.setattr(settings, "MONITOR_HTTP_CONCURRENCY", 2)
+        monkeypatch.setattr(settings, "MONITOR_TCP_CONCURRENCY", 3)
+        monitor.start()
+        wait_for(lambda: len(checks.checked) == 20)
+        monitor.stop()
+
+        assert sorted(checks.checked) == list(range(1, 21))  # Each once: the interval is 600s
+        assert checks.peak[CheckType.HTTP] == 2 and checks.peak[CheckType.TCP] == 3
+        assert checks.peak["total"] == 5  # Saturated HTTP checks don't hold back TCP ones
+        assert len(checks.loops) == 1 and all(checks.shared)
+
+    def test_results_are_flushed_by_the_loop(self, db, checks, monitor):
+        def flushed():
+            with Session(db) as session:
+                return len(session.exec(select(ServiceHistory)).all()) == 20
+
+        monitor.start()
+        wait_for(flushed)  # By the sink's own flush task, nobody calls flush()
+
+        with Session(db) as session:
+            service = session.get(Service, 1)
+            assert service.response_time_ms == 7 and service.last_checked is not None
+
+    def test_run_check_hands_over_to_the_monitor_loop(self, db, checks, monitor):
+        async def from_api():
+            await monitor.run_check(3)
+            return asyncio.get_running_loop()
+
+        monitor.start()
+        wait_for(lambda: len(checks.checked) == 20)
+        monitor_loop = monitor._loop
+        api_loop = asyncio.run(from_api())
+
+        assert checks.checked.count(3) == 2
+        assert checks.loops == {monitor_loop} and api_loop is not monitor_loop
+        with Session(db) as session:  # run_check flushes before returning
+            rows = session.exec(select(ServiceHistory).where(ServiceHistory.service_id == 3)).all()
+            assert len(rows) == 2
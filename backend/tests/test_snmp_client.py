@@ -0,0 +1,173 @@
+"""
+Unit tests for the async SNMP v2c client
+"""
+import asyncio
+import pytest
+from app.services.snmp_client import (
+    AsyncSnmpClient,
+    SnmpTimeout,
+    SnmpError,
+    NO_SUCH_OBJECT,
+    GET_REQUEST,
+    GET_RESPONSE,
+    encode_request,
+    decode_response,
+    _decode_tlv,
+    _decode_oid,
+    _encode_int,
+    _encode_oid,
+    _tlv,
+)
+
+
+def build_response(request_id: int, varbinds, error_status: int = 0) -> bytes:
+    """Encode a GetResponse the way an agent would"""
+    body = b""
+    for oid, tag, payload in varbinds:
+        body += _tlv(0x30, _encode_oid(oid) + _tlv(tag, payload))
+    pdu = _tlv(GET_RESPONSE, _encode_int(request_id) + _encode_int(error_status) + _encode_int(0) + _tlv(0x30, body))
+    return _tlv(0x30, _encode_int(1) + _tlv(0x04, b"public") + pdu)
+
+
+def parse_request(data: bytes):
+    """Return (request_id, [oids]) from a request message"""
+    _, message, _ = _decode_tlv(data, 0)
+    _, _, pos = _decode_tlv(message, 0)
+    _, _, pos = _decode_tlv(message, pos)
+    _, pdu, _ = _decode_tlv(message, pos)
+    _, request_id, pos = _decode_tlv(pdu, 0)
+    _, _, pos = _decode_tlv(pdu, pos)
+    _, _, pos = _decode_tlv(pdu, pos)
+    _, varbind_list, _ = _decode_tlv(pdu, pos)
+    oids = []
+    pos = 0
+    while pos < len(varbind_list):
+        _, varbind, pos = _decode_tlv(varbind_list, pos)
+        _, oid, _ = _decode_tlv(varbind, 0)
+        oids.append(_decode_oid(oid))
+    return int.from_bytes(request_id, "big"), oids
+
+
+class FakeAgent(asyncio.DatagramProtocol):
+    """Answers every OID with its own name as an OCTET STRING, except those ending in .9999"""
+
+    def __init__(self, delay: float = 0.0, silent: bool = False):
+        self.delay = delay
+        self.silent = silent
+        self.received = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.received += 1
+        if self.silent:
+            return
+        request_id, oids = parse_request(data)
+        varbinds = [
+            (oid, 0x80, b"") if oid.endswith(".9999") else (oid, 0x04, oid.encode())
+            for oid in oids
+        ]
+        response = build_response(request_id, varbinds)
+        asyncio.get_running_loop().call_later(self.delay, self.transport.sendto, response, addr)
+
+
+async def start_agent(**kwargs):
+    loop = asyncio.get_running_loop()
+    transport, agent = await loop.create_datagram_endpoint(
+        lambda: FakeAgent(**kwargs), local_addr=("127.0.0.1", 0)
+    )
+    return transport, agent, transport.get_extra_info("sockname")[1]
+
+
+class TestCodec:
+    """Test BER encoding and decoding"""
+
+    def test_oid_roundtrip(self):
+        oid = "1.3.6.1.4.1.2021.4294967295.128.0"
+        _, payload, _ = _decode_tlv(_encode_oid(oid), 0)
+        assert _decode_oid(payload) == oid
+
+    def test_integer_encoding(self):
+        assert _encode_int(0) == b"\x02\x01\x00"
+        assert _encode_int(128) == b"\x02\x02\x00\x80"
+        assert _encode_int(-1) == b"\x02\x01\xff"
+
+    def test_long_length_roundtrip(self):
+        message = build_response(7, [("1.3.6.1.2.1.1.1.0", 0x04, b"x" * 300)])
+        request_id, status, _, varbinds = decode_response(message)
+        assert request_id == 7
+        assert status == 0
+        assert varbinds[0][1] == b"x" * 300
+
+    def test_request_is_parseable(self):
+        message = encode_request(GET_REQUEST, 42, "public", ["1.3.6.1.2.1.1.1.0", "1.3.6.1.2.1.1.3.0"])
+        assert parse_request(message) == (42, ["1.3.6.1.2.1.1.1.0", "1.3.6.1.2.1.1.3.0"])
+
+
+class TestClient:
+    """Test the shared-socket client against a local fake agent"""
+
+    def test_get(self):
+        async def run():
+            transport, _, port = await start_agent()
+            client = AsyncSnmpClient()
+            try:
+                return await client.get("127.0.0.1", ["1.3.6.1.2.1.1.1.0", "1.3.6.1.2.1.1.9999"], port=port)
+            finally:
+                client.close()
+                transport.close()
+
+        varbinds = asyncio.run(run())
+        assert varbinds[0] == ("1.3.6.1.2.1.1.1.0", b"1.3.6.1.2.1.1.1.0")
+        assert varbinds[1][1] is NO_SUCH_OBJECT
+
+    def test_many_requests_in_flight(self):
+        async def run():
+            transport, agent, port = await start_agent(delay=0.2)
+            client = AsyncSnmpClient()
+            try:
+                started = asyncio.get_running_loop().time()
+                results = await asyncio.gather(*(
+                    client.get("127.0.0.1", [f"1.3.6.1.2.1.2.2.1.2.{i}"], port=port, timeout=2.0)
+                    for i in range(200)
+                ))
+                return results, asyncio.get_running_loop().time() - started, agent.received
+            finally:
+                client.close()
+                transport.close()
+
+        results, elapsed, received = asyncio.run(run())
+        assert received == 200
+        assert [r[0][1] for r in results] == [f"1.3.6.1.2.1.2.2.1.2.{i}".encode() for i in range(200)]
+        # All answered in roughly one agent delay, not 200 of them
+        assert elapsed < 1.5
+
+    def test_timeout_with_retries(self):
+        async def run():
+            transport, agent, port = await start_agent(silent=True)
+            client = AsyncSnmpClient()
+            try:
+                with pytest.raises(SnmpTimeout):
+                    await client.get("127.0.0.1", ["1.3.6.1.2.1.1.1.0"], port=port, timeout=0.1, retries=2)
+                return agent.received, len(client._pending)
+            finally:
+                client.close()
+                transport.close()
+
+        received, pending = asyncio.run(run())
+        assert received == 3
+        assert pending == 0
+
+    def test_error_status_raises(self):
+        message = build_response(5, [("1.3.6.1.2.1.1.1.0", 0x05, b"")], error_status=5)
+        client = AsyncSnmpClient()
+
+        async def run():
+            future = asyncio.get_running_loop().create_future()
+            client._pending[5] = (future, "127.0.0.1")
+            client._on_datagram(message, ("127.0.0.1", 161))
+            with pytest.raises(SnmpError, match="genErr"):
+                await future
+
+        asyncio.run(run())
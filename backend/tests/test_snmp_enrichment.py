@@ -0,0 +1,159 @@
+"""
+Unit tests for GETBULK enrichment of discovered hosts
+"""
+import asyncio
+import time
+
+from app.services.snmp_client import (
+    GET_BULK_REQUEST,
+    GET_RESPONSE,
+    _decode_oid,
+    _decode_tlv,
+    _encode_int,
+    _encode_oid,
+    _tlv,
+)
+from app.services.snmp_enrichment import SnmpEnricher, parse_system
+
+INTERFACES = 20
+
+
+def build_mib():
+    mib = {
+        "1.3.6.1.2.1.1.1.0": _tlv(0x04, b"Linux router 6.1"),
+        "1.3.6.1.2.1.1.2.0": _encode_oid("1.3.6.1.4.1.8072.3.2.10"),
+        "1.3.6.1.2.1.1.3.0": _tlv(0x43, (123456).to_bytes(3, "big")),
+        "1.3.6.1.2.1.1.5.0": _tlv(0x04, b"router"),
+        "1.3.6.1.2.1.4.1.0": _tlv(0x02, b"\x01"),
+    }
+    for index in range(1, INTERFACES + 1):
+        mib[f"1.3.6.1.2.1.2.2.1.2.{index}"] = _tlv(0x04, f"eth{index}".encode())
+        mib[f"1.3.6.1.2.1.2.2.1.5.{index}"] = _tlv(0x42, (1000000000).to_bytes(4, "big"))
+        mib[f"1.3.6.1.2.1.2.2.1.6.{index}"] = _tlv(0x04, bytes([0, 0x1B, 0xC5, 0, 0, index]))
+        mib[f"1.3.6.1.2.1.2.2.1.8.{index}"] = _tlv(0x02, bytes([1 if index % 2 else 2]))
+        mib[f"1.3.6.1.2.1.2.2.1.9.{index}"] = _tlv(0x43, b"\x00")
+    return mib
+
+
+def oid_key(oid):
+    return tuple(int(part) for part in oid.split("."))
+
+
+class FakeBulkAgent(asyncio.DatagramProtocol):
+    """Answers GETBULK requests from a small MIB like a real v2c agent"""
+
+    def __init__(self, mib, delay=0.0):
+        self.mib = mib
+        self.order = sorted(mib, key=oid_key)
+        self.delay = delay
+        self.requests = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def next_varbind(self, oid):
+        for candidate in self.order:
+            if oid_key(candidate) > oid_key(oid):
+                return candidate, self.mib[candidate]
+        return oid, _tlv(0x82, b"")  # endOfMibView
+
+    def datagram_received(self, data, addr):
+        self.requests += 1
+        _, message, _ = _decode_tlv(data, 0)
+        _, _, pos = _decode_tlv(message, 0)
+        _, _, pos = _decode_tlv(message, pos)
+        pdu_type, pdu, _ = _decode_tlv(message, pos)
+        assert pdu_type == GET_BULK_REQUEST
+        _, request_id, pos = _decode_tlv(pdu, 0)
+        _, non_repeaters, pos = _decode_tlv(pdu, pos)
+        _, max_repetitions, pos = _decode_tlv(pdu, pos)
+        _, varbind_list, _ = _decode_tlv(pdu, pos)
+        oids = []
+        pos = 0
+        while pos < len(varbind_list):
+            _, varbind, pos = _decode_tlv(varbind_list, pos)
+            _, oid, _ = _decode_tlv(varbind, 0)
+            oids.append(_decode_oid(oid))
+
+        non_repeaters = int.from_bytes(non_repeaters, "big")
+        answers = [self.next_varbind(oid) for oid in oids[:non_repeaters]]
+        cursor = oids[non_repeaters:]
+        for _ in range(int.from_bytes(max_repetitions, "big")):
+            row = [self.next_varbind(oid) for oid in cursor]
+            answers.extend(row)
+            cursor = [oid for oid, _ in row]
+
+        body = b"".join(_tlv(0x30, _encode_oid(oid) + value) for oid, value in answers)
+        pdu = _tlv(GET_RESPONSE, _tlv(0x02, request_id) + _encode_int(0) + _encode_int(0) + _tlv(0x30, body))
+        response = _tlv(0x30, _encode_int(1) + _tlv(0x04, b"public") + pdu)
+        asyncio.get_running_loop().call_later(self.delay, self.transport.sendto, response, addr)
+
+
+def run_with_agent(scenario, mib=None, delay=0.0, timeout=0.5):
+    async def run():
+        loop = asyncio.get_running_loop()
+        transport, agent = await loop.create_datagram_endpoint(
+            lambda: FakeBulkAgent(mib or build_mib(), delay), local_addr=("127.0.0.1", 0)
+        )
+        port = transport.get_extra_info("sockname")[1]
+        enricher = SnmpEnricher(community="public", port=port, timeout=timeout)
+        try:
+            return await scenario(enricher), agent
+        finally:
+            transport.close()
+
+    return asyncio.run(run())
+
+
+class TestSystemGroup:
+    def test_one_getbulk_for_the_system_group(self):
+        info, agent = run_with_agent(lambda enricher: enricher.enrich("127.0.0.1"))
+        assert info == {
+            "descr": "Linux router 6.1",
+            "object_id": "1.3.6.1.4.1.8072.3.2.10",
+            "uptime": 1234,
+            "name": "router",
+        }
+        assert agent.requests == 1
+
+    def test_missing_objects_are_none(self):
+        mib = build_mib()
+        del mib["1.3.6.1.2.1.1.5.0"]
+        info, _ = run_with_agent(lambda enricher: enricher.enrich("127.0.0.1"), mib=mib)
+        assert info["name"] is None and info["descr"] == "Linux router 6.1"
+        assert parse_system([]) == {"descr": None, "object_id": None, "uptime": None, "name": None}
+
+
+class TestInterfaces:
+    def test_table_is_walked_across_requests(self):
+        info, agent = run_with_agent(lambda enricher: enricher.enrich("127.0.0.1", interfaces=True))
+        interfaces = info["interfaces"]
+        assert len(interfaces) == INTERFACES
+        assert interfaces[0] == {
+            "index": 1, "descr": "eth1", "speed": 1000000000,
+            "mac": "00:1b:c5:00:00:01", "oper_status": "up",
+        }
+        assert interfaces[1]["oper_status"] == "down"
+        # 16 rows come with the system group, the rest in one follow-up
+        assert agent.requests == 2
+
+
+class TestBatch:
+    def test_hosts_share_one_timeout_window(self):
+        async def scenario(enricher):
+            started = time.monotonic()
+            results = await asyncio.gather(*(enricher.enrich("127.0.0.1") for _ in range(200)))
+            return results, time.monotonic() - started
+
+        (results, elapsed), agent = run_with_agent(scenario, delay=0.2, timeout=1.0)
+        assert all(info["name"] == "router" for info in results)
+        assert agent.requests == 200
+        assert elapsed < 1.0
+
+    def test_hosts_without_agent_are_none(self):
+        async def scenario(enricher):
+            return await enricher.enrich_many(["127.0.0.1", "127.0.0.2"])
+
+        results, _ = run_with_agent(scenario, timeout=0.3)
+        assert results["127.0.0.1"]["descr"] == "Linux router 6.1"
+        assert results["127.0.0.2"] is None
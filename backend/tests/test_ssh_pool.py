@@ -0,0 +1,108 @@
+"""
+Unit tests for SSH stats parsing and the connection pool
+"""
+import io
+
+import paramiko
+import pytest
+from app.services.ssh_pool import SSHConnectionPool, parse_stats
+
+SAMPLE = """cpu  1000 0 500 8000 500 0 0 0 0 0
+MemTotal:        8000000 kB
+MemAvailable:    2000000 kB
+/dev/sda1         102400000  46080000  56320000      45% /
+"""
+
+
+class TestParseStats:
+    """Test parsing of the combined stats command output"""
+
+    def test_first_sample_uses_since_boot_average(self):
+        stats, sample = parse_stats(SAMPLE)
+        assert stats['cpu'] == 15.0
+        assert stats['ram'] == 75.0
+        assert stats['disk'] == 45.0
+        assert sample == (1500, 10000)
+
+    def test_cpu_uses_delta_from_previous_sample(self):
+        stats, _ = parse_stats(SAMPLE, previous_cpu=(1000, 9000))
+        # 500 busy jiffies out of 1000 elapsed
+        assert stats['cpu'] == 50.0
+
+    def test_missing_sections_are_skipped(self):
+        stats, sample = parse_stats("MemTotal: 1000 kB\n")
+        assert stats == {}
+        assert sample is None
+
+
+class FakeTransport:
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+    def send_ignore(self):
+        pass
+
+
+class FakeClient:
+    """Answers every command with the next /proc/stat sample, or fails once dead"""
+
+    def __init__(self, samples, dead=False):
+        self.samples = samples
+        self.dead = dead
+        self.transport = FakeTransport()
+        self.closed = False
+
+    def get_transport(self):
+        return self.transport
+
+    def exec_command(self, command, timeout=None):
+        if self.dead:
+            raise paramiko.SSHException("Socket is closed")
+        return None, io.BytesIO(self.samples.pop(0).encode()), io.BytesIO(b"")
+
+    def close(self):
+        self.closed = True
+
+
+class TestPool:
+    def make_pool(self, monkeypatch, clients):
+        pool = SSHConnectionPool()
+        connects = []
+
+        def connect(host, port, username, password):
+            connects.append((host, port, username))
+            return clients.pop(0)
+
+        monkeypatch.setattr(pool, "_connect", connect)
+        return pool, connects
+
+    def test_connection_is_reused_and_keeps_the_cpu_sample(self, monkeypatch):
+        later = SAMPLE.replace("cpu  1000 0 500 8000 500", "cpu  1500 0 500 8500 500")
+        pool, connects = self.make_pool(monkeypatch, [FakeClient([SAMPLE, later])])
+
+        assert pool.get_stats("10.0.0.5", 22, "root", "pw")["cpu"] == 15.0
+        # 500 busy jiffies out of 1000 since the first check
+        assert pool.get_stats("10.0.0.5", 22, "root", "pw")["cpu"] == 50.0
+        assert len(connects) == 1
+        conn = pool._connections[("10.0.0.5", 22, "root")]
+        assert conn.lock.acquire(blocking=False)  # Checked back in
+
+    def test_dead_connection_is_retried_once(self, monkeypatch):
+        stale = FakeClient([], dead=True)
+        pool, connects = self.make_pool(monkeypatch, [stale, FakeClient(["ok\n"])])
+
+        assert pool.exec("10.0.0.5", 22, "root", "pw", "true") == ("ok\n", "")
+        assert stale.closed and len(connects) == 2
+
+    def test_second_failure_is_raised_and_released(self, monkeypatch):
+        pool, connects = self.make_pool(
+            monkeypatch, [FakeClient([], dead=True), FakeClient([], dead=True), FakeClient(["ok\n"])]
+        )
+        with pytest.raises(paramiko.SSHException):
+            pool.exec("10.0.0.5", 22, "root", "pw", "true")
+        assert len(connects) == 2
+        # The lock was released: the next call gets a connection instead of hanging
+        assert pool.exec("10.0.0.5", 22, "root", "pw", "true") == ("ok\n", "")
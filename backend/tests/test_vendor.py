@@ -0,0 +1,113 @@
+"""
+Unit tests for the OUI vendor index
+"""
+import asyncio
+
+from app.services import vendor
+from app.services.vendor import VendorDatabase, lookup_vendor, lookup_vendors, mac_to_int, parse_registry, vendor_db
+
+IEEE_CSV = """Registry,Assignment,Organization Name,Organization Address
+MA-L,001BC5,IEEE Registration Authority,"445 Hoes Lane Piscataway NJ US 08854"
+MA-S,001BC5001,Vendor Small,"somewhere"
+"""
+
+MAM_CSV = """Registry,Assignment,Organization Name,Organization Address
+MA-M,001BC50,Vendor Medium,"somewhere"
+"""
+
+MANUF = "00:00:0C\tCisco\tCisco Systems, Inc\n00:1B:C5:00:20:00/36\tTiny\tTiny Devices (Shenzhen) Ltd\n"
+
+
+class TestParsing:
+    def test_formats(self):
+        assert parse_registry(IEEE_CSV) == [
+            ("001BC5", 24, "IEEE Registration Authority"),
+            ("001BC5001", 36, "Vendor Small"),
+        ]
+        assert parse_registry("286FB9     (base 16)\t\tNokia Shanghai Bell Co., Ltd.") == [
+            ("286FB9", 24, "Nokia Shanghai Bell Co., Ltd.")
+        ]
+        assert parse_registry("F4EAB5:Extreme Networks (HQ)") == [("F4EAB5", 24, "Extreme Networks (HQ)")]
+        assert parse_registry(MANUF) == [
+            ("00000C", 24, "Cisco Systems, Inc"),
+            ("001BC5002000", 36, "Tiny Devices (Shenzhen) Ltd"),
+        ]
+
+    def test_mac_notations(self):
+        assert mac_to_int("00:1b:c5:00:10:01") == mac_to_int("001B.C500.1001") == mac_to_int("00-1B-C5-00-10-01")
+        assert mac_to_int("00:1b:c5") is None
+
+
+class TestLookup:
+    def make_db(self, tmp_path):
+        paths = []
+        for name, text in (("oui.csv", IEEE_CSV), ("mam.csv", MAM_CSV), ("manuf", MANUF)):
+            path = tmp_path / name
+            path.write_text(text)
+            paths.append(str(path))
+        return VendorDatabase(paths)
+
+    def test_longest_prefix_wins(self, tmp_path):
+        db = self.make_db(tmp_path)
+        assert not db.loaded  # Nothing is read until the first lookup
+        assert db.lookup("00:1B:C5:00:10:01") == "Vendor Small"  # 36-bit
+        assert db.lookup("00:1B:C5:00:20:01") == "Tiny Devices (Shenzhen) Ltd"  # 36-bit, manuf
+        assert db.lookup("00:1B:C5:0F:00:01") == "Vendor Medium"  # 28-bit
+        assert db.lookup("00:1B:C5:F0:00:01") == "IEEE Registration Authority"  # 24-bit
+        assert db.lookup("00:00:0c:12:34:56") == "Cisco Systems, Inc"
+        assert db.lookup("02:00:00:00:00:01") is None
+        assert db.lookup("garbage") is None
+
+    def test_batch_and_offline_reload(self, tmp_path):
+        db = self.make_db(tmp_path)
+        macs = ["00:00:0C:00:00:01", "02:00:00:00:00:01"]
+        assert db.lookup_many(macs) == {macs[0]: "Cisco Systems, Inc", macs[1]: None}
+
+        (tmp_path / "manuf").write_text("02:00:00\tLab\tLab Gear\n")
+        db.reload()
+        assert db.lookup_many(macs) == {macs[0]: None, macs[1]: "Lab Gear"}
+        assert db.stats()["prefixes"]["24-bit"] == 2
+
+    def test_async_lookup_loads_lazily(self, tmp_path, monkeypatch):
+        db = self.make_db(tmp_path)
+        monkeypatch.setattr(vendor_db, "paths", db.paths)
+        monkeypatch.setattr(vendor_db, "_tables", None)
+        assert asyncio.run(lookup_vendor("00:00:0C:AB:CD:EF")) == "Cisco Systems, Inc"
+
+
+class TestSources:
+    def test_legacy_list_in_working_directory(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(vendor.settings, "OUI_DB_PATH", "")
+        monkeypatch.setattr(vendor, "MAC_VENDOR_LOOKUP_AVAILABLE", False)
+        (tmp_path / "mac-vendors.txt").write_text("F4EAB5:Extreme Networks\n")
+        db = VendorDatabase()
+        assert db.lookup("f4:ea:b5:00:00:01") == "Extreme Networks"
+        assert db.source == ["mac-vendors.txt"]
+
+    def test_fresh_install_downloads_once(self, tmp_path, monkeypatch):
+        downloads = []
+        cache_path = tmp_path / "cache" / "mac-vendors.txt"
+
+        class FakeAsyncMacLookup:
+            async def update_vendors(self):
+                downloads.append(1)
+                await asyncio.sleep(0.01)
+                cache_path.write_text("286FB9:Nokia\n")
+
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(vendor.settings, "OUI_DB_PATH", "")
+        monkeypatch.setattr(vendor, "MAC_VENDOR_LOOKUP_AVAILABLE", True)
+        monkeypatch.setattr(vendor, "AsyncMacLookup", FakeAsyncMacLookup)
+        monkeypatch.setattr(vendor.BaseMacLookup, "cache_path", str(cache_path))
+        monkeypatch.setattr(vendor.sys, "prefix", str(tmp_path))
+        monkeypatch.setattr(vendor_db, "paths", None)
+        monkeypatch.setattr(vendor_db, "_tables", None)
+
+        async def scenario():
+            return await asyncio.gather(*(lookup_vendor("28:6F:B9:00:00:01") for _ in range(10)))
+
+        assert asyncio.run(scenario()) == ["Nokia"] * 10
+        assert downloads == [1]
+        assert asyncio.run(lookup_vendors(["28:6F:B9:00:00:02"])) == {"28:6F:B9:00:00:02": "Nokia"}
+        assert downloads == [1]